@@ -6,6 +6,9 @@ mkdir build
 
 docker run -v ${DIR}:/opt/build_source python:3.7 /bin/bash -c "cd /opt/build_source; pip3 install -t ./build -r requirements.txt"
 
+# Compile the city and plane definitions into the binary catalog loaded at runtime
+docker run -v ${DIR}:/opt/build_source python:3.7 /bin/bash -c "cd /opt/build_source/src; PYTHONPATH=/opt/build_source/build python3 -m definitions.catalog"
+
 rsync -avr --exclude='build/' --exclude='terraform/' --exclude='venv/' --exclude='.git/' --exclude='.idea/' . build/
 
 cd build/
@@ -0,0 +1,28 @@
+import logging
+
+from _version import __version__
+from utils import arrivals, logs, metrics
+
+LOGGER = logging.getLogger()
+
+
+def lambda_handler(event, context):
+    """
+    AWS lambda insertion point of the scheduled arrivals worker, lands every plane which is due
+
+    :param event: AWS Lambda event data
+    :param context: AWS Lambda context
+    :return: Dict of counts: landed, failed, stale
+    """
+    logs.setup()
+    LOGGER.info('Micro Airlines arrivals worker %s', __version__)
+    metrics.start_invocation('arrivals')
+    counts = arrivals.process_arrivals()
+    metrics.emit()
+    return counts
+
+
+if __name__ == '__main__':
+    # Entry point for local development, processes the due arrivals once
+    logging.basicConfig(level=logging.INFO)
+    print(arrivals.process_arrivals())
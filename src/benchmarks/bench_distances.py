@@ -0,0 +1,48 @@
+"""
+Microbenchmark comparing the precomputed distance matrix to per-call haversine
+
+Usage (from src/):  python -m benchmarks.bench_distances
+"""
+import random
+import timeit
+
+from haversine import haversine, Unit
+
+from definitions.cities import cities
+from utils.distances import DistanceMatrix, distance_matrix
+
+
+def haversine_distance(city_id_1, city_id_2):
+    """
+    The original per-call implementation of utils.get_distance_between_cities
+    """
+    city_1 = cities.get(city_id_1)
+    city_2 = cities.get(city_id_2)
+    if not city_1 or not city_2:
+        return None
+
+    return int(haversine((city_1.latitude, city_1.longitude),
+                         (city_2.latitude, city_2.longitude), unit=Unit.MILES))
+
+
+def main(lookups=100000, repeat=5):
+    city_ids = list(cities.keys())
+    pairs = [(random.choice(city_ids), random.choice(city_ids)) for _ in range(lookups)]
+
+    build = min(timeit.repeat(lambda: DistanceMatrix(cities).matrix, number=1, repeat=repeat))
+    distance_matrix.matrix
+
+    def run(func):
+        return min(timeit.repeat(lambda: [func(a, b) for a, b in pairs], number=1, repeat=repeat))
+
+    per_call = run(haversine_distance)
+    matrix = run(distance_matrix.distance)
+
+    print(f'Matrix build ({len(city_ids)}x{len(city_ids)}): {build * 1000:.2f} ms')
+    print(f'haversine per call:  {per_call / lookups * 1e9:8.0f} ns/lookup')
+    print(f'distance matrix:     {matrix / lookups * 1e9:8.0f} ns/lookup')
+    print(f'Speedup:             {per_call / matrix:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark the batched job generator against the original one-job-at-a-time loop, and the cost of
+deriving a job board from a new keyed stream (utils.rng.stream) on every read
+
+Usage (from src/):  python -m benchmarks.bench_jobs
+"""
+import random
+import string
+import timeit
+
+from haversine import haversine, Unit
+
+from definitions.catalog import cities
+from utils import rng, utils
+
+PLAYER_CITY_IDS = ['c1001', 'c1002', 'c1003', 'c1004', 'c1005', 'c1036', 'c2024', 'c2027', 'c5012', 'c5052']
+
+
+def legacy_generate_random_jobs(player_cities, current_city_id, count=30):
+    """
+    The original generate_random_jobs: three random.choice calls, one haversine and one
+    random.choices id per job
+    """
+    player_city_ids = [city_id for city_id in player_cities.keys()
+                       if city_id != current_city_id]
+
+    def revenue(origin_city_id, destination_city_id):
+        city_1 = cities[origin_city_id]
+        city_2 = cities[destination_city_id]
+        distance = int(haversine((city_1.latitude, city_1.longitude),
+                                 (city_2.latitude, city_2.longitude), unit=Unit.MILES))
+        return int(50 + distance * 0.17)
+
+    jobs = {}
+    for _ in range(count):
+        job = {
+            'id': ''.join(random.choices(string.ascii_lowercase, k=20)),
+            'origin_city_id': current_city_id,
+            'destination_city_id': random.choice(player_city_ids),
+            'revenue': revenue(current_city_id, random.choice(player_city_ids)),
+            'job_type': random.choice(['P', 'C'])
+        }
+        jobs[job['id']] = job
+    return jobs
+
+
+def main(repeat=20):
+    random.seed(0)
+    rng.set_seed(0)
+    player_cities = {city_id: cities[city_id] for city_id in PLAYER_CITY_IDS}
+    utils.generate_random_jobs(player_cities, 'c1001')
+
+    print(f'{"jobs":>6} {"legacy":>12} {"batched":>12} {"speedup":>8} {"stream":>12}')
+    for count in [30, 300, 3000]:
+        legacy = min(timeit.repeat(lambda: legacy_generate_random_jobs(player_cities, 'c1001', count),
+                                   number=1, repeat=repeat))
+        batched = min(timeit.repeat(lambda: utils.generate_random_jobs(player_cities, 'c1001', count),
+                                    number=1, repeat=repeat))
+        stream = min(timeit.repeat(lambda: utils.generate_random_jobs(
+            player_cities, 'c1001', count, generator=rng.stream('jobs', 'player', 'c1001', 0)), number=1, repeat=repeat))
+        print(f'{count:>6} {legacy * 1000:>9.3f} ms {batched * 1000:>9.3f} ms {legacy / batched:>7.1f}x '
+              f'{stream * 1000:>9.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-request CPU and log volume of the API logging
+
+Runs a mix of read routes through lambda_handler against an in-memory store, with the log records
+formatted as JSON into a buffer like the Lambda runtime does:
+
+    legacy      aws_lambda_logging.setup() and the whole raw event logged on every invocation,
+                payloads logged in full
+    lazy        configured once, payloads truncated to config.log_payload_limit
+    warning     the routes set to WARNING with config.log_route_levels, nothing is formatted
+
+It also times one eagerly formatted f-string log call against the lazy %-style call, for a job
+board, when the record is filtered out.
+
+Usage (from src/):  python -m benchmarks.bench_logging
+"""
+import io
+import logging
+import time
+import timeit
+import unittest.mock
+
+import aws_lambda_logging
+
+import micro_airlines_api
+import storage
+from config import config
+from storage.memory import InMemoryPlayerRepository
+from utils import logs, utils
+from utils.distances import distance_matrix
+
+PLAYER_ID = 'bench_player'
+ROUTES = ['/v1/player', '/v1/cities', '/v1/planes', '/v1/cities/{city_id}/jobs', '/v1/planes/{plane_id}/suggest-load']
+LOGGER = logging.getLogger()
+
+
+def legacy_lambda_handler(event, context):
+    """
+    lambda_handler as it logged before: setup and the raw event on every invocation
+    """
+    aws_lambda_logging.setup(level='INFO', boto_level='INFO')
+    LOGGER.info(f'Micro Airlines API {micro_airlines_api.__version__}')
+    LOGGER.info({'event': event})
+    start_response = micro_airlines_api.StartResponse()
+    output = micro_airlines_api.app(micro_airlines_api.awsgi.environ(event, context), start_response)
+    return start_response.response(output)
+
+
+def build_player():
+    storage.set_repository(InMemoryPlayerRepository())
+    utils.create_player(PLAYER_ID, balance=100000000)
+    city_ids = ['c1001'] + [city_id for city_id, _ in distance_matrix.nearest('c1001', 9)]
+    for city_id in city_ids:
+        utils.add_city_to_player(PLAYER_ID, city_id)
+    for _ in range(5):
+        utils.add_plane_to_player(PLAYER_ID, 'a1', city_ids[0])
+    _, result = utils.get_player_attributes(PLAYER_ID, ['planes'])
+    return city_ids[0], next(iter(result['planes']))
+
+
+def events(city_id, plane_id):
+    return [{
+        'httpMethod': 'GET',
+        'path': route.format(city_id=city_id, plane_id=plane_id),
+        'queryStringParameters': None,
+        'headers': {'Accept': 'application/json', 'User-Agent': 'bench'},
+        'requestContext': {'authorizer': {'claims': {'cognito:username': PLAYER_ID}}, 'requestId': 'bench'}
+    } for route in ROUTES]
+
+
+def run(handler, requests, repeat):
+    """
+    :return:            CPU microseconds per request, bytes logged per request
+    """
+    buffer = io.StringIO()
+    LOGGER.handlers = [logging.StreamHandler(buffer)]
+    for event in requests:
+        handler(event, None)
+    buffer.seek(0)
+    buffer.truncate()
+
+    started = time.process_time()
+    for _ in range(repeat):
+        for event in requests:
+            handler(event, None)
+    elapsed = time.process_time() - started
+    count = repeat * len(requests)
+    return elapsed / count * 1000000, len(buffer.getvalue()) / count
+
+
+def main(repeat=50):
+    LOGGER.handlers = [logging.StreamHandler(io.StringIO())]
+    requests = events(*build_player())
+    routes = ';'.join(f'GET {rule.rule}=WARNING' for rule in micro_airlines_api.app.url_map.iter_rules())
+
+    print(f'{len(ROUTES)} routes x {repeat}')
+    print(f'{"mode":<10} {"CPU us/request":>15} {"bytes logged/request":>21}')
+    legacy = None
+    for mode, handler, patches in [
+        ('legacy', legacy_lambda_handler, {'log_payload_limit': 0}),
+        ('lazy', micro_airlines_api.lambda_handler, {}),
+        ('warning', micro_airlines_api.lambda_handler, {'log_route_levels': routes}),
+    ]:
+        with unittest.mock.patch.multiple(config, metrics_enabled=False, **patches):
+            cpu, logged = run(handler, requests, repeat)
+        legacy = legacy or cpu
+        print(f'{mode:<10} {cpu:>15.0f} {logged:>21.0f}   {legacy / cpu:.2f}x')
+
+    job_board = {'jobs_expire': 0, 'destinations': ['c1002', 'c1003'], 'consumed': {}}
+    jobs = utils.materialize_job_board(PLAYER_ID, 'c1001', job_board)['jobs']
+    LOGGER.setLevel(logging.WARNING)
+    eager = min(timeit.repeat(lambda: LOGGER.info(f'Generated jobs: {jobs}'), number=1000, repeat=5))
+    lazy = min(timeit.repeat(lambda: LOGGER.info('Generated jobs: %s', logs.truncate(jobs)), number=1000, repeat=5))
+    print(f'\nfiltered log call of a {len(str(jobs))} character job board: '
+          f'f-string {eager * 1000:.1f} us, lazy {lazy * 1000:.1f} us, {eager / lazy:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold start benchmark: time and peak RSS of `import micro_airlines_api` with and without the
+compiled catalog artifact. Each sample runs in a fresh interpreter.
+
+Usage (from src/):  python -m benchmarks.bench_startup
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from definitions.catalog import build_catalog
+
+CATALOG_SNIPPET = '''
+import json, resource, time
+start = time.perf_counter()
+from utils.distances import distance_matrix
+from definitions.catalog import cities
+distance_matrix.distance('c1001', 'c1002')
+cities['c1001']
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+SNIPPET = '''
+import json, resource, time
+start = time.perf_counter()
+import micro_airlines_api
+from utils import utils
+utils.get_distance_between_cities('c1001', 'c1002')
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+def sample(catalog_path, runs, snippet=SNIPPET):
+    env = {**os.environ, 'CATALOG_PATH': catalog_path,
+           'AWS_ACCESS_KEY_ID': 'test', 'AWS_SECRET_ACCESS_KEY': 'test'}
+    results = [json.loads(subprocess.check_output([sys.executable, '-c', snippet], env=env))
+               for _ in range(runs)]
+    return (statistics.median(result['seconds'] for result in results),
+            statistics.median(result['max_rss_kb'] for result in results))
+
+
+def main(runs=10):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact_path = os.path.join(temp_dir, 'catalog.bin')
+        size = build_catalog(artifact_path)
+
+        before = sample(os.path.join(temp_dir, 'missing.bin'), runs)
+        after = sample(artifact_path, runs)
+        catalog_before = sample(os.path.join(temp_dir, 'missing.bin'), runs, CATALOG_SNIPPET)
+        catalog_after = sample(artifact_path, runs, CATALOG_SNIPPET)
+
+    print(f'Catalog artifact size: {size} bytes')
+    print('import micro_airlines_api (first distance lookup included)')
+    print(f'  python definitions:  {before[0] * 1000:7.1f} ms  {before[1] / 1024:6.1f} MB max RSS')
+    print(f'  catalog artifact:    {after[0] * 1000:7.1f} ms  {after[1] / 1024:6.1f} MB max RSS')
+    print('catalog and distance matrix only')
+    print(f'  python definitions:  {catalog_before[0] * 1000:7.1f} ms  {catalog_before[1] / 1024:6.1f} MB max RSS')
+    print(f'  catalog artifact:    {catalog_after[0] * 1000:7.1f} ms  {catalog_after[1] / 1024:6.1f} MB max RSS')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Bytes and capacity per request: original single-item player vs the multi-item layout
+
+Runs the API routes against moto and records every DynamoDB call through botocore events. The
+multi-item numbers are measured from the items each call actually reads or writes; the
+single-item numbers are what the same route costs when every read and write is billed on the
+whole player item.
+
+Usage (from src/):  python -m benchmarks.bench_storage_layout
+"""
+import logging
+import os
+
+from boto3.dynamodb.types import TypeDeserializer
+from moto import mock_dynamodb2
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+
+# Created before the app modules so moto is hooked into botocore before their clients exist
+mock = mock_dynamodb2()
+
+from definitions.catalog import cities  # noqa: E402
+from micro_airlines_api import app  # noqa: E402
+import storage  # noqa: E402
+from storage import layout  # noqa: E402
+from storage.layout import read_units, write_units  # noqa: E402
+from tests import shared_test_utils  # noqa: E402
+from utils import utils  # noqa: E402
+from utils.distances import distance_matrix  # noqa: E402
+
+PLAYER_ID = 'bench_player'
+
+deserializer = TypeDeserializer()
+
+
+class Recorder:
+    """
+    Record bytes read and written and the capacity consumed by each DynamoDB call
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.paused = False
+        self.reset()
+        client.meta.events.register('before-parameter-build.dynamodb', self.before_call)
+        client.meta.events.register('after-call.dynamodb', self.after_call)
+
+    def reset(self):
+        self.calls = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rcu = 0
+        self.wcu = 0
+
+    def stored_size(self, key):
+        self.paused = True
+        item = storage.get_repository().get({name: deserializer.deserialize(value) for name, value in key.items()},
+                                            consistent=True) or {}
+        self.paused = False
+        return layout.item_size(item)
+
+    def before_call(self, params, model, **kwargs):
+        if not self.paused:
+            self.params = params
+
+    def after_call(self, parsed, model, **kwargs):
+        if self.paused:
+            return
+        self.calls += 1
+        operation = model.name
+        consistent = self.params.get('ConsistentRead', False)
+
+        if operation == 'GetItem':
+            size = self.size(parsed.get('Item', {}))
+            self.bytes_read += size
+            self.rcu += read_units(size, consistent)
+        elif operation == 'Query':
+            size = sum(self.size(item) for item in parsed.get('Items', []))
+            self.bytes_read += size
+            self.rcu += read_units(size, consistent)
+        elif operation in ('PutItem', 'UpdateItem'):
+            size = self.stored_size(self.params.get('Key') or {name: self.params['Item'][name]
+                                                               for name in layout.KEY_ATTRIBUTES})
+            self.bytes_written += size
+            self.wcu += write_units(size)
+        elif operation == 'TransactWriteItems':
+            for transact_item in self.params['TransactItems']:
+                (action, params), = transact_item.items()
+                key = params.get('Key') or {name: params['Item'][name] for name in layout.KEY_ATTRIBUTES}
+                size = self.stored_size(key)
+                self.bytes_written += size
+                self.wcu += write_units(size, transactional=True)
+
+    @staticmethod
+    def size(item):
+        # The resource has already deserialized the response by the time after-call handlers run
+        return layout.item_size(item)
+
+
+def whole_player_size():
+    _, player = utils.get_player_attributes(PLAYER_ID, ['player_id', 'balance', 'cities', 'planes'])
+    return layout.item_size(player)
+
+
+def build_player(http_client, city_count, plane_count):
+    utils.create_player(PLAYER_ID, balance=100000000)
+    # Nearest cities first so the first plane always has a destination within range
+    first_city_id = next(iter(cities))
+    city_ids = sorted(cities, key=lambda city_id: distance_matrix.distance(first_city_id, city_id))[:city_count]
+    for city_id in city_ids:
+        utils.add_city_to_player(PLAYER_ID, city_id)
+    for city_id in city_ids:
+        http_client.get(f'/v1/cities/{city_id}/jobs')
+    for i in range(plane_count):
+        utils.add_plane_to_player(PLAYER_ID, 'a1', city_ids[i % city_count])
+    return city_ids
+
+
+def run(recorder, city_count, plane_count):
+    shared_test_utils.create_table()
+    http_client = app.test_client()
+    http_client.environ_base['awsgi.event'] = {
+        'requestContext': {'authorizer': {'claims': {'cognito:username': PLAYER_ID}}}
+    }
+    city_ids = build_player(http_client, city_count, plane_count)
+    _, result = utils.get_player_attributes(PLAYER_ID, ['planes'])
+    plane_id, plane = sorted(result['planes'].items())[0]
+    jobs = http_client.get(f'/v1/cities/{plane["current_city_id"]}/jobs').get_json()['jobs']
+    job_ids = [job_id for job_id, job in jobs.items() if job['job_type'] == plane['capacity_type']][:2]
+    destination = next(city_id for city_id in city_ids
+                       if 0 < utils.get_distance_between_cities(plane['current_city_id'], city_id) <= 900)
+
+    # route, method, path, body, (single-item reads, single-item writes)
+    requests = [
+        ('GET /v1/player', 'get', '/v1/player', None, (1, 0)),
+        ('GET /v1/cities', 'get', '/v1/cities', None, (1, 0)),
+        ('GET /v1/planes', 'get', '/v1/planes', None, (1, 0)),
+        ('GET /v1/cities/<id>/jobs', 'get', f'/v1/cities/{city_ids[0]}/jobs', None, (1, 0)),
+        ('PUT /v1/planes/<id>/load', 'put', f'/v1/planes/{plane_id}/load', {'loaded_jobs': job_ids}, (1, 2)),
+        ('PUT /v1/planes/<id>/depart', 'put', f'/v1/planes/{plane_id}/depart',
+         {'destination_city_id': destination}, (1, 1)),
+    ]
+
+    recorder.paused = False
+    size = whole_player_size()
+    print(f'\n{city_count} cities, {plane_count} planes: single player item {size / 1024:.1f} KB')
+    print(f'{"route":<30} {"single-item":>26} {"multi-item":>36}')
+    print(f'{"":<30} {"KB read":>8} {"RCU":>7} {"WCU":>7}   {"calls":>5} {"KB read":>8} {"RCU":>7} {"WCU":>7}')
+    for route, method, path, body, (reads, writes) in requests:
+        recorder.reset()
+        getattr(http_client, method)(path, json=body)
+        print(f'{route:<30} {reads * size / 1024:>8.1f} {reads * read_units(size):>7.1f} '
+              f'{writes * write_units(size):>7.1f}   {recorder.calls:>5} {recorder.bytes_read / 1024:>8.1f} '
+              f'{recorder.rcu:>7.1f} {recorder.wcu:>7.1f}')
+
+
+def main():
+    logging.disable(logging.INFO)
+    recorder = Recorder(storage.get_repository().table.meta.client)
+    for city_count, plane_count in [(5, 5), (25, 25), (100, 100)]:
+        with mock:
+            recorder.paused = True
+            run(recorder, city_count, plane_count)
+
+
+if __name__ == '__main__':
+    main()
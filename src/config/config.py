@@ -1,3 +1,89 @@
 import os
 
 dynamodb_players_table = os.environ.get('DYNAMODB_PLAYERS_TABLE', 'players')
+
+catalog_path = os.environ.get('CATALOG_PATH', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'definitions', 'catalog.bin'))
+
+market_cache_max_age = int(os.environ.get('MARKET_CACHE_MAX_AGE', 300))
+
+revenue_table_cache_size = int(os.environ.get('REVENUE_TABLE_CACHE_SIZE', 1024))
+
+# Most shortest path trees (plane type, origin, optimize) cached by the route planner
+route_cache_size = int(os.environ.get('ROUTE_CACHE_SIZE', 1024))
+
+# Player storage backend: dynamodb or memory (local simulation and tests)
+player_repository = os.environ.get('PLAYER_REPOSITORY', 'dynamodb')
+
+# Most actions accepted by one /v1/fleet/actions request
+fleet_max_actions = int(os.environ.get('FLEET_MAX_ACTIONS', 200))
+
+# Times a player write is retried when a concurrent write changed the player or the items it was planned from
+# first, after a jittered backoff doubling from the base delay up to the max delay (seconds, see utils.versions)
+version_retries = int(os.environ.get('VERSION_RETRIES', 3))
+retry_base_delay = float(os.environ.get('RETRY_BASE_DELAY', 0.025))
+retry_max_delay = float(os.environ.get('RETRY_MAX_DELAY', 0.5))
+
+# Seed of the random number generators (see utils.rng), unset for fresh entropy per process
+rng_seed = int(os.environ['RNG_SEED']) if os.environ.get('RNG_SEED') else None
+
+# Arrivals are indexed in buckets of this many seconds, the arrivals worker drains every due bucket
+arrival_bucket_seconds = int(os.environ.get('ARRIVAL_BUCKET_SECONDS', 300))
+# How far back the arrivals worker starts when it has never run
+arrival_lookback_seconds = int(os.environ.get('ARRIVAL_LOOKBACK_SECONDS', 3600))
+
+# Log level of the API and of boto, the level of single routes can be set with eg:
+# LOG_ROUTE_LEVELS='GET /v1/planes=WARNING;PUT /v1/planes/<string:plane_id>/load=DEBUG'
+log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+boto_log_level = os.environ.get('BOTO_LOG_LEVEL', 'WARNING').upper()
+log_route_levels = os.environ.get('LOG_ROUTE_LEVELS', '')
+# Most characters of one payload (body, job board, attributes) in a log record
+log_payload_limit = int(os.environ.get('LOG_PAYLOAD_LIMIT', 1000))
+
+# Data store metrics (see utils.metrics), emitted once per invocation in CloudWatch embedded metric format
+metrics_enabled = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+metrics_namespace = os.environ.get('METRICS_NAMESPACE', 'MicroAirlines')
+
+# Sampling profiler (see utils.profiling): fraction of requests profiled, whether the X-Profile header
+# can request a profile, how many functions are reported and where raw stats are dumped (eg: /tmp)
+profile_sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+profile_header = os.environ.get('PROFILE_HEADER', 'false').lower() == 'true'
+profile_top = int(os.environ.get('PROFILE_TOP', 25))
+profile_dir = os.environ.get('PROFILE_DIR')
+
+# DynamoDB client tuning, one resource is created per process and reused across warm invocations
+dynamodb_region = os.environ.get('DYNAMODB_REGION', 'us-east-1')
+dynamodb_max_pool_connections = int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', 10))
+dynamodb_tcp_keepalive = os.environ.get('DYNAMODB_TCP_KEEPALIVE', 'true').lower() == 'true'
+dynamodb_retry_mode = os.environ.get('DYNAMODB_RETRY_MODE', 'standard')
+dynamodb_max_attempts = int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', 3))
+dynamodb_connect_timeout = float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT', 1))
+dynamodb_read_timeout = float(os.environ.get('DYNAMODB_READ_TIMEOUT', 2))
+
+_dynamodb = None
+
+
+def get_dynamodb():
+    """
+    Get the shared boto3 DynamoDB resource, created with its own session on first use
+
+    :return:            boto3 DynamoDB service resource
+    """
+    global _dynamodb
+    if _dynamodb is None:
+        import boto3
+        from botocore.config import Config
+
+        options = {
+            'max_pool_connections': dynamodb_max_pool_connections,
+            'retries': {'mode': dynamodb_retry_mode, 'max_attempts': dynamodb_max_attempts},
+            'connect_timeout': dynamodb_connect_timeout,
+            'read_timeout': dynamodb_read_timeout,
+        }
+        # tcp_keepalive is only available in newer botocore releases
+        if 'tcp_keepalive' in Config.OPTION_DEFAULTS:
+            options['tcp_keepalive'] = dynamodb_tcp_keepalive
+
+        session = boto3.session.Session()
+        _dynamodb = session.resource('dynamodb', region_name=dynamodb_region, config=Config(**options))
+    return _dynamodb
@@ -0,0 +1,275 @@
+"""
+Compiled city and plane catalog
+
+At build time the city and plane definitions are compiled into one compact binary artifact:
+
+    header          magic, format version, city count, plane count, string count
+    city records    fixed-width records (see CITY_RECORD), strings stored as string table indexes
+    plane records   fixed-width records (see PLANE_RECORD)
+    string table    offsets into a utf-8 blob
+
+At runtime the artifact is memory-mapped on first use and City / Plane objects are only created
+for the entries which are actually accessed. When no artifact has been built (local development
+and tests) the catalog falls back to the python definitions.
+
+Usage (from src/):  python -m definitions.catalog [output path]
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+from config import config
+from models.city import City
+from models.plane import Plane
+
+logger = logging.getLogger()
+
+MAGIC = b'MACT'
+FORMAT_VERSION = 1
+
+# magic, format version, city count, plane count, string count
+HEADER = struct.Struct('<4sIIII')
+
+# city_id, name, country (string refs), cost, city_class, layover_size, population, latitude, longitude
+CITY_RECORD = struct.Struct('<IIIiiiddd')
+
+# plane_id, name, capacity_type (string refs), cost, speed, weight, capacity, flight_range, size_class
+PLANE_RECORD = struct.Struct('<IIIiiiiii')
+
+STRING_OFFSET = struct.Struct('<I')
+
+
+def build_catalog(path, city_definitions=None, plane_definitions=None):
+    """
+    Compile the city and plane definitions into a binary catalog artifact
+
+    :param path:                    Output file path
+    :param city_definitions:        (optional) Dict of City objects, defaults to definitions.cities
+    :param plane_definitions:       (optional) Dict of Plane objects, defaults to definitions.planes
+    :return:                        Number of bytes written
+    """
+    if city_definitions is None:
+        from definitions.cities import cities as city_definitions
+    if plane_definitions is None:
+        from definitions.planes import planes as plane_definitions
+
+    strings = {}
+
+    def string_ref(value):
+        return strings.setdefault(value, len(strings))
+
+    city_records = [CITY_RECORD.pack(string_ref(city.city_id), string_ref(city.name),
+                                     string_ref(city.country), city.cost, city.city_class,
+                                     city.layover_size, float(city.population),
+                                     float(city.latitude), float(city.longitude))
+                    for city in city_definitions.values()]
+
+    plane_records = [PLANE_RECORD.pack(string_ref(plane.plane_id), string_ref(plane.name),
+                                       string_ref(plane.capacity_type), plane.cost, plane.speed,
+                                       plane.weight, plane.capacity, plane.flight_range,
+                                       plane.size_class)
+                     for plane in plane_definitions.values()]
+
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    data = b''.join([HEADER.pack(MAGIC, FORMAT_VERSION, len(city_records), len(plane_records), len(encoded)),
+                     *city_records,
+                     *plane_records,
+                     *[STRING_OFFSET.pack(offset) for offset in offsets],
+                     *encoded])
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    logger.info('Wrote catalog with %s cities and %s planes to %s (%s bytes)',
+                len(city_records), len(plane_records), path, len(data))
+    return len(data)
+
+
+class CatalogArtifact:
+    """
+    Read-only view over a memory-mapped catalog artifact
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f'Unsupported catalog artifact: {path}')
+        magic, version, city_count, plane_count, string_count = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Unsupported catalog artifact: {path}')
+
+        self.city_offset = HEADER.size
+        self.plane_offset = self.city_offset + city_count * CITY_RECORD.size
+        self.string_offsets_offset = self.plane_offset + plane_count * PLANE_RECORD.size
+        self.strings_offset = self.string_offsets_offset + (string_count + 1) * STRING_OFFSET.size
+        self.city_count = city_count
+        self.plane_count = plane_count
+
+        self.city_ids = [self.string(self.city_record(i)[0]) for i in range(city_count)]
+        self.plane_ids = [self.string(self.plane_record(i)[0]) for i in range(plane_count)]
+
+    def string(self, ref):
+        """
+        Get a string from the string table
+
+        :param ref:         String table index
+        :return:            Decoded string
+        """
+        start, = STRING_OFFSET.unpack_from(self.buffer, self.string_offsets_offset + ref * STRING_OFFSET.size)
+        end, = STRING_OFFSET.unpack_from(self.buffer, self.string_offsets_offset + (ref + 1) * STRING_OFFSET.size)
+        return self.buffer[self.strings_offset + start:self.strings_offset + end].decode('utf-8')
+
+    def city_record(self, i):
+        return CITY_RECORD.unpack_from(self.buffer, self.city_offset + i * CITY_RECORD.size)
+
+    def plane_record(self, i):
+        return PLANE_RECORD.unpack_from(self.buffer, self.plane_offset + i * PLANE_RECORD.size)
+
+    def city(self, i):
+        """
+        Create the City object for a city record
+
+        :param i:           Record index
+        :return:            City object
+        """
+        (city_id, name, country, cost, city_class, layover_size,
+         population, latitude, longitude) = self.city_record(i)
+        return City(city_id=self.string(city_id),
+                    name=self.string(name),
+                    country=self.string(country),
+                    cost=cost,
+                    city_class=city_class,
+                    population=population,
+                    layover_size=layover_size,
+                    latitude=latitude,
+                    longitude=longitude)
+
+    def plane(self, i):
+        """
+        Create the Plane object for a plane record
+
+        :param i:           Record index
+        :return:            Plane object
+        """
+        (plane_id, name, capacity_type, cost, speed, weight,
+         capacity, flight_range, size_class) = self.plane_record(i)
+        return Plane(plane_id=self.string(plane_id),
+                     name=self.string(name),
+                     cost=cost,
+                     speed=speed,
+                     weight=weight,
+                     capacity_type=self.string(capacity_type),
+                     capacity=capacity,
+                     flight_range=flight_range,
+                     size_class=size_class)
+
+    def coordinates(self):
+        """
+        Get the latitude and longitude columns of the city records
+
+        :return:            Tuple of lists (latitudes, longitudes) in decimal degrees
+        """
+        records = [self.city_record(i) for i in range(self.city_count)]
+        return [record[7] for record in records], [record[8] for record in records]
+
+
+_artifact = None
+
+
+def get_artifact():
+    """
+    Load the catalog artifact once per process
+
+    :return:            CatalogArtifact or None if no artifact has been built
+    """
+    global _artifact
+    if _artifact is None and os.path.exists(config.catalog_path):
+        logger.info('Loading catalog artifact: %s', config.catalog_path)
+        _artifact = CatalogArtifact(config.catalog_path)
+    return _artifact
+
+
+class LazyCatalog(Mapping):
+    """
+    Read-only dict of catalog objects which are only created when first accessed
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._ids = None
+        self._index = None
+        self._objects = {}
+        self._factory = None
+        self._source = None
+
+    def _load(self):
+        if self._ids is not None:
+            return
+        artifact = get_artifact()
+        if artifact:
+            self._ids = artifact.city_ids if self.kind == 'cities' else artifact.plane_ids
+            self._factory = artifact.city if self.kind == 'cities' else artifact.plane
+        else:
+            # Packages are built with the artifact (see build.sh), without it every cold start imports the definitions
+            logger.warning('Catalog artifact %s not found, loading the %s definitions', config.catalog_path, self.kind)
+            if self.kind == 'cities':
+                from definitions.cities import cities as source
+            else:
+                from definitions.planes import planes as source
+            self._source = source
+            self._ids = list(source.keys())
+            self._factory = lambda i: source[self._ids[i]]
+        self._index = {key: i for i, key in enumerate(self._ids)}
+
+    def __getitem__(self, key):
+        obj = self._objects.get(key)
+        if obj is None:
+            self._load()
+            obj = self._objects[key] = self._factory(self._index[key])
+        return obj
+
+    def __iter__(self):
+        self._load()
+        return iter(self._ids)
+
+    def __len__(self):
+        self._load()
+        return len(self._ids)
+
+    def __contains__(self, key):
+        self._load()
+        return key in self._index
+
+
+def coordinates(city_catalog):
+    """
+    Get the latitude and longitude of every city, ordered as the catalog keys. When the catalog is
+    backed by an artifact the records are read directly without creating any City objects.
+
+    :param city_catalog:        Dict (or LazyCatalog) of City objects
+    :return:                    Tuple of lists (latitudes, longitudes) in decimal degrees
+    """
+    if isinstance(city_catalog, LazyCatalog):
+        city_catalog._load()
+        if city_catalog._source is None:
+            return get_artifact().coordinates()
+
+    return ([float(city.latitude) for city in city_catalog.values()],
+            [float(city.longitude) for city in city_catalog.values()])
+
+
+cities = LazyCatalog('cities')
+planes = LazyCatalog('planes')
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_catalog(sys.argv[1] if len(sys.argv) > 1 else config.catalog_path)
@@ -1,31 +1,31 @@
 import logging
-import time
 
-import boto3
 from flask import Blueprint, make_response, request
 
-from config import config
-from utils import utils
+from utils import clock, logs, projection, utils
 
 blueprint = Blueprint('cities', __name__)
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-table = dynamodb.Table(name=config.dynamodb_players_table)
 logger = logging.getLogger()
 
 
 @blueprint.route('/v1/cities', methods=['GET'])
 def get_player_cities():
     """
-    Get cities for a player
+    Get cities for a player. Query parameters: fields (eg: cities.*.name,cities.c1001.jobs_expire),
+    limit and cursor (returned with the previous page), see utils.projection.
 
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received GET request from player: "{player_id}" for path: "/v1/cities"')
+    logger.info('Received GET request from player: "%s" for path: "/v1/cities" with args: "%s"',
+                player_id, logs.truncate(request.args.to_dict()))
 
-    success, result = utils.get_player_attributes(player_id=player_id,
-                                                  attributes_to_get=['cities'])
+    success, page = projection.parse_page(request.args, 'cities')
+    if not success:
+        return make_response(page, 400)
+
+    success, result = utils.get_cities(player_id, *page)
     if success:
         return make_response(result, 200)
     else:
@@ -41,8 +41,8 @@ def create_city():
     """
     player_id = utils.get_username()
     body = request.get_json(force=True)
-    logger.info(f'Received POST request from player: "{player_id}" '
-                f'for path: "/v1/cities" with body: "{body}"')
+    logger.info('Received POST request from player: "%s" for path: "/v1/cities" with body: "%s"',
+                player_id, logs.truncate(body))
 
     requested_city_id = body.get('city')
 
@@ -58,38 +58,68 @@ def create_city():
 @blueprint.route('/v1/cities/<string:city_id>/jobs', methods=['GET'])
 def get_player_city_jobs(city_id):
     """
-    Get jobs for a player's city
+    Get jobs for a player's city. Query parameters: fields (eg: jobs.*.revenue), limit and cursor
+    (returned with the previous page), see utils.projection.
 
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received GET request from player: "{player_id}" '
-                f'for path: "/v1/cities/{city_id}/jobs"')
+    logger.info('Received GET request from player: "%s" for path: "/v1/cities/%s/jobs" with args: "%s"',
+                player_id, city_id, logs.truncate(request.args.to_dict()))
 
-    success, result = utils.get_player_attributes(player_id=player_id,
-                                                  attributes_to_get=['cities'])
+    success, page = projection.parse_page(request.args, 'jobs')
     if not success:
-        return make_response(result, 400)
+        return make_response(page, 400)
 
-    player_cities = result.get('cities', {})
-    if not player_cities or len(player_cities) < 2:
-        return make_response('Player does not own enough cities', 400)
-
-    player_city = player_cities.get(city_id)
-    if not player_city:
-        return make_response('Player does not own city', 400)
+    # Only the city and its job board are read, the other cities only when a new window starts
+    success, player_city = utils.get_city(player_id, city_id)
+    if not success:
+        return make_response(player_city, 400)
 
-    if player_city.get('jobs_expire') > time.time():
+    if player_city.get('jobs_expire') > clock.now():
         logging.info('Jobs have not expired, sending current jobs')
-        return make_response({
-            'jobs': player_city.get('jobs'),
-            'jobs_expire': player_city.get('jobs_expire')
-        }, 200)
+        jobs, jobs_expire = player_city.get('jobs'), player_city.get('jobs_expire')
+    else:
+        player_city_ids = utils.get_city_ids(player_id)
+        if len(player_city_ids) < 2:
+            return make_response('Player does not own enough cities', 400)
+
+        logging.info('Jobs have expired, generating new jobs')
+        jobs, jobs_expire = utils.update_city_with_new_jobs(player_id, city_id, player_city_ids)
+
+    requested, limit, cursor = page
+    jobs, next_cursor = projection.paginate(projection.select(jobs, requested), limit, cursor)
+    result = {'jobs': jobs, 'jobs_expire': jobs_expire}
+    if next_cursor:
+        result['cursor'] = next_cursor
+    return make_response(result, 200)
 
-    logging.info('Jobs have expired, generating new jobs')
-    new_jobs, jobs_expire = utils.update_city_with_new_jobs(player_id, city_id, player_cities)
 
-    return make_response({
-        'jobs': new_jobs,
-        'jobs_expire': jobs_expire
-    }, 200)
+@blueprint.route('/v1/cities/<string:city_id>/reachable', methods=['GET'])
+def get_reachable_cities(city_id):
+    """
+    Get the cities within a range of a city, nearest first. Query parameters: range (miles) and/or
+    limit (most cities), owned=true to only return cities owned by the player.
+
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    logger.info('Received GET request from player: "%s" for path: "/v1/cities/%s/reachable" with args: "%s"',
+                player_id, city_id, logs.truncate(request.args.to_dict()))
+
+    flight_range = request.args.get('range')
+    limit = request.args.get('limit')
+    if flight_range is None and limit is None:
+        return make_response('range or limit is a required parameter', 400)
+    if not all(value is None or value.isdigit() for value in (flight_range, limit)):
+        return make_response('range and limit must be whole numbers', 400)
+
+    success, result = utils.get_reachable_cities(
+        player_id, city_id,
+        flight_range=int(flight_range) if flight_range is not None else None,
+        owned=request.args.get('owned', 'false').lower() == 'true',
+        limit=int(limit) if limit is not None else None)
+    if not success:
+        return make_response(result, 400)
+
+    return make_response({'cities': result}, 200)
@@ -0,0 +1,35 @@
+import logging
+
+from flask import Blueprint, request, make_response
+
+from config import config
+from utils import fleet, logs, utils
+
+blueprint = Blueprint('fleet', __name__)
+logger = logging.getLogger()
+
+
+@blueprint.route('/v1/fleet/actions', methods=['POST'])
+def fleet_actions():
+    """
+    Load, depart and unload many planes in one request
+
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    body = request.get_json(force=True)
+    logger.info('Received POST request from player: "%s" for path: "/v1/fleet/actions" with body: "%s"',
+                player_id, logs.truncate(body))
+
+    actions = body.get('actions')
+    if not actions or not isinstance(actions, list) or not all(isinstance(action, dict) for action in actions):
+        return make_response('actions is a required field', 400)
+
+    if len(actions) > config.fleet_max_actions:
+        return make_response(f'A maximum of {config.fleet_max_actions} actions is allowed', 400)
+
+    success, result = fleet.apply_fleet_actions(player_id, actions)
+    if not success:
+        return make_response(result, 400)
+
+    return make_response(result, 200)
@@ -1,16 +1,12 @@
 import logging
 
-import boto3
-from flask import Blueprint, make_response
+from flask import Blueprint
 
-from definitions.cities import cities
-from definitions.planes import planes
-from config import config
+from definitions.catalog import cities, planes
+from utils import response_cache
 
 blueprint = Blueprint('market', __name__)
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-table = dynamodb.Table(name=config.dynamodb_players_table)
 logger = logging.getLogger()
 
 
@@ -22,8 +18,18 @@ def get_available_cities():
     :return: API Gateway dictionary response
     """
     logger.info('Received GET request for path: "/v1/market/cities"')
-    cities_serialized = [city.serialize() for city_id, city in cities.items()]
-    return make_response({'cities': cities_serialized}, 200)
+    return response_cache.cached_response('market_cities', render_available_cities)
+
+
+def render_available_cities():
+    """
+    Render the cities available in the market. The job window of a new City is set from the clock when it
+    is created, it is sent as 0 (no window started) so every container renders (and tags with an ETag) the
+    same body.
+
+    :return: Dict of serialized cities
+    """
+    return {'cities': [{**city.serialize(), 'jobs_expire': 0} for city_id, city in cities.items()]}
 
 
 @blueprint.route('/v1/market/planes', methods=['GET'])
@@ -52,5 +58,13 @@ def get_available_planes():
     #
     # make_response(market_planes, 200)
 
-    planes_serialized = [plane.serialize() for plane_id, plane in planes.items()]
-    return make_response({'planes': planes_serialized}, 200)
+    return response_cache.cached_response('market_planes', render_available_planes)
+
+
+def render_available_planes():
+    """
+    Render the planes available in the market
+
+    :return: Dict of serialized planes
+    """
+    return {'planes': [plane.serialize() for plane_id, plane in planes.items()]}
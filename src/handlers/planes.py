@@ -1,9 +1,9 @@
 import logging
-import time
 
 from flask import Blueprint, request, make_response
 
-from utils import utils
+from models.plane import IN_FLIGHT
+from utils import logs, projection, utils
 
 blueprint = Blueprint('planes', __name__)
 logger = logging.getLogger()
@@ -12,14 +12,20 @@ logger = logging.getLogger()
 @blueprint.route('/v1/planes', methods=['GET'])
 def get_planes():
     """
-    Get planes for a player
+    Get planes for a player. Query parameters: fields (eg: planes.*.current_city_id), limit and cursor
+    (returned with the previous page), see utils.projection.
 
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received GET request from player: "{player_id}" for path: "/v1/planes"')
-    success, result = utils.get_player_attributes(player_id=player_id,
-                                                  attributes_to_get=['planes'])
+    logger.info('Received GET request from player: "%s" for path: "/v1/planes" with args: "%s"',
+                player_id, logs.truncate(request.args.to_dict()))
+
+    success, page = projection.parse_page(request.args, 'planes')
+    if not success:
+        return make_response(page, 400)
+
+    success, result = utils.get_planes(player_id, *page)
     if success:
         return make_response(result, 200)
     else:
@@ -35,8 +41,8 @@ def create_plane():
     """
     player_id = utils.get_username()
     body = request.get_json(force=True)
-    logger.info(f'Received POST request from player: "{player_id}" '
-                f'for path: "/v1/planes" with body: "{body}"')
+    logger.info('Received POST request from player: "%s" for path: "/v1/planes" with body: "%s"',
+                player_id, logs.truncate(body))
     requested_plane_id = body.get('plane')
     starting_city_id = body.get('city')
 
@@ -59,57 +65,55 @@ def plane_load(plane_id):
     """
     player_id = utils.get_username()
     body = request.get_json(force=True)
-    logger.info(f'Received PUT request from player: "{player_id}" '
-                f'for path: "/v1/planes/{plane_id}/load" with body: "{body}"')
+    logger.info('Received PUT request from player: "%s" for path: "/v1/planes/%s/load" with body: "%s"',
+                player_id, plane_id, logs.truncate(body))
 
-    success, result = utils.get_player_attributes(player_id=player_id,
-                                                  attributes_to_get=['cities', 'planes'])
+    success, result = utils.load_plane(player_id, plane_id, body.get('loaded_jobs'))
     if not success:
         return make_response(result, 400)
 
-    player_cities = result.get('cities', {})
-    player_plane = result.get('planes', {}).get(plane_id)
-
-    if not player_plane:
-        return make_response('Invalid plane_id', 400)
-
-    if player_plane.get('eta', 0) > 0:
-        return make_response('Plane is currently in flight', 400)
+    return make_response('Loaded plane successfully', 200)
 
-    if not body.get('loaded_jobs'):
-        return make_response('loaded_jobs is a required field', 400)
 
-    # Handle new jobs
-    job_ids = body.get('loaded_jobs')
-    source_city = player_cities.get(player_plane.get('current_city_id'))
+@blueprint.route('/v1/planes/<string:plane_id>/suggest-load', methods=['GET'])
+def plane_suggest_load(plane_id):
+    """
+    Suggest the revenue maximizing jobs to load onto a plane. Query parameters: destination_city_id
+    to only suggest jobs to that city, by_destination=true to only suggest jobs to the best
+    destination within range.
 
-    if len(job_ids) > player_plane.get('capacity') - len(player_plane.get('loaded_jobs')):
-        return make_response('Not enough capacity', 400)
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    logger.info('Received GET request from player: "%s" for path: "/v1/planes/%s/suggest-load" with args: "%s"',
+                player_id, plane_id, logs.truncate(request.args.to_dict()))
 
-    if time.time() > source_city.get('jobs_expire'):
-        return make_response('Jobs have expired', 400)
+    success, result = utils.suggest_load(
+        player_id, plane_id,
+        destination_city_id=request.args.get('destination_city_id'),
+        by_destination=request.args.get('by_destination', 'false').lower() == 'true')
+    if not success:
+        return make_response(result, 400)
 
-    try:
-        # Get job definitions from job ids
-        jobs = {job_id: source_city['jobs'][job_id] for job_id in job_ids}
-    except KeyError:
-        return make_response('One or more job ids is invalid', 400)
+    return make_response(result, 200)
 
-    # Check if the jobs match the plane type (P or C)
-    if any([job for job in jobs.values()
-            if job.get('job_type') != player_plane.get('capacity_type')]):
-        return make_response('Plane is incompatible with one or more job types', 400)
 
-    # Combine new jobs with existing loaded jobs
-    jobs = {**player_plane.get('loaded_jobs'), **jobs}
+@blueprint.route('/v1/planes/<string:plane_id>/status', methods=['GET'])
+def plane_status(plane_id):
+    """
+    Get the flight state of a plane: state (grounded, in_flight or arrived) and, unless grounded,
+    departed_at, arrives_at and seconds_remaining
 
-    updated, result = utils.add_jobs_to_plane(player_id, plane_id, jobs)
-    if not updated:
-        return make_response(result, 400)
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    logger.info('Received GET request from player: "%s" for path: "/v1/planes/%s/status"', player_id, plane_id)
 
-    utils.remove_jobs_from_city(player_id, source_city.get('city_id'), job_ids)
+    success, result = utils.get_flight_status(player_id, plane_id)
+    if not success:
+        return make_response(result, 404)
 
-    return make_response('Loaded plane successfully', 200)
+    return make_response(result, 200)
 
 
 @blueprint.route('/v1/planes/<string:plane_id>/depart', methods=['PUT'])
@@ -121,24 +125,16 @@ def plane_depart(plane_id):
     """
     player_id = utils.get_username()
     body = request.get_json(force=True)
-    logger.info(f'Received PUT request from player: "{player_id}" '
-                f'for path: "/v1/planes/{plane_id}/depart" with body: "{body}"')
+    logger.info('Received PUT request from player: "%s" for path: "/v1/planes/%s/depart" with body: "%s"',
+                player_id, plane_id, logs.truncate(body))
 
     if not body.get('destination_city_id'):
         return make_response('destination_city_id is a required field', 400)
 
-    success, result = utils.get_player_attributes(player_id=player_id,
-                                                  attributes_to_get=['cities', 'planes'])
+    # Only the attributes a departure is planned from are read, not the loaded jobs
+    success, player_plane = utils.get_plane(player_id, plane_id, attributes=utils.DEPARTURE_ATTRIBUTES)
     if not success:
-        return make_response(result, 400)
-
-    player_plane = result.get('planes', {}).get(plane_id)
-
-    if not player_plane:
-        return make_response('Invalid plane_id', 400)
-
-    if player_plane.get('eta', 0) > 0:
-        return make_response('Plane is currently in flight', 400)
+        return make_response(player_plane, 400)
 
     success, result = utils.depart_plane(player_id, plane_id, player_plane,
                                          body.get('destination_city_id'))
@@ -156,13 +152,16 @@ def plane_arrive(plane_id):
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received PUT request from player: "{player_id}" '
-                f'for path: "/v1/planes/{plane_id}/unload"')
-    success, result = utils.get_player_attributes(player_id=player_id, attributes_to_get=['planes'])
-    if not success:
-        return make_response(result, 400)
+    logger.info('Received PUT request from player: "%s" for path: "/v1/planes/%s/unload"', player_id, plane_id)
+
+    # Clients poll unload until the plane lands, answer them with a projected read of the plane
+    success, result = utils.get_flight_status(player_id, plane_id)
+    if success and result['state'] == IN_FLIGHT:
+        return make_response('Plane has not yet landed', 400)
 
-    player_plane = result.get('planes', {}).get(plane_id)
+    success, player_plane = utils.get_plane(player_id, plane_id)
+    if not success:
+        return make_response(player_plane, 400)
 
     landed, result = utils.handle_plane_landed(player_id, plane_id, player_plane)
     if landed:
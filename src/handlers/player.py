@@ -1,15 +1,11 @@
 import logging
 
-import boto3
 from flask import Blueprint, make_response
 
 from utils import utils
-from config import config
 
 blueprint = Blueprint('player', __name__)
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-table = dynamodb.Table(name=config.dynamodb_players_table)
 logger = logging.getLogger()
 
 
@@ -21,7 +17,7 @@ def get_player():
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received GET request from player: "{player_id}" for path: "/v1/player"')
+    logger.info('Received GET request from player: "%s" for path: "/v1/player"', player_id)
 
     success, result = utils.get_player_attributes(player_id=player_id,
                                                   attributes_to_get=['player_id', 'balance'])
@@ -39,8 +35,7 @@ def create_player():
     :return: API Gateway dictionary response
     """
     player_id = utils.get_username()
-    logger.info(f'Received POST request from player: "{player_id}" '
-                f'for path: "/v1/player"')
+    logger.info('Received POST request from player: "%s" for path: "/v1/player"', player_id)
 
     created, message = utils.create_player(player_id, balance=100000)
     if not created:
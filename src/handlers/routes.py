@@ -0,0 +1,37 @@
+import logging
+
+from flask import Blueprint, make_response, request
+
+from utils import logs, routes, utils
+
+blueprint = Blueprint('routes', __name__)
+
+logger = logging.getLogger()
+
+
+@blueprint.route('/v1/routes', methods=['GET'])
+def get_route():
+    """
+    Plan a multi-leg route between two cities owned by the player. Query parameters: plane_id (plane
+    type from the catalog), origin_city_id, destination_city_id and optimize (time or hops, defaults
+    to time).
+
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    logger.info('Received GET request from player: "%s" for path: "/v1/routes" with args: "%s"',
+                player_id, logs.truncate(request.args.to_dict()))
+
+    for parameter in ['plane_id', 'origin_city_id', 'destination_city_id']:
+        if not request.args.get(parameter):
+            return make_response(f'{parameter} is a required parameter', 400)
+
+    success, result = routes.plan_route(player_id,
+                                        plane_id=request.args['plane_id'],
+                                        origin_city_id=request.args['origin_city_id'],
+                                        destination_city_id=request.args['destination_city_id'],
+                                        optimize=request.args.get('optimize', 'time'))
+    if not success:
+        return make_response(result, 400)
+
+    return make_response({'route': result}, 200)
@@ -0,0 +1,32 @@
+import logging
+
+from flask import Blueprint, make_response, request
+
+from utils import logs, utils
+
+blueprint = Blueprint('sync', __name__)
+
+logger = logging.getLogger()
+
+
+@blueprint.route('/v1/sync', methods=['GET'])
+def get_sync():
+    """
+    Get the cities, planes and jobs of a player changed since a version. Query parameters: since
+    (the version of the last sync, omit or 0 for everything).
+
+    :return: API Gateway dictionary response
+    """
+    player_id = utils.get_username()
+    logger.info('Received GET request from player: "%s" for path: "/v1/sync" with args: "%s"',
+                player_id, logs.truncate(request.args.to_dict()))
+
+    since = request.args.get('since', '0')
+    if not since.isdigit():
+        return make_response('since must be a version number', 400)
+
+    success, result = utils.get_changes(player_id, int(since))
+    if not success:
+        return make_response(result, 404)
+
+    return make_response(result, 200)
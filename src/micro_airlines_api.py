@@ -1,20 +1,63 @@
 import logging
+import time
 
 import awsgi
-import aws_lambda_logging
-from flask import Flask
+from flask import Flask, g, request
 from flask_cors import CORS
 
 from _version import __version__
-from handlers import planes, player, cities, market
+from handlers import planes, player, cities, market, fleet, routes, sync
+from utils import logs, metrics, profiling
 
 LOGGER = logging.getLogger()
+# Route of the requests no rule matched (eg: 404s), kept as one metric dimension and histogram
+UNMATCHED_ROUTE = '<unmatched>'
 app = Flask(__name__)
 CORS(app)
 app.register_blueprint(cities.blueprint)
+app.register_blueprint(fleet.blueprint)
 app.register_blueprint(market.blueprint)
 app.register_blueprint(planes.blueprint)
 app.register_blueprint(player.blueprint)
+app.register_blueprint(routes.blueprint)
+app.register_blueprint(sync.blueprint)
+
+
+@app.before_request
+def start_request():
+    """
+    Tag the metrics of the request with its route, set the log level of the route, start timing
+    the request and profile it when sampled
+    """
+    g.route = f'{request.method} {request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE}'
+    metrics.set_route(g.route)
+    logs.set_route_level(g.route)
+    g.profile = profiling.start() if profiling.should_profile(request.headers) else None
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def finish_request(response):
+    """
+    Record the wall time of the request in the latency histogram of its route
+    """
+    duration = (time.perf_counter() - g.started) * 1000
+    metrics.record_duration(duration)
+    if g.profile:
+        profiling.stop(g.profile, g.route, duration)
+    return response
+
+
+class StartResponse(awsgi.StartResponse_GW):
+    """
+    Base64 encode compressed bodies so API Gateway can return them as binary
+    """
+
+    def use_binary_response(self, headers, body):
+        if 'Content-Encoding' in headers:
+            return True
+        # Bodiless responses (eg: 304 Not Modified) have no Content-Type
+        return 'Content-Type' in headers and super().use_binary_response(headers, body)
 
 
 def lambda_handler(event, context):
@@ -25,10 +68,15 @@ def lambda_handler(event, context):
     :param context: AWS Lambda context
     :return: Service response
     """
-    aws_lambda_logging.setup(level='INFO', boto_level='INFO')
-    LOGGER.info(f'Micro Airlines API {__version__}')
-    LOGGER.info({'event': event})
-    return awsgi.response(app, event, context)
+    logs.setup()
+    LOGGER.info('Micro Airlines API %s: %s %s', __version__, event.get('httpMethod'), event.get('path'))
+    LOGGER.debug('Event: %s', logs.truncate(event))
+    metrics.start_invocation()
+    start_response = StartResponse()
+    output = app(awsgi.environ(event, context), start_response)
+    response = start_response.response(output)
+    metrics.emit()
+    return response
 
 
 if __name__ == '__main__':
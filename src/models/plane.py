@@ -1,5 +1,9 @@
 from models.base_model import BaseModel
 
+# Stored flight states of a plane, see utils.flights
+GROUNDED = 'grounded'
+IN_FLIGHT = 'in_flight'
+
 
 class Plane(BaseModel):
 
@@ -17,3 +21,4 @@ class Plane(BaseModel):
         self.loaded_jobs = {}
         self.current_city_id = current_city_id
         self.destination_city_id = destination_city_id
+        self.state = GROUNDED
@@ -0,0 +1,20 @@
+"""
+Offline game economy simulation
+
+Agents (simulation.agent) play the game through the real utils game logic against an
+InMemoryPlayerRepository and a FakeClock: they buy cities and planes, load the suggested jobs,
+depart, and the arrivals worker lands their planes as the virtual clock moves. Players are split
+into shards, one per process, and every shard counts the reads and writes its store receives
+(simulation.counting) with the capacity DynamoDB would bill for them.
+
+The results forecast the load of a number of players (operations, items and capacity units per
+operation, conditional check failures), the growth of the stored items and the game economy
+(revenue, balances) without running real traffic.
+
+The game logic stores players in the multi-item layout of storage.layout (one item per profile,
+city, job board and plane, plus the arrivals index), so the counts are those of that layout, not
+of the original single-item player schema (one item holding the whole player). The single-item
+schema is no longer implemented and can not be simulated; its load is not forecast here.
+
+Usage (from src/):  python -m simulation --players 100 --processes 4 --ticks 288 --seed 1
+"""
@@ -0,0 +1,49 @@
+import argparse
+import logging
+import os
+
+from simulation.engine import simulate
+
+
+def print_report(result):
+    game_hours = result['game_seconds'] / 3600
+    actions = sum(result['actions'].values()) + result['landings']['landed']
+    print(f'{result["players"]} players, {game_hours:.0f} game hours in {result["elapsed"]:.1f}s: '
+          f'{actions / result["elapsed"]:.0f} actions/s')
+    print(f'actions: {result["actions"]}, landings: {result["landings"]}')
+
+    balances = sorted(result['balances'])
+    print(f'revenue: {result["revenue"]} ({result["revenue"] / result["players"] / game_hours:.0f} per player hour), '
+          f'balance min/median/max: {balances[0]}/{balances[len(balances) // 2]}/{balances[-1]}')
+
+    print('\nReads and writes of the multi-item layout (storage.layout):')
+    print(f'{"operation":<10} {"calls":>9} {"items":>9} {"KB":>10} {"units":>10} {"units/player hour":>18} '
+          f'{"failed":>7}')
+    for operation, counts in sorted(result['operations'].items()):
+        print(f'{operation:<10} {counts["calls"]:>9} {counts["items"]:>9} {counts["bytes"] / 1024:>10.1f} '
+              f'{counts["units"]:>10.1f} {counts["units"] / result["players"] / game_hours:>18.2f} '
+              f'{result["conditional_failures"].get(operation, 0):>7}')
+
+    print(f'\n{"game hour":>9} {"items":>9} {"KB":>10} {"largest player KB":>18}  largest item KB')
+    for sample in result['samples']:
+        largest_item = ', '.join(f'{entity_type} {size / 1024:.2f}'
+                                 for entity_type, size in sorted(sample['largest_item'].items()))
+        print(f'{sample["game_seconds"] / 3600:>9.0f} {sample["items"]:>9} {sample["bytes"] / 1024:>10.1f} '
+              f'{sample["largest_player"] / 1024:>18.2f}  {largest_item}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the game economy and its storage load')
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--ticks', type=int, default=288, help='turns to play, 288 five minute turns is one day')
+    parser.add_argument('--tick-seconds', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print_report(simulate(args.players, min(args.processes, args.players), args.ticks, args.tick_seconds, args.seed))
+
+
+if __name__ == '__main__':
+    main()
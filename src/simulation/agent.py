@@ -0,0 +1,109 @@
+"""
+Simulated player
+"""
+from definitions.catalog import cities, planes
+from models.plane import GROUNDED
+from utils import flights, utils
+from utils.distances import distance_matrix
+
+STARTING_BALANCE = 100000
+
+
+class Agent:
+    """
+    Player which plays the game through utils the way a client plays it through the API: it buys
+    the cities nearest to its home city and planes while it can afford them, loads every plane on
+    the ground with the suggested jobs and departs it. Planes are landed by the arrivals worker.
+    """
+
+    def __init__(self, player_id, generator, max_cities=8, max_planes=4):
+        """
+        :param player_id:       Player ID
+        :param generator:       numpy Generator for the decisions of the agent
+        :param max_cities:      (optional) Most cities to buy
+        :param max_planes:      (optional) Most planes to buy
+        """
+        self.player_id = player_id
+        self.generator = generator
+        self.max_cities = max_cities
+        self.max_planes = max_planes
+        home_city_id = distance_matrix.city_ids[int(generator.integers(len(distance_matrix.city_ids)))]
+        self.wanted_cities = [home_city_id] + [city_id for city_id, _ in
+                                               distance_matrix.nearest(home_city_id, max_cities - 1)]
+        self.cities = []
+        self.planes = {}
+        self.spent = 0
+        self.counts = {'cities': 0, 'planes': 0, 'loads': 0, 'jobs': 0, 'departures': 0, 'failures': 0}
+
+    def start(self):
+        """
+        Create the player with the same balance as POST /v1/player
+        """
+        utils.create_player(self.player_id, balance=STARTING_BALANCE)
+
+    def step(self):
+        """
+        Play one turn: buy what the agent can afford, then load and depart the planes on the ground
+        """
+        self.buy()
+        _, result = utils.get_player_attributes(self.player_id, ['planes'])
+        self.planes = result.get('planes') or {}
+        for plane_id, plane in sorted(self.planes.items()):
+            if flights.status(plane) == GROUNDED:
+                self.fly(plane_id, plane)
+
+    def buy(self):
+        balance = utils.get_balance(self.player_id)
+        if len(self.cities) < len(self.wanted_cities):
+            city_id = self.wanted_cities[len(self.cities)]
+            cost = int(cities[city_id].cost)
+            if balance >= cost and self.record(utils.add_city_to_player(self.player_id, city_id), 'cities', cost):
+                self.cities.append(city_id)
+                balance -= cost
+
+        if len(self.cities) >= 2 and len(self.planes) < self.max_planes:
+            plane_id = sorted(planes)[int(self.generator.integers(len(planes)))]
+            cost = int(planes[plane_id].cost)
+            if balance >= cost:
+                city_id = self.cities[int(self.generator.integers(len(self.cities)))]
+                self.record(utils.add_plane_to_player(self.player_id, plane_id, city_id), 'planes', cost)
+
+    def fly(self, plane_id, plane):
+        """
+        Load a plane on the ground with the suggested jobs and depart it to their destination, or
+        to another owned city in range when there is nothing to load
+        """
+        success, load = utils.suggest_load(self.player_id, plane_id, by_destination=True)
+        if not success and load == 'Jobs have expired':
+            utils.update_city_with_new_jobs(self.player_id, plane['current_city_id'], self.cities)
+            success, load = utils.suggest_load(self.player_id, plane_id, by_destination=True)
+        if not success:
+            self.counts['failures'] += 1
+            return
+
+        if load['loaded_jobs']:
+            loaded, result = utils.load_plane(self.player_id, plane_id, list(load['loaded_jobs']))
+            if not self.record((loaded, result), 'loads'):
+                return
+            self.counts['jobs'] += len(load['loaded_jobs'])
+            plane = {**plane, 'loaded_jobs': result['planes'][plane_id]['loaded_jobs']}
+
+        destination_city_id = load['destination_city_id'] or self.reposition(plane)
+        if destination_city_id:
+            self.record(utils.depart_plane(self.player_id, plane_id, plane, destination_city_id), 'departures')
+
+    def reposition(self, plane):
+        in_range = [city_id for city_id, _ in
+                    distance_matrix.within(plane['current_city_id'], int(plane['flight_range']), set(self.cities))]
+        if not in_range:
+            return None
+        return in_range[int(self.generator.integers(len(in_range)))]
+
+    def record(self, result, name, cost=0):
+        success, _ = result
+        if success:
+            self.counts[name] += 1
+            self.spent += cost
+        else:
+            self.counts['failures'] += 1
+        return success
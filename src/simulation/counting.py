@@ -0,0 +1,89 @@
+"""
+Repository which counts the reads and writes of the game logic
+"""
+from storage import layout
+from storage.repository import ConditionalCheckFailed, PlayerRepository, Put, Update
+
+
+class CountingRepository(PlayerRepository):
+    """
+    Wrap a repository and count, per operation, the calls, items, bytes and capacity units the
+    same calls would consume on DynamoDB
+    """
+
+    def __init__(self, repository):
+        """
+        :param repository:      PlayerRepository which stores the items
+        """
+        self.repository = repository
+        self.operations = {}
+        self.conditional_failures = {}
+
+    def get(self, key, attributes=None, consistent=False):
+        item = self.repository.get(key, attributes, consistent)
+        size = layout.item_size(item or {})
+        self.count('get', 1 if item else 0, size, layout.read_units(size, consistent))
+        return item
+
+    def batch_get(self, keys, attributes=None, consistent=False):
+        items = self.repository.batch_get(keys, attributes, consistent)
+        # Each item of a batch is billed on its own size
+        sizes = [layout.item_size(item) for item in items if item]
+        self.count('batch_get', len(sizes), sum(sizes), sum(layout.read_units(size, consistent) for size in sizes))
+        return items
+
+    def query(self, player_id, prefix, attributes=None, limit=None, start_after=None):
+        items = self.repository.query(player_id, prefix, attributes, limit, start_after)
+        size = sum(layout.item_size(item) for item in items)
+        self.count('query', len(items), size, layout.read_units(size))
+        return items
+
+    def put(self, item, condition=None):
+        self.write('put', self.repository.put, item, condition=condition)
+        size = layout.item_size(item)
+        self.count('put', 1, size, layout.write_units(size))
+
+    def update(self, key, updates=None, removes=None, increments=None, condition=None):
+        attributes = self.write('update', self.repository.update, key, updates, removes, increments, condition)
+        size = self.stored_size(key)
+        self.count('update', 1, size, layout.write_units(size))
+        return attributes
+
+    def delete(self, key, condition=None):
+        size = self.stored_size(key)
+        self.write('delete', self.repository.delete, key, condition=condition)
+        self.count('delete', 1, size, layout.write_units(size))
+
+    def transact(self, operations):
+        # Deletes and condition checks are billed on the item before the transaction, puts and
+        # updates on the item they write
+        sizes = [None if isinstance(operation, (Put, Update)) else self.stored_size(operation.key)
+                 for operation in operations]
+        self.write('transact', self.repository.transact, operations)
+        sizes = [size if size is not None else self.stored_size(operation_key(operation))
+                 for operation, size in zip(operations, sizes)]
+        self.count('transact', len(operations), sum(sizes),
+                   sum(layout.write_units(size, transactional=True) for size in sizes))
+
+    def write(self, name, function, *args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except ConditionalCheckFailed:
+            self.conditional_failures[name] = self.conditional_failures.get(name, 0) + 1
+            raise
+
+    def count(self, name, items, size, units):
+        counts = self.operations.setdefault(name, {'calls': 0, 'items': 0, 'bytes': 0, 'units': 0})
+        counts['calls'] += 1
+        counts['items'] += items
+        counts['bytes'] += size
+        counts['units'] += units
+
+    def stored_size(self, key):
+        return layout.item_size(self.repository.get(key) or {})
+
+
+def operation_key(operation):
+    if isinstance(operation, Put):
+        return {name: operation.item[name] for name in layout.KEY_ATTRIBUTES}
+    return operation.key
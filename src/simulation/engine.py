@@ -0,0 +1,151 @@
+"""
+Run agents against an in-memory store with a virtual clock, across processes
+"""
+import multiprocessing
+import time
+
+import storage
+from simulation.agent import Agent, STARTING_BALANCE
+from simulation.counting import CountingRepository
+from storage import layout
+from storage.memory import InMemoryPlayerRepository
+from utils import arrivals, clock, rng
+
+# Virtual time the simulation starts at
+START_TIME = 1600000000
+
+
+def run_shard(shard, players, ticks, tick_seconds=300, seed=None, sample_every=12):
+    """
+    Simulate a shard of players in this process. The shard has its own store and clock, so
+    shards share nothing and can run in separate processes.
+
+    :param shard:           Shard number, part of every player ID
+    :param players:         Number of players in the shard
+    :param ticks:           Number of turns to play
+    :param tick_seconds:    (optional) Virtual seconds between turns
+    :param seed:            (optional) Seed of the agents and of the process generator
+    :param sample_every:    (optional) Sample the item sizes every this many ticks
+    :return:                Dict of results, see merge_results
+    """
+    repository = CountingRepository(InMemoryPlayerRepository())
+    storage.set_repository(repository)
+    game_clock = clock.FakeClock(START_TIME)
+    clock.set_clock(game_clock)
+    rng.set_seed(None if seed is None else seed + shard)
+    generator = rng.get_generator()
+
+    agents = [Agent(f'sim-{shard}-{i}', generator) for i in range(players)]
+    landings = {'landed': 0, 'failed': 0, 'stale': 0}
+    samples = []
+
+    started = time.perf_counter()
+    for agent in agents:
+        agent.start()
+    for tick in range(1, ticks + 1):
+        for agent in agents:
+            agent.step()
+        game_clock.advance(tick_seconds)
+        for name, count in arrivals.process_arrivals().items():
+            landings[name] += count
+        if tick % sample_every == 0 or tick == ticks:
+            samples.append({**sample_sizes(repository.repository.items()), 'game_seconds': tick * tick_seconds})
+    elapsed = time.perf_counter() - started
+
+    clock.set_clock(None)
+    storage.set_repository(None)
+
+    actions = {}
+    for agent in agents:
+        for name, count in agent.counts.items():
+            actions[name] = actions.get(name, 0) + count
+    balances = [int(repository.repository.get(layout.profile_key(agent.player_id))['balance']) for agent in agents]
+    return {
+        'players': players,
+        'elapsed': elapsed,
+        'game_seconds': ticks * tick_seconds,
+        'actions': actions,
+        'landings': landings,
+        'revenue': sum(balance - STARTING_BALANCE + agent.spent for balance, agent in zip(balances, agents)),
+        'balances': balances,
+        'operations': repository.operations,
+        'conditional_failures': repository.conditional_failures,
+        'samples': samples
+    }
+
+
+def sample_sizes(items):
+    """
+    Measure the stored items: total bytes, largest item per entity type and largest player
+
+    :param items:           List of every stored item
+    :return:                Dict of sizes in bytes
+    """
+    largest = {}
+    players = {}
+    for item in items:
+        size = layout.item_size(item)
+        entity_type = item[layout.SORT_KEY].split('#', 1)[0]
+        largest[entity_type] = max(largest.get(entity_type, 0), size)
+        players[item[layout.PARTITION_KEY]] = players.get(item[layout.PARTITION_KEY], 0) + size
+    return {'bytes': sum(players.values()), 'items': len(items), 'largest_item': largest,
+            'largest_player': max(players.values(), default=0)}
+
+
+def simulate(players, processes=1, ticks=288, tick_seconds=300, seed=None):
+    """
+    Simulate players split into one shard per process
+
+    :param players:         Number of players
+    :param processes:       (optional) Number of processes, one runs in this process
+    :param ticks:           (optional) Number of turns to play, the default is one virtual day
+    :param tick_seconds:    (optional) Virtual seconds between turns
+    :param seed:            (optional) Seed, the same seed and processes replay the same game
+    :return:                Dict of merged results, see merge_results
+    """
+    shards = [(shard, players // processes + (1 if shard < players % processes else 0), ticks, tick_seconds, seed)
+              for shard in range(processes)]
+    started = time.perf_counter()
+    if processes == 1:
+        results = [run_shard(*shards[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(run_shard, shards)
+    return merge_results(results, time.perf_counter() - started)
+
+
+def merge_results(results, elapsed):
+    """
+    Merge the results of the shards
+
+    :param results:         List of shard results
+    :param elapsed:         Wall seconds of the whole simulation
+    :return:                Dict of players, elapsed, game_seconds, actions, landings, revenue, balances,
+                            operations, conditional_failures and samples (item sizes over time)
+    """
+    merged = {'players': 0, 'elapsed': elapsed, 'game_seconds': results[0]['game_seconds'], 'actions': {},
+              'landings': {}, 'revenue': 0, 'balances': [], 'operations': {}, 'conditional_failures': {},
+              'samples': []}
+    for result in results:
+        merged['players'] += result['players']
+        merged['revenue'] += result['revenue']
+        merged['balances'].extend(result['balances'])
+        for name in ('actions', 'landings', 'conditional_failures'):
+            for key, count in result[name].items():
+                merged[name][key] = merged[name].get(key, 0) + count
+        for operation, counts in result['operations'].items():
+            merged_counts = merged['operations'].setdefault(operation, dict.fromkeys(counts, 0))
+            for key, count in counts.items():
+                merged_counts[key] += count
+
+    for samples in zip(*(result['samples'] for result in results)):
+        largest_item = {}
+        for sample in samples:
+            for entity_type, size in sample['largest_item'].items():
+                largest_item[entity_type] = max(largest_item.get(entity_type, 0), size)
+        merged['samples'].append({'game_seconds': samples[0]['game_seconds'],
+                                  'bytes': sum(sample['bytes'] for sample in samples),
+                                  'items': sum(sample['items'] for sample in samples),
+                                  'largest_item': largest_item,
+                                  'largest_player': max(sample['largest_player'] for sample in samples)})
+    return merged
@@ -0,0 +1,32 @@
+from config import config
+
+_repository = None
+
+
+def get_repository():
+    """
+    Get the player repository selected by config.player_repository, created once per process
+
+    :return:            PlayerRepository
+    """
+    global _repository
+    if _repository is None:
+        if config.player_repository == 'memory':
+            from storage.memory import InMemoryPlayerRepository
+            _repository = InMemoryPlayerRepository()
+        elif config.player_repository == 'dynamodb':
+            from storage.dynamodb import DynamoDBPlayerRepository
+            _repository = DynamoDBPlayerRepository(config.dynamodb_players_table)
+        else:
+            raise ValueError(f'Unknown player repository: {config.player_repository}')
+    return _repository
+
+
+def set_repository(repository):
+    """
+    Replace the player repository, eg: with a fresh InMemoryPlayerRepository for a simulation
+
+    :param repository:  PlayerRepository, or None to create the configured repository on next use
+    """
+    global _repository
+    _repository = repository
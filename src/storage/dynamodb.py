@@ -0,0 +1,228 @@
+"""
+DynamoDB player repository
+
+Every call requests its consumed capacity and is measured by utils.metrics.
+"""
+import logging
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder, Key
+from botocore.exceptions import ClientError
+
+from config import config
+from storage import layout
+from storage.repository import (MAX_BATCH_GET_ITEMS, ConditionalCheckFailed, ConditionCheck, Delete, PlayerRepository,
+                                Put, RepositoryError, TransactionConflict, Update, updated_attributes)
+from utils import metrics
+
+logger = logging.getLogger()
+
+
+class DynamoDBPlayerRepository(PlayerRepository):
+    """
+    Player items stored in a DynamoDB table with the storage.layout key schema
+    """
+
+    def __init__(self, table_name, dynamodb=None):
+        """
+        :param table_name:      DynamoDB table name
+        :param dynamodb:        (optional) boto3 DynamoDB resource, defaults to the shared config.get_dynamodb()
+        """
+        self.table_name = table_name
+        self._dynamodb = dynamodb
+        self._table = None
+
+    @property
+    def table(self):
+        """
+        boto3 Table, created on first use
+        """
+        if self._table is None:
+            dynamodb = self._dynamodb or config.get_dynamodb()
+            self._table = dynamodb.Table(name=self.table_name)
+        return self._table
+
+    def get(self, key, attributes=None, consistent=False):
+        kwargs = {'Key': key, 'ConsistentRead': consistent}
+        if attributes:
+            kwargs.update(projection(attributes))
+        with metrics.measure('GetItem') as call, translate_errors():
+            call.response = self.table.get_item(ReturnConsumedCapacity='TOTAL', **kwargs)
+            item = call.response.get('Item')
+            call.item_bytes = layout.item_size(item or {})
+        return item
+
+    def batch_get(self, keys, attributes=None, consistent=False):
+        keys = list(keys)
+        request = {'ConsistentRead': consistent}
+        if attributes:
+            # The keys are projected too, to match the items returned in any order to their keys
+            request.update(projection([*layout.KEY_ATTRIBUTES, *attributes]))
+        found = {}
+        # One BatchGetItem request gets at most MAX_BATCH_GET_ITEMS keys
+        for start in range(0, len(keys), MAX_BATCH_GET_ITEMS):
+            pending = keys[start:start + MAX_BATCH_GET_ITEMS]
+            while pending:
+                with metrics.measure('BatchGetItem') as call, translate_errors():
+                    call.response = self.table.meta.client.batch_get_item(
+                        RequestItems={self.table_name: {**request, 'Keys': pending}}, ReturnConsumedCapacity='TOTAL')
+                    items = call.response.get('Responses', {}).get(self.table_name, [])
+                    call.item_bytes = sum(layout.item_size(item) for item in items)
+                for item in items:
+                    found[(item[layout.PARTITION_KEY], item[layout.SORT_KEY])] = item
+                # Keys left unprocessed when the request exceeds the throughput or response size are asked again
+                pending = call.response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+        return [found.get((key[layout.PARTITION_KEY], key[layout.SORT_KEY])) for key in keys]
+
+    def query(self, player_id, prefix, attributes=None, limit=None, start_after=None):
+        kwargs = {'KeyConditionExpression': Key(layout.PARTITION_KEY).eq(player_id)
+                  & Key(layout.SORT_KEY).begins_with(prefix),
+                  'ReturnConsumedCapacity': 'TOTAL'}
+        if attributes is not None:
+            kwargs.update(projection([*layout.KEY_ATTRIBUTES, *attributes]))
+        if start_after is not None:
+            kwargs['ExclusiveStartKey'] = {layout.PARTITION_KEY: player_id, layout.SORT_KEY: start_after}
+        items = []
+        while True:
+            if limit is not None:
+                kwargs['Limit'] = limit - len(items)
+            with metrics.measure('Query') as call, translate_errors():
+                call.response = self.table.query(**kwargs)
+                page = call.response.get('Items', [])
+                call.item_bytes = sum(layout.item_size(item) for item in page)
+            items.extend(page)
+            if not call.response.get('LastEvaluatedKey') or (limit is not None and len(items) >= limit):
+                return items
+            kwargs['ExclusiveStartKey'] = call.response['LastEvaluatedKey']
+
+    def put(self, item, condition=None):
+        kwargs = {'Item': item, 'ReturnConsumedCapacity': 'TOTAL'}
+        if condition is not None:
+            kwargs['ConditionExpression'] = condition
+        with metrics.measure('PutItem', write=True) as call, translate_errors():
+            call.item_bytes = layout.item_size(item)
+            call.response = self.table.put_item(**kwargs)
+
+    def update(self, key, updates=None, removes=None, increments=None, condition=None):
+        operation = Update(key, updates, removes, increments, condition)
+        with metrics.measure('UpdateItem', write=True) as call, translate_errors():
+            call.response = self.table.update_item(Key=key, ReturnValues='ALL_NEW', ReturnConsumedCapacity='TOTAL',
+                                                   **expressions(operation))
+            call.item_bytes = layout.item_size(call.response.get('Attributes', {}))
+        return updated_attributes(call.response.get('Attributes', {}), operation)
+
+    def delete(self, key, condition=None):
+        with metrics.measure('DeleteItem', write=True) as call, translate_errors():
+            call.response = self.table.delete_item(Key=key, ReturnConsumedCapacity='TOTAL',
+                                                   **expressions(Delete(key, condition)))
+
+    def transact(self, operations):
+        transact_items = []
+        for operation in operations:
+            if isinstance(operation, Put):
+                action, params = 'Put', {'Item': operation.item, **expressions(operation)}
+            elif isinstance(operation, ConditionCheck):
+                action, params = 'ConditionCheck', {'Key': operation.key, **expressions(operation)}
+            elif isinstance(operation, Delete):
+                action, params = 'Delete', {'Key': operation.key, **expressions(operation)}
+            else:
+                action, params = 'Update', {'Key': operation.key, **expressions(operation)}
+            transact_items.append({action: {'TableName': self.table_name, **params}})
+
+        # The resource client serializes the python attribute values of the transaction items
+        with metrics.measure('TransactWriteItems', write=True) as call, translate_errors():
+            # Only the size of the whole items written by Puts is known before the write
+            call.item_bytes = sum(layout.item_size(operation.item) for operation in operations
+                                  if isinstance(operation, Put))
+            call.response = self.table.meta.client.transact_write_items(TransactItems=transact_items,
+                                                                        ReturnConsumedCapacity='TOTAL')
+
+
+def projection(paths):
+    """
+    Build the ProjectionExpression parameters for a list of attribute paths, every part of a path
+    gets a placeholder (#p0) so reserved words and map keys can be projected
+
+    :param paths:           List of dot separated attribute paths
+    :return:                Dict of request parameters
+    """
+    names = {}
+    expressions = []
+    for path in paths:
+        parts = []
+        for part in path.split('.'):
+            name = f'#p{len(names)}'
+            names[name] = part
+            parts.append(name)
+        expressions.append('.'.join(parts))
+    return {'ProjectionExpression': ', '.join(expressions), 'ExpressionAttributeNames': names}
+
+
+def expressions(operation):
+    """
+    Build the update and condition expression parameters for an operation. Condition placeholders
+    are named by boto3 (#n0, :v0), update placeholders are #u0, :u0.
+
+    :param operation:       Put, Update, Delete or ConditionCheck
+    :return:                Dict of request parameters
+    """
+    names = {}
+    values = {}
+    params = {}
+
+    if isinstance(operation, Update):
+        def placeholder(path):
+            parts = []
+            for part in path.split('.'):
+                name = f'#u{len(names)}'
+                names[name] = part
+                parts.append(name)
+            return '.'.join(parts)
+
+        def value_placeholder(value):
+            name = f':u{len(values)}'
+            values[name] = value
+            return name
+
+        clauses = []
+        if operation.updates:
+            clauses.append('SET ' + ', '.join(f'{placeholder(path)} = {value_placeholder(value)}'
+                                              for path, value in operation.updates.items()))
+        if operation.removes:
+            clauses.append('REMOVE ' + ', '.join(placeholder(path) for path in operation.removes))
+        if operation.increments:
+            clauses.append('ADD ' + ', '.join(f'{placeholder(path)} {value_placeholder(value)}'
+                                              for path, value in operation.increments.items()))
+        params['UpdateExpression'] = ' '.join(clauses)
+
+    if operation.condition is not None:
+        built = ConditionExpressionBuilder().build_expression(operation.condition)
+        params['ConditionExpression'] = built.condition_expression
+        names.update(built.attribute_name_placeholders)
+        values.update(built.attribute_value_placeholders)
+
+    if names:
+        params['ExpressionAttributeNames'] = names
+    if values:
+        params['ExpressionAttributeValues'] = values
+    return params
+
+
+class translate_errors:
+    """
+    Context manager raising botocore ClientErrors as repository errors
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None or not issubclass(exc_type, ClientError):
+            return False
+        code = exc_value.response.get('Error', {}).get('Code')
+        reasons = [reason.get('Code') for reason in exc_value.response.get('CancellationReasons', [])]
+        if (code == 'ConditionalCheckFailedException' or 'ConditionalCheckFailed' in reasons
+                or (code == 'TransactionCanceledException' and 'ConditionalCheckFailed' in str(exc_value))):
+            raise ConditionalCheckFailed(str(exc_value)) from exc_value
+        if code == 'TransactionConflictException' or 'TransactionConflict' in reasons:
+            raise TransactionConflict(str(exc_value)) from exc_value
+        raise RepositoryError(str(exc_value)) from exc_value
@@ -0,0 +1,239 @@
+"""
+Multi-item layout of a player in the players table
+
+Every player is one partition (player_id) holding one item per entity, keyed by the sort key
+`entity`:
+
+    profile             player_id, balance, version
+    city#<city_id>      one owned city
+    jobs#<city_id>      the job board of one owned city: jobs_expire, destinations, consumed
+    plane#<plane_id>    one owned plane, including its loaded jobs
+
+Job boards do not store their jobs. The jobs are derived when the board is read, from a seed of
+the player, the city and the board window (jobs_expire) and from the destinations the board was
+created with; only the ids of the jobs consumed from the board are stored (consumed, a map of job
+id to True).
+
+Every item of a player carries the version of the player write which last changed it, the profile
+the current version of the player (see utils.versions).
+
+Handlers only read the entities they need, with a key-prefix Query, and writes only touch (and
+consume capacity for) the items they change instead of the whole player.
+
+Planes in flight are also indexed by arrival time, in partitions reserved for the arrivals worker.
+Every partition covers a bucket of arrival times and is sorted by arrival time, so the worker
+finds every due plane with one Query per bucket instead of scanning the players:
+
+    arrivals#<bucket>   arrival#<arrives_at>#<player_id>#<plane_id>: owner_id, plane_id, arrives_at
+    arrivals#cursor     cursor: bucket, the oldest bucket which may still hold due arrivals
+
+Player IDs starting with the arrivals prefix are reserved, so no player shares a partition with the
+index.
+"""
+import decimal
+import math
+
+PARTITION_KEY = 'player_id'
+SORT_KEY = 'entity'
+KEY_ATTRIBUTES = (PARTITION_KEY, SORT_KEY)
+VERSION = 'version'
+
+PROFILE = 'profile'
+CITY_PREFIX = 'city#'
+JOB_BOARD_PREFIX = 'jobs#'
+PLANE_PREFIX = 'plane#'
+
+ARRIVALS_PARTITION_PREFIX = 'arrivals#'
+ARRIVAL_PREFIX = 'arrival#'
+
+# Attributes of a city which are derived from its job board item instead of stored on the city item
+JOB_BOARD_ATTRIBUTES = ('jobs', 'jobs_expire')
+
+# Bytes billed per read and write capacity unit
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+
+
+def profile_key(player_id):
+    return {PARTITION_KEY: player_id, SORT_KEY: PROFILE}
+
+
+def city_key(player_id, city_id):
+    return {PARTITION_KEY: player_id, SORT_KEY: f'{CITY_PREFIX}{city_id}'}
+
+
+def job_board_key(player_id, city_id):
+    return {PARTITION_KEY: player_id, SORT_KEY: f'{JOB_BOARD_PREFIX}{city_id}'}
+
+
+def plane_key(player_id, plane_id):
+    return {PARTITION_KEY: player_id, SORT_KEY: f'{PLANE_PREFIX}{plane_id}'}
+
+
+def arrival_bucket(arrives_at, bucket_seconds):
+    return int(arrives_at) // bucket_seconds
+
+
+def arrivals_partition(bucket):
+    return f'{ARRIVALS_PARTITION_PREFIX}{bucket}'
+
+
+def arrival_key(player_id, plane_id, arrives_at, bucket_seconds):
+    # Arrival times are zero padded so the sort key order is the arrival order
+    return {PARTITION_KEY: arrivals_partition(arrival_bucket(arrives_at, bucket_seconds)),
+            SORT_KEY: f'{ARRIVAL_PREFIX}{int(arrives_at):012d}#{player_id}#{plane_id}'}
+
+
+def arrival_item(player_id, plane_id, arrives_at, bucket_seconds):
+    return {**arrival_key(player_id, plane_id, arrives_at, bucket_seconds),
+            'owner_id': player_id, 'plane_id': plane_id, 'arrives_at': int(arrives_at)}
+
+
+def arrivals_cursor_key():
+    return {PARTITION_KEY: f'{ARRIVALS_PARTITION_PREFIX}cursor', SORT_KEY: 'cursor'}
+
+
+def reserved_player_id(player_id):
+    return player_id.startswith(ARRIVALS_PARTITION_PREFIX)
+
+
+def entity_id(item):
+    """
+    Get the entity id (city id, plane id) from the sort key of an item
+
+    :param item:        Item from the table
+    :return:            Entity id
+    """
+    return item[SORT_KEY].split('#', 1)[1]
+
+
+def strip_key(item, *names):
+    """
+    Remove the key attributes from an item
+
+    :param item:        Item from the table
+    :param names:       (optional) Other attributes to remove, eg: VERSION
+    :return:            Dict of the remaining attributes
+    """
+    return {name: value for name, value in item.items() if name not in KEY_ATTRIBUTES and name not in names}
+
+
+def city_items(player_id, city):
+    """
+    Split a serialized city into its city item and job board item. The job board starts expired, so
+    the first read of the board starts its first window. Stored jobs of the original layout are not
+    kept.
+
+    :param player_id:       Player ID owning the city
+    :param city:            Dict of the serialized city
+    :return:                City item, job board item
+    """
+    city_item = {**city_key(player_id, city['city_id']),
+                 **{name: value for name, value in city.items() if name not in JOB_BOARD_ATTRIBUTES}}
+    job_board_item = {**job_board_key(player_id, city['city_id']),
+                      'jobs_expire': 0,
+                      'destinations': [],
+                      'consumed': {}}
+    return city_item, job_board_item
+
+
+def plane_item(player_id, plane_id, plane):
+    return {**plane_key(player_id, plane_id), **plane}
+
+
+def merge_cities(city_entity_items, job_board_items):
+    """
+    Combine city items with their job board items into the cities dict returned by the API
+
+    :param city_entity_items:       List of city items
+    :param job_board_items:         List of job board items with their jobs (see utils.materialize_job_board)
+    :return:                        Dict of cities keyed by city id
+    """
+    job_boards = {entity_id(item): item for item in job_board_items}
+    cities = {}
+    for item in city_entity_items:
+        city_id = entity_id(item)
+        job_board = job_boards.get(city_id, {})
+        cities[city_id] = {**strip_key(item, VERSION),
+                           'jobs': job_board.get('jobs', {}),
+                           'jobs_expire': job_board.get('jobs_expire', 0)}
+    return cities
+
+
+def merge_planes(plane_entity_items):
+    return {entity_id(item): strip_key(item, VERSION) for item in plane_entity_items}
+
+
+def split_player(player):
+    """
+    Split a single-item player (the original layout) into the items of the multi-item layout
+
+    :param player:          Dict of the whole player item
+    :return:                List of items, the profile item first
+    """
+    player_id = player[PARTITION_KEY]
+    items = [{**profile_key(player_id),
+              **{name: value for name, value in player.items()
+                 if name not in ('player_id', 'cities', 'planes')}}]
+    for city in (player.get('cities') or {}).values():
+        items.extend(city_items(player_id, city))
+    for plane_id, plane in (player.get('planes') or {}).items():
+        items.append(plane_item(player_id, plane_id, plane))
+    return items
+
+
+def item_size(item):
+    """
+    Approximate the size DynamoDB bills for an item in bytes
+
+    :param item:        Item dict
+    :return:            Size in bytes
+    """
+    return sum(len(name.encode('utf-8')) + attribute_size(value) for name, value in item.items())
+
+
+def attribute_size(value):
+    """
+    Approximate the size of one attribute value in bytes
+
+    :param value:       Attribute value
+    :return:            Size in bytes
+    """
+    if isinstance(value, dict):
+        return 3 + sum(len(name.encode('utf-8')) + attribute_size(item) + 1 for name, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(attribute_size(item) + 1 for item in value)
+    if isinstance(value, (set, frozenset)):
+        return sum(attribute_size(item) for item in value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, decimal.Decimal)):
+        digits = decimal.Decimal(str(value)).normalize().as_tuple().digits
+        return (len(digits) + 1) // 2 + 1
+    raise TypeError(f'Unsupported attribute type: {type(value)}')
+
+
+def read_units(size, consistent=False):
+    """
+    Read capacity consumed by reading items of a total size
+
+    :param size:        Size in bytes
+    :param consistent:  (optional) Strongly consistent read
+    :return:            Read capacity units
+    """
+    return max(math.ceil(size / READ_UNIT_BYTES), 1) * (1 if consistent else 0.5)
+
+
+def write_units(size, transactional=False):
+    """
+    Write capacity consumed by writing an item
+
+    :param size:            Size in bytes
+    :param transactional:   (optional) Written in a transaction
+    :return:                Write capacity units
+    """
+    return max(math.ceil(size / WRITE_UNIT_BYTES), 1) * (2 if transactional else 1)
@@ -0,0 +1,235 @@
+"""
+In-memory player repository for local simulation and tests
+
+Items are kept in a dict per player and every read and write runs under one lock, so the
+repository can be shared between threads. Conditions and updates follow DynamoDB semantics,
+numbers are stored as Decimal like the DynamoDB backend returns them.
+"""
+import decimal
+import threading
+
+from boto3.dynamodb.conditions import AttributeBase, Size
+
+from storage import layout
+from storage.repository import (ConditionalCheckFailed, ConditionCheck, Delete, PlayerRepository, Put,
+                                RepositoryError, Update, project, updated_attributes)
+
+MISSING = object()
+
+
+class InMemoryPlayerRepository(PlayerRepository):
+    """
+    Player items stored in process memory
+    """
+
+    def __init__(self):
+        self._players = {}
+        self._lock = threading.RLock()
+
+    def get(self, key, attributes=None, consistent=False):
+        with self._lock:
+            item = self._item(key)
+            if item is None:
+                return None
+            if attributes:
+                return copy(project(item, attributes))
+            return copy(item)
+
+    def query(self, player_id, prefix, attributes=None, limit=None, start_after=None):
+        with self._lock:
+            entities = self._players.get(player_id, {})
+            items = [entities[entity] for entity in sorted(entities)
+                     if entity.startswith(prefix) and (start_after is None or entity > start_after)][:limit]
+            if attributes is not None:
+                items = [project(item, [*layout.KEY_ATTRIBUTES, *attributes]) for item in items]
+            return [copy(item) for item in items]
+
+    def put(self, item, condition=None):
+        self.transact([Put(item, condition)])
+
+    def update(self, key, updates=None, removes=None, increments=None, condition=None):
+        operation = Update(key, updates, removes, increments, condition)
+        with self._lock:
+            self.transact([operation])
+            return updated_attributes(copy(self._item(key)), operation)
+
+    def transact(self, operations):
+        with self._lock:
+            keys = [operation_key(operation) for operation in operations]
+            if len(set(keys)) != len(keys):
+                raise RepositoryError('Transaction request cannot include multiple operations on one item')
+
+            # Build every new item before storing any of them, so a failed condition or an invalid
+            # update leaves the repository unchanged
+            results = []
+            for operation, key in zip(operations, keys):
+                existing = self._item(dict(zip(layout.KEY_ATTRIBUTES, key)))
+                if operation.condition is not None and not evaluate(operation.condition, existing or {}):
+                    raise ConditionalCheckFailed(f'The conditional request failed for item {key}')
+                if isinstance(operation, Put):
+                    results.append((key, store(operation.item)))
+                elif isinstance(operation, Delete):
+                    results.append((key, None))
+                elif not isinstance(operation, ConditionCheck):
+                    results.append((key, apply_update(existing, operation)))
+
+            for (player_id, entity), item in results:
+                if item is None:
+                    self._players.get(player_id, {}).pop(entity, None)
+                else:
+                    self._players.setdefault(player_id, {})[entity] = item
+
+    def items(self):
+        """
+        Get a copy of every stored item, eg: to measure item sizes at the end of a simulation
+
+        :return:            List of items
+        """
+        with self._lock:
+            return [copy(item) for entities in self._players.values() for item in entities.values()]
+
+    def _item(self, key):
+        return self._players.get(key[layout.PARTITION_KEY], {}).get(key[layout.SORT_KEY])
+
+
+def operation_key(operation):
+    item = operation.item if isinstance(operation, Put) else operation.key
+    return item[layout.PARTITION_KEY], item[layout.SORT_KEY]
+
+
+def store(value):
+    """
+    Copy a value as DynamoDB would store it, with numbers as Decimal
+
+    :param value:       Python value
+    :return:            Stored value
+    """
+    if isinstance(value, dict):
+        return {name: store(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [store(item) for item in value]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return decimal.Decimal(value)
+    if isinstance(value, float):
+        return decimal.Decimal(str(value))
+    return value
+
+
+def copy(value):
+    if isinstance(value, dict):
+        return {name: copy(item) for name, item in value.items()}
+    if isinstance(value, list):
+        return [copy(item) for item in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def apply_update(existing, operation):
+    """
+    Apply an Update operation to a copy of an item
+
+    :param existing:        Current item or None
+    :param operation:       Update operation
+    :return:                New item
+    """
+    item = copy(existing) if existing is not None else dict(operation.key)
+
+    for path, value in operation.updates.items():
+        parent, name = resolve_parent(item, path)
+        parent[name] = store(value)
+
+    for path in operation.removes:
+        parent, name = resolve_parent(item, path)
+        parent.pop(name, None)
+
+    for path, value in operation.increments.items():
+        parent, name = resolve_parent(item, path)
+        current = parent.get(name, decimal.Decimal(0))
+        if not isinstance(current, decimal.Decimal):
+            raise RepositoryError(f'An operand in the update expression has an incorrect data type: {path}')
+        parent[name] = current + store(value)
+
+    return item
+
+
+def resolve_parent(item, path):
+    *parents, name = path.split('.')
+    for part in parents:
+        item = item.get(part)
+        if not isinstance(item, dict):
+            raise RepositoryError(f'The document path provided in the update expression is invalid: {path}')
+    return item, name
+
+
+def lookup(item, path):
+    for part in path.split('.'):
+        if not isinstance(item, dict) or part not in item:
+            return MISSING
+        item = item[part]
+    return item
+
+
+def operand(value, item):
+    """
+    Resolve one operand of a condition: an attribute path, size() of a path or a literal value
+    """
+    if isinstance(value, Size):
+        resolved = operand(value.get_expression()['values'][0], item)
+        if resolved is MISSING or isinstance(resolved, (bool, decimal.Decimal)):
+            return MISSING
+        return len(resolved.encode('utf-8')) if isinstance(resolved, str) else len(resolved)
+    if isinstance(value, AttributeBase):
+        return lookup(item, value.name)
+    return store(value)
+
+
+OPERATORS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'BETWEEN': lambda a, low, high: low <= a <= high,
+    'IN': lambda a, values: a in values,
+    'begins_with': lambda a, prefix: a.startswith(prefix),
+    'contains': lambda a, value: value in a,
+}
+
+
+def evaluate(condition, item):
+    """
+    Evaluate a boto3 condition against an item with DynamoDB semantics: a comparison with a
+    missing attribute, or between values of different types, is false.
+
+    :param condition:       boto3 condition, eg: Attr('balance').gte(100)
+    :param item:            Item dict (empty if the item does not exist)
+    :return:                True/False
+    """
+    expression = condition.get_expression()
+    operator = expression['operator']
+    values = expression['values']
+
+    if operator == 'AND':
+        return evaluate(values[0], item) and evaluate(values[1], item)
+    if operator == 'OR':
+        return evaluate(values[0], item) or evaluate(values[1], item)
+    if operator == 'NOT':
+        return not evaluate(values[0], item)
+    if operator == 'attribute_exists':
+        return lookup(item, values[0].name) is not MISSING
+    if operator == 'attribute_not_exists':
+        return lookup(item, values[0].name) is MISSING
+    if operator not in OPERATORS:
+        raise RepositoryError(f'Unsupported condition operator: {operator}')
+
+    operands = [operand(value, item) for value in values]
+    if any(value is MISSING for value in operands):
+        return False
+    try:
+        return OPERATORS[operator](*operands)
+    except (TypeError, AttributeError):
+        return False
@@ -0,0 +1,63 @@
+"""
+Migrate players from the original single-item table (player_id hash key only) to the multi-item
+layout in storage.layout (player_id hash key, entity range key). The profile item of a player is
+written last, once every other item of the player has been written, so it marks the player as
+migrated: players whose profile already exists in the destination table are skipped, and a
+migration which was interrupted in the middle of a player is resumed by running it again.
+
+Usage (from src/):  python -m storage.migrate <source table> <destination table>
+"""
+import logging
+import sys
+
+from config import config
+from storage import layout
+
+logger = logging.getLogger()
+
+
+def migrate_table(source_table_name, destination_table_name, dynamodb=None):
+    """
+    Copy every player in the source table into the destination table using the multi-item layout
+
+    :param source_table_name:           Name of the single-item players table
+    :param destination_table_name:      Name of the multi-item players table
+    :param dynamodb:                    (optional) boto3 DynamoDB resource
+    :return:                            Number of players migrated, number of players skipped
+    """
+    dynamodb = dynamodb or config.get_dynamodb()
+    source = dynamodb.Table(name=source_table_name)
+    destination = dynamodb.Table(name=destination_table_name)
+
+    migrated = skipped = 0
+    scan_kwargs = {}
+    while True:
+        response = source.scan(**scan_kwargs)
+        for player in response.get('Items', []):
+            player_id = player[layout.PARTITION_KEY]
+            if destination.get_item(Key=layout.profile_key(player_id)).get('Item'):
+                logger.info('Skipping player "%s", already migrated', player_id)
+                skipped += 1
+                continue
+
+            profile, *items = layout.split_player(player)
+            with destination.batch_writer() as batch:
+                for item in items:
+                    batch.put_item(Item=item)
+            # The batch writer has flushed every item (and retried unprocessed ones) when it exits
+            destination.put_item(Item=profile)
+            items.append(profile)
+            logger.info('Migrated player "%s" into %s items', player_id, len(items))
+            migrated += 1
+
+        if not response.get('LastEvaluatedKey'):
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    logger.info('Migrated %s players, skipped %s', migrated, skipped)
+    return migrated, skipped
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    migrate_table(sys.argv[1], sys.argv[2])
@@ -0,0 +1,201 @@
+"""
+Player repository interface
+
+Handlers and utils read and write player items (see storage.layout) through a PlayerRepository so
+the storage backend can be swapped by config. Conditions are boto3 condition objects
+(boto3.dynamodb.conditions.Attr), which every backend evaluates with DynamoDB semantics, and
+updates are described with attribute paths (dot separated for nested map keys, eg: 'jobs.<job_id>'):
+
+    updates         SET path = value
+    removes         REMOVE path
+    increments      ADD path number
+"""
+
+# Most items one transaction may write
+MAX_TRANSACTION_ITEMS = 25
+
+# Most keys one batch read may get
+MAX_BATCH_GET_ITEMS = 100
+
+
+class RepositoryError(Exception):
+    """
+    A read or write could not be completed by the storage backend
+    """
+
+
+class ConditionalCheckFailed(RepositoryError):
+    """
+    The condition of a write (or of one write in a transaction) was not met, nothing was written
+    """
+
+
+class TransactionConflict(RepositoryError):
+    """
+    A transaction was cancelled because a concurrent request wrote one of its items, nothing was
+    written and the transaction can be retried
+    """
+
+
+class Put:
+    """
+    Write a whole item, replacing any existing item with the same key
+    """
+
+    def __init__(self, item, condition=None):
+        self.item = item
+        self.condition = condition
+
+
+class Update:
+    """
+    Update some attributes of an item, the item is created if it does not exist
+    """
+
+    def __init__(self, key, updates=None, removes=None, increments=None, condition=None):
+        self.key = key
+        self.updates = updates or {}
+        self.removes = removes or []
+        self.increments = increments or {}
+        self.condition = condition
+
+
+class Delete:
+    """
+    Delete an item
+    """
+
+    def __init__(self, key, condition=None):
+        self.key = key
+        self.condition = condition
+
+
+class ConditionCheck:
+    """
+    Require a condition on an item, without writing it, as part of a transaction
+    """
+
+    def __init__(self, key, condition):
+        self.key = key
+        self.condition = condition
+
+
+class PlayerRepository:
+    """
+    Storage backend for player items
+    """
+
+    def get(self, key, attributes=None, consistent=False):
+        """
+        Get one item
+
+        :param key:             Item key, eg: layout.profile_key(player_id)
+        :param attributes:      (optional) List of attribute paths to return, eg: 'layovers.c1001', defaults to all
+        :param consistent:      (optional) Strongly consistent read
+        :return:                Item dict or None if it does not exist
+        """
+        raise NotImplementedError
+
+    def batch_get(self, keys, attributes=None, consistent=False):
+        """
+        Get several items in one round trip
+
+        :param keys:            List of item keys
+        :param attributes:      (optional) List of attribute paths to return, defaults to all
+        :param consistent:      (optional) Strongly consistent reads
+        :return:                List of item dicts in the order of the keys, None for missing items
+        """
+        return [self.get(key, attributes, consistent) for key in keys]
+
+    def query(self, player_id, prefix, attributes=None, limit=None, start_after=None):
+        """
+        Get the items of a player with a sort key starting with the prefix, ordered by sort key
+
+        :param player_id:       Player ID
+        :param prefix:          Sort key prefix, eg: layout.CITY_PREFIX
+        :param attributes:      (optional) List of attribute paths to return besides the key, defaults to all
+        :param limit:           (optional) Most items to return
+        :param start_after:     (optional) Only return items with a sort key after this one
+        :return:                List of items
+        """
+        raise NotImplementedError
+
+    def put(self, item, condition=None):
+        """
+        Write a whole item
+
+        :param item:            Item dict including the key attributes
+        :param condition:       (optional) boto3 condition which must hold for the existing item
+        :raises ConditionalCheckFailed: If the condition is not met
+        """
+        self.transact([Put(item, condition)])
+
+    def update(self, key, updates=None, removes=None, increments=None, condition=None):
+        """
+        Update some attributes of an item
+
+        :param key:             Item key
+        :param updates:         (optional) Dict of attribute path to new value
+        :param removes:         (optional) List of attribute paths to remove
+        :param increments:      (optional) Dict of attribute path to number to add
+        :param condition:       (optional) boto3 condition which must hold for the existing item
+        :return:                Dict of the updated top level attributes, as they are after the update
+        :raises ConditionalCheckFailed: If the condition is not met
+        """
+        raise NotImplementedError
+
+    def delete(self, key, condition=None):
+        """
+        Delete an item, deleting a missing item is not an error
+
+        :param key:             Item key
+        :param condition:       (optional) boto3 condition which must hold for the existing item
+        :raises ConditionalCheckFailed: If the condition is not met
+        """
+        self.transact([Delete(key, condition)])
+
+    def transact(self, operations):
+        """
+        Apply a list of Put, Update, Delete and ConditionCheck operations atomically. Either every condition
+        holds and every write is applied, or nothing is written.
+
+        :param operations:      List of operations, each on a different item
+        :raises ConditionalCheckFailed: If any of the conditions is not met
+        :raises TransactionConflict: If a concurrent write to one of the items cancelled the transaction
+        """
+        raise NotImplementedError
+
+
+def project(item, paths):
+    """
+    Keep only some attribute paths of an item, the way a DynamoDB ProjectionExpression does
+
+    :param item:            Item dict
+    :param paths:           List of dot separated attribute paths, eg: 'loaded_jobs.<job_id>.revenue'
+    :return:                Dict of the attributes found, nested maps keep their nesting
+    """
+    projected = {}
+    for path in paths:
+        value, target, parts = item, projected, path.split('.')
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return projected
+
+
+def updated_attributes(item, operation):
+    """
+    Get the top level attributes of an item which were touched by an update
+
+    :param item:            Item after the update
+    :param operation:       Update operation
+    :return:                Dict of attribute name to value
+    """
+    paths = [*operation.updates, *operation.removes, *operation.increments]
+    names = {path.split('.', 1)[0] for path in paths}
+    return {name: item[name] for name in names if name in item}
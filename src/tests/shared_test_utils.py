@@ -1,7 +1,22 @@
 import boto3
 
+import storage
+from config import config
+from storage.memory import InMemoryPlayerRepository
+
 
 def create_table():
+    """
+    Create dynamodb table, or a fresh in-memory repository when the tests run with
+    PLAYER_REPOSITORY=memory
+    """
+    if config.player_repository == 'memory':
+        storage.set_repository(InMemoryPlayerRepository())
+    else:
+        create_dynamodb_table()
+
+
+def create_dynamodb_table():
     """
     Create dynamodb table
     """
@@ -12,12 +27,21 @@ def create_table():
             {
                 'AttributeName': 'player_id',
                 'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'entity',
+                'AttributeType': 'S'
             }
         ],
         KeySchema=[
             {
                 'AttributeName': 'player_id',
                 'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'entity',
+                'KeyType': 'RANGE'
             }
-        ]
+        ],
+        BillingMode='PAY_PER_REQUEST'
     )
@@ -0,0 +1,165 @@
+import logging
+import os
+import unittest.mock
+
+import moto
+
+import storage
+from storage import layout
+from storage.repository import Update
+from tests import shared_test_utils
+from utils import versions
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestArrivals(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialize test http client and a fake game clock
+        :return:
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+        from utils import arrivals, clock, utils
+        from micro_airlines_api import app
+        self.arrivals = arrivals
+        self.utils = utils
+        self.clock = clock.FakeClock(1600000000)
+        clock.set_clock(self.clock)
+        self.addCleanup(clock.set_clock, None)
+        self.http_client = app.test_client()
+        self.player_name = 'test_player_1'
+        self.http_client.environ_base['awsgi.event'] = {
+            'requestContext': {
+                'authorizer': {
+                    'claims': {
+                        'cognito:username': self.player_name
+                    }
+                }
+            }
+        }
+
+    def depart_planes(self):
+        """
+        Create a player with two loaded planes at c1005 and depart both to c1036, one with the depart
+        route and one with a fleet action
+
+        :return:            Plane ids, revenue of the jobs to c1036
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=1000000)
+        for city_id in ['c1005', 'c1036', 'c1003']:
+            self.utils.add_city_to_player(player_id=self.player_name, city_id=city_id)
+        for _ in range(2):
+            self.utils.add_plane_to_player(player_id=self.player_name, plane_id='a1', current_city_id='c1005')
+
+        jobs = self.http_client.get('/v1/cities/c1005/jobs').get_json()['jobs']
+        # Load the jobs to c1036 first so the planes complete jobs when they land
+        job_ids = sorted((job_id for job_id, job in jobs.items() if job['job_type'] == 'C'),
+                         key=lambda job_id: jobs[job_id]['destination_city_id'] != 'c1036')
+        plane_1_id, plane_2_id = sorted(self.http_client.get('/v1/planes').get_json()['planes'])
+
+        self.assertTrue(self.utils.load_plane(self.player_name, plane_1_id, job_ids[:2])[0])
+        self.assertEqual(200, self.http_client.put(f'/v1/planes/{plane_1_id}/depart',
+                                                   json={'destination_city_id': 'c1036'}).status_code)
+        self.clock.advance(60)
+        self.http_client.post('/v1/fleet/actions', json={'actions': [
+            {'plane_id': plane_2_id, 'action': 'load', 'loaded_jobs': job_ids[2:4]},
+            {'plane_id': plane_2_id, 'action': 'depart', 'destination_city_id': 'c1036'}
+        ]})
+
+        revenue = sum(jobs[job_id]['revenue'] for job_id in job_ids[:4]
+                      if jobs[job_id]['destination_city_id'] == 'c1036')
+        return (plane_1_id, plane_2_id), revenue
+
+    @moto.mock_dynamodb2
+    def test_process_arrivals(self):
+        """
+        Test planes are landed by the arrivals worker once they are due, without being unloaded
+        """
+        (plane_1_id, plane_2_id), revenue = self.depart_planes()
+        balance = self.utils.get_balance(self.player_name)
+
+        self.assertEqual({'landed': 0, 'failed': 0, 'stale': 0}, self.arrivals.process_arrivals())
+
+        # Only the first plane is due
+        self.clock.advance(4145 - 60)
+        self.assertEqual({'landed': 1, 'failed': 0, 'stale': 0}, self.arrivals.process_arrivals())
+        planes = self.http_client.get('/v1/planes').get_json()['planes']
+        self.assertEqual('c1036', planes[plane_1_id]['current_city_id'])
+        self.assertNotIn('arrives_at', planes[plane_1_id])
+        self.assertEqual('c1005', planes[plane_2_id]['current_city_id'])
+
+        self.clock.advance(60)
+        self.assertEqual({'landed': 1, 'failed': 0, 'stale': 0}, self.arrivals.process_arrivals())
+        planes = self.http_client.get('/v1/planes').get_json()['planes']
+        self.assertEqual('c1036', planes[plane_2_id]['current_city_id'])
+        self.assertEqual(balance + revenue, self.utils.get_balance(self.player_name))
+        self.assertFalse(any(job['destination_city_id'] == 'c1036'
+                             for plane in planes.values() for job in plane['loaded_jobs'].values()))
+
+        # The landed planes were removed from the index and the cursor moved up to the current bucket
+        bucket = 1600004205 // 300
+        repository = storage.get_repository()
+        self.assertEqual([], repository.query(layout.arrivals_partition(bucket), layout.ARRIVAL_PREFIX))
+        self.assertEqual(bucket, repository.get(layout.arrivals_cursor_key())['bucket'])
+
+    @moto.mock_dynamodb2
+    def test_process_arrivals_reads(self):
+        """
+        Test the worker only reads the due planes, without the other items of the player or their job boards
+        """
+        self.depart_planes()
+        self.clock.advance(4145)
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'query', wraps=repository.query) as query, \
+                unittest.mock.patch.object(repository, 'batch_get', wraps=repository.batch_get) as batch_get, \
+                unittest.mock.patch.object(self.utils, 'materialize_job_board') as materialize_job_board:
+            self.assertEqual({'landed': 2, 'failed': 0, 'stale': 0}, self.arrivals.process_arrivals())
+        self.assertTrue(all(call[0][0].startswith(layout.ARRIVALS_PARTITION_PREFIX) for call in query.call_args_list))
+        self.assertEqual(1, batch_get.call_count)
+        self.assertNotIn('capacity', batch_get.call_args[1]['attributes'])
+        materialize_job_board.assert_not_called()
+
+    @moto.mock_dynamodb2
+    def test_process_arrivals_unloaded(self):
+        """
+        Test a plane the player unloaded is not landed again and a stale arrival is removed
+        """
+        (plane_1_id, _), _ = self.depart_planes()
+        self.clock.advance(4145)
+
+        self.assertEqual(200, self.http_client.put(f'/v1/planes/{plane_1_id}/unload').status_code)
+        storage.get_repository().put(layout.arrival_item(self.player_name, 'sold', 1600004000, 300))
+
+        self.assertEqual({'landed': 1, 'failed': 0, 'stale': 1}, self.arrivals.process_arrivals())
+        self.assertEqual([], storage.get_repository().query(layout.arrivals_partition(1600004000 // 300),
+                                                            layout.ARRIVAL_PREFIX))
+
+    @moto.mock_dynamodb2
+    def test_process_arrivals_conflict(self):
+        """
+        Test a landing which conflicts with a concurrent request stays in the index and is retried
+        """
+        plane_ids, _ = self.depart_planes()
+        self.clock.advance(4145)
+        repository = storage.get_repository()
+
+        batch_get = repository.batch_get
+
+        def concurrent_batch_get(*args, **kwargs):
+            # A concurrent request changes the flight of a plane after it was read by the worker
+            planes = batch_get(*args, **kwargs)
+            versions.write_player(self.player_name, [Update(layout.plane_key(self.player_name, plane_ids[0]),
+                                                            updates={'eta': 1})])
+            return planes
+
+        with unittest.mock.patch.object(repository, 'batch_get', side_effect=concurrent_batch_get):
+            self.assertEqual({'landed': 0, 'failed': 2, 'stale': 0}, self.arrivals.process_arrivals())
+        self.assertEqual(1600004145 // 300, repository.get(layout.arrivals_cursor_key())['bucket'])
+
+        self.assertEqual({'landed': 2, 'failed': 0, 'stale': 0}, self.arrivals.process_arrivals())
+        self.assertEqual(1600004145 // 300, repository.get(layout.arrivals_cursor_key())['bucket'])
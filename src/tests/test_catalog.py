@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest.mock
+
+import numpy as np
+
+from config import config
+from definitions import catalog
+from definitions.cities import cities
+from definitions.planes import planes
+from utils.distances import DistanceMatrix
+
+
+def without_jobs_expire(item):
+    """
+    jobs_expire is set from the time the City object was created
+    """
+    return {key: value for key, value in item.serialize().items() if key != 'jobs_expire'}
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a catalog artifact into a temporary directory
+        """
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'catalog.bin')
+        self.size = catalog.build_catalog(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_build_catalog(self):
+        """
+        Test building the catalog artifact
+        """
+        self.assertEqual(os.path.getsize(self.path), self.size)
+        artifact = catalog.CatalogArtifact(self.path)
+        self.assertEqual(list(cities.keys()), artifact.city_ids)
+        self.assertEqual(list(planes.keys()), artifact.plane_ids)
+
+    def test_artifact_cities_match_definitions(self):
+        """
+        Test every city read from the artifact matches the city definitions
+        """
+        artifact = catalog.CatalogArtifact(self.path)
+        for i, city_id in enumerate(artifact.city_ids):
+            self.assertEqual(without_jobs_expire(cities[city_id]), without_jobs_expire(artifact.city(i)))
+
+    def test_artifact_planes_match_definitions(self):
+        """
+        Test every plane read from the artifact matches the plane definitions
+        """
+        artifact = catalog.CatalogArtifact(self.path)
+        for i, plane_id in enumerate(artifact.plane_ids):
+            self.assertEqual(planes[plane_id].serialize(), artifact.plane(i).serialize())
+
+    def test_artifact_bad_magic(self):
+        """
+        Test loading a file which is not a catalog artifact
+        """
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            catalog.CatalogArtifact(self.path)
+
+    def test_lazy_catalog_from_artifact(self):
+        """
+        Test the lazy catalog only creates objects when they are accessed
+        """
+        with unittest.mock.patch.object(config, 'catalog_path', self.path), \
+                unittest.mock.patch.object(catalog, '_artifact', None):
+            lazy_cities = catalog.LazyCatalog('cities')
+            lazy_planes = catalog.LazyCatalog('planes')
+
+            self.assertEqual(len(cities), len(lazy_cities))
+            self.assertEqual(list(cities.keys()), list(lazy_cities))
+            self.assertIn('c1001', lazy_cities)
+            self.assertNotIn('foo123', lazy_cities)
+            self.assertEqual({}, lazy_cities._objects)
+
+            self.assertEqual(without_jobs_expire(cities['c1001']), without_jobs_expire(lazy_cities['c1001']))
+            self.assertIs(lazy_cities['c1001'], lazy_cities.get('c1001'))
+            self.assertEqual(['c1001'], list(lazy_cities._objects.keys()))
+            self.assertIsNone(lazy_cities.get('foo123'))
+
+            self.assertEqual(planes['a1'].serialize(), lazy_planes['a1'].serialize())
+
+    def test_lazy_catalog_without_artifact(self):
+        """
+        Test the lazy catalog falls back to the python definitions, with a warning
+        """
+        missing = os.path.join(self.temp_dir.name, 'missing.bin')
+        with unittest.mock.patch.object(config, 'catalog_path', missing), \
+                unittest.mock.patch.object(catalog, '_artifact', None), \
+                self.assertLogs(level='WARNING') as logs:
+            self.assertIs(cities['c1001'], catalog.LazyCatalog('cities')['c1001'])
+            self.assertIs(planes['a0'], catalog.LazyCatalog('planes')['a0'])
+        self.assertIn('not found', logs.output[0])
+
+    def test_coordinates(self):
+        """
+        Test the coordinates read from the artifact match the definitions
+        """
+        latitudes, longitudes = catalog.coordinates(cities)
+
+        with unittest.mock.patch.object(config, 'catalog_path', self.path), \
+                unittest.mock.patch.object(catalog, '_artifact', None):
+            lazy_cities = catalog.LazyCatalog('cities')
+            artifact_latitudes, artifact_longitudes = catalog.coordinates(lazy_cities)
+            np.testing.assert_array_equal(latitudes, artifact_latitudes)
+            np.testing.assert_array_equal(longitudes, artifact_longitudes)
+            self.assertEqual({}, lazy_cities._objects)
+
+            np.testing.assert_array_equal(DistanceMatrix(cities).matrix, DistanceMatrix(lazy_cities).matrix)
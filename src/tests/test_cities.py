@@ -1,11 +1,12 @@
 import logging
 import os
-import unittest
+import unittest.mock
 import time
 
 import moto
 
 from definitions.cities import cities
+import storage
 from tests import shared_test_utils
 
 logging.basicConfig(level=logging.INFO)
@@ -52,6 +53,38 @@ class TestCities(unittest.TestCase):
         self.assertEqual(cities['c1001'].city_id, result.get_json()['cities']['c1001']['city_id'])
         self.assertEqual(200, result.status_code)
 
+    @moto.mock_dynamodb2
+    def test_cities_get_fields_and_pages(self):
+        """
+        Test getting only some fields of the cities, and the cities one page at a time
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=1000000)
+        for city_id in ['c1001', 'c1002', 'c1003']:
+            self.utils.add_city_to_player(player_id=self.player_name, city_id=city_id)
+
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'query', wraps=repository.query) as query:
+            result = self.http_client.get('/v1/cities?fields=cities.*.name')
+        self.assertEqual({'cities': {city_id: {'name': cities[city_id].name} for city_id in ['c1001', 'c1002', 'c1003']}},
+                         result.get_json())
+        # The job boards are not read when none of their fields are requested
+        self.assertEqual(1, query.call_count)
+
+        result = self.http_client.get('/v1/cities?fields=cities.c1002.jobs_expire,cities.c1003.country')
+        self.assertEqual({'cities': {'c1002': {'jobs_expire': 0}, 'c1003': {'country': 'United States'}}},
+                         result.get_json())
+
+        result = self.http_client.get('/v1/cities?limit=2').get_json()
+        self.assertEqual(['c1001', 'c1002'], list(result['cities']))
+        self.assertEqual({}, result['cities']['c1001']['jobs'])
+        result = self.http_client.get(f'/v1/cities?limit=2&cursor={result["cursor"]}&fields=cities').get_json()
+        self.assertEqual(['c1003'], list(result['cities']))
+        self.assertNotIn('cursor', result)
+
+        for query_string in ['fields=planes.*.name', 'fields=cities..name', 'limit=0', 'limit=foo']:
+            self.assertEqual(400, self.http_client.get(f'/v1/cities?{query_string}').status_code)
+
     @moto.mock_dynamodb2
     def test_cities_get_player_not_exist(self):
         """
@@ -78,8 +111,17 @@ class TestCities(unittest.TestCase):
         self.assertEqual(201, result.status_code)
 
         # Query the table to validate the result
-        result = self.utils.table.get_item(Key={'player_id': self.player_name}).get('Item')
-        self.assertEqual(cities['c1001'].serialize(), result['cities']['c1001'])
+        city = cities['c1001'].serialize()
+        result = storage.get_repository().get({'player_id': self.player_name, 'entity': 'city#c1001'})
+        self.assertEqual({'player_id': self.player_name, 'entity': 'city#c1001',
+                          **{key: value for key, value in city.items() if key not in ['jobs', 'jobs_expire']},
+                          'version': 2},
+                         result)
+        result = storage.get_repository().get({'player_id': self.player_name, 'entity': 'jobs#c1001'})
+        self.assertEqual({'player_id': self.player_name, 'entity': 'jobs#c1001',
+                          'jobs_expire': 0, 'destinations': [], 'consumed': {}, 'version': 2}, result)
+        _, result = self.utils.get_player_attributes(self.player_name, attributes_to_get=['cities'])
+        self.assertEqual({**city, 'jobs_expire': 0}, result['cities']['c1001'])
 
     @moto.mock_dynamodb2
     def test_cities_post_missing_body(self):
@@ -158,9 +200,27 @@ class TestCities(unittest.TestCase):
         jobs_expire = result.get_json()['jobs_expire']
         self.assertLess(time.time(), jobs_expire)
 
-        # Make the same call again to see if cached jobs are used
-        result = self.http_client.get('/v1/cities/c1001/jobs')
+        # Make the same call again to see if cached jobs are used, only the city and its job board are read
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'query') as query, \
+                unittest.mock.patch.object(repository, 'batch_get', wraps=repository.batch_get) as batch_get:
+            result = self.http_client.get('/v1/cities/c1001/jobs')
         self.assertEqual(jobs_expire, result.get_json()['jobs_expire'])
+        query.assert_not_called()
+        self.assertEqual(1, batch_get.call_count)
+
+        # Page through the revenue of the jobs
+        jobs = result.get_json()['jobs']
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            page = self.http_client.get(f'/v1/cities/c1001/jobs?fields=jobs.*.revenue&limit=20&cursor={cursor}').get_json()
+            pages.append(page['jobs'])
+            cursor = page.get('cursor')
+        self.assertEqual([20, 10], [len(page) for page in pages])
+        self.assertEqual({job_id: {'revenue': job['revenue']} for job_id, job in jobs.items()},
+                         {**pages[0], **pages[1]})
+        self.assertEqual(400, self.http_client.get('/v1/cities/c1001/jobs?fields=cities').status_code)
 
     @moto.mock_dynamodb2
     def test_get_player_city_jobs_not_owned(self):
@@ -188,3 +248,45 @@ class TestCities(unittest.TestCase):
         result = self.http_client.get('/v1/cities/c1001/jobs')
         self.assertEqual(400, result.status_code)
         self.assertEqual('Player does not own enough cities', result.get_data().decode('utf-8'))
+
+    @moto.mock_dynamodb2
+    def test_get_reachable_cities(self):
+        """
+        Test getting the cities within range of a city, of the catalog and of the player's cities
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=100000)
+        self.utils.add_city_to_player(player_id=self.player_name, city_id='c1005')
+        self.utils.add_city_to_player(player_id=self.player_name, city_id='c1003')
+
+        result = self.http_client.get('/v1/cities/c1036/reachable?range=200')
+        self.assertEqual(200, result.status_code)
+        self.assertEqual({'city_id': 'c1005', 'distance': 190}, result.get_json()['cities'][-1])
+        self.assertEqual(3, len(result.get_json()['cities']))
+
+        result = self.http_client.get('/v1/cities/c1036/reachable?range=200&owned=true')
+        self.assertEqual([{'city_id': 'c1005', 'distance': 190}], result.get_json()['cities'])
+
+        result = self.http_client.get('/v1/cities/c1036/reachable?limit=1&owned=true')
+        self.assertEqual([{'city_id': 'c1005', 'distance': 190}], result.get_json()['cities'])
+
+        # Without a range or limit every city is reachable
+        distance = self.utils.get_distance_between_cities('c1036', 'c1003')
+        self.assertEqual((True, [{'city_id': 'c1005', 'distance': 190}, {'city_id': 'c1003', 'distance': distance}]),
+                         self.utils.get_reachable_cities(self.player_name, 'c1036', owned=True))
+        success, result = self.utils.get_reachable_cities(self.player_name, 'c1036')
+        self.assertEqual(len(self.utils.distance_matrix.city_ids) - 1, len(result))
+
+    @moto.mock_dynamodb2
+    def test_get_reachable_cities_invalid(self):
+        """
+        Test getting reachable cities with invalid parameters
+        """
+        shared_test_utils.create_table()
+        for path, message in [('/v1/cities/c1036/reachable', 'range or limit is a required parameter'),
+                              ('/v1/cities/c1036/reachable?range=-5', 'range and limit must be whole numbers'),
+                              ('/v1/cities/foo/reachable?range=100', 'City does not exist'),
+                              ('/v1/cities/c1036/reachable?range=100&owned=true', 'Player does not exist')]:
+            result = self.http_client.get(path)
+            self.assertEqual(message, result.get_data().decode('utf-8'))
+            self.assertEqual(400, result.status_code)
@@ -0,0 +1,68 @@
+import logging
+import os
+import time
+import unittest.mock
+
+import boto3
+import moto
+
+import storage
+from config import config
+from tests import shared_test_utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialize test http client and set up the requestContext
+        :return:
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+        from micro_airlines_api import app
+        self.http_client = app.test_client()
+        self.http_client.environ_base['awsgi.event'] = {
+            'requestContext': {
+                'authorizer': {
+                    'claims': {
+                        'cognito:username': 'test_player_1'
+                    }
+                }
+            }
+        }
+
+    def tearDown(self):
+        storage.set_repository(None)
+
+    @moto.mock_dynamodb2
+    def test_cold_start_creates_one_session(self):
+        """
+        Test a cold start creates one boto3 session which is reused by every warm invocation
+        """
+        shared_test_utils.create_dynamodb_table()
+        storage.set_repository(None)
+
+        with unittest.mock.patch.object(config, 'player_repository', 'dynamodb'), \
+                unittest.mock.patch.object(config, '_dynamodb', None), \
+                unittest.mock.patch('boto3.session.Session', wraps=boto3.session.Session) as session:
+            start = time.perf_counter()
+            self.assertEqual(201, self.http_client.post('/v1/player').status_code)
+            cold = time.perf_counter() - start
+            self.assertEqual(1, session.call_count)
+
+            start = time.perf_counter()
+            for _ in range(10):
+                self.assertEqual(200, self.http_client.get('/v1/player').status_code)
+            warm = (time.perf_counter() - start) / 10
+            self.assertEqual(1, session.call_count)
+            logging.info(f'Cold start request: {cold * 1000:.1f}ms, warm request: {warm * 1000:.1f}ms')
+
+            client_config = config.get_dynamodb().meta.client.meta.config
+            self.assertEqual(config.dynamodb_max_pool_connections, client_config.max_pool_connections)
+            self.assertEqual(config.dynamodb_retry_mode, client_config.retries['mode'])
+            self.assertEqual(config.dynamodb_connect_timeout, client_config.connect_timeout)
+            self.assertEqual(config.dynamodb_read_timeout, client_config.read_timeout)
@@ -0,0 +1,79 @@
+import unittest
+
+from haversine import haversine, Unit
+
+from definitions.cities import cities
+from utils.distances import DistanceMatrix, distance_matrix
+
+
+class TestDistances(unittest.TestCase):
+
+    def test_distance_matrix_shape(self):
+        """
+        Test the matrix covers every pair of cities in the catalog
+        """
+        self.assertEqual((len(cities), len(cities)), distance_matrix.matrix.shape)
+        self.assertEqual(0, distance_matrix.distance('c1001', 'c1001'))
+
+    def test_distance_matrix_matches_haversine(self):
+        """
+        Test every pair of cities matches the per-call haversine distance
+        """
+        for city_id_1, city_1 in cities.items():
+            for city_id_2, city_2 in cities.items():
+                expected = int(haversine((city_1.latitude, city_1.longitude),
+                                         (city_2.latitude, city_2.longitude), unit=Unit.MILES))
+                self.assertEqual(expected, distance_matrix.distance(city_id_1, city_id_2))
+
+    def test_distance_matrix_returns_int(self):
+        """
+        Test distances are plain ints which can be stored in dynamo
+        """
+        self.assertIs(int, type(distance_matrix.distance('c1036', 'c1005')))
+        self.assertEqual(190, distance_matrix.distance('c1036', 'c1005'))
+
+    def test_distance_matrix_unknown_city(self):
+        """
+        Test getting a distance when a city does not exist
+        """
+        self.assertIsNone(distance_matrix.distance('c1001', 'foo123'))
+        self.assertIsNone(distance_matrix.distance('foo123', 'c1001'))
+
+    def test_distance_matrix_built_once(self):
+        """
+        Test the matrix is only built on first use
+        """
+        matrix = DistanceMatrix({'c1001': cities['c1001'], 'c1002': cities['c1002']})
+        self.assertIsNone(matrix._matrix)
+        first = matrix.matrix
+        self.assertIs(first, matrix.matrix)
+        self.assertEqual([0, matrix.distance('c1001', 'c1002')], matrix.row('c1001').tolist())
+
+    def test_within(self):
+        """
+        Test the cities within a radius match a brute force search, nearest first
+        """
+        for radius in [0, 190, 900, 5000]:
+            expected = sorted((distance_matrix.distance('c1036', city_id), city_id) for city_id in cities
+                              if city_id != 'c1036' and distance_matrix.distance('c1036', city_id) <= radius)
+            result = distance_matrix.within('c1036', radius)
+            self.assertEqual([distance for distance, _ in expected], [distance for _, distance in result])
+            self.assertEqual({city_id for _, city_id in expected}, {city_id for city_id, _ in result})
+
+        self.assertEqual([('c1005', 190)], distance_matrix.within('c1036', 900, candidates={'c1005', 'c1001'}))
+
+    def test_nearest(self):
+        """
+        Test the nearest cities are the first cities within any radius
+        """
+        self.assertEqual(distance_matrix.within('c1036', 5000)[:3], distance_matrix.nearest('c1036', 3))
+        self.assertEqual([('c1005', 190), ('c1001', distance_matrix.distance('c1036', 'c1001'))],
+                         distance_matrix.nearest('c1036', 5, candidates={'c1005', 'c1001', 'c1036'}))
+
+    def test_nearest_all(self):
+        """
+        Test a count of None returns every other city, nearest first
+        """
+        self.assertEqual(distance_matrix.within('c1036', 25000), distance_matrix.nearest('c1036', None))
+        self.assertEqual(len(distance_matrix.city_ids) - 1, len(distance_matrix.nearest('c1036', None)))
+        self.assertEqual([('c1005', 190)], distance_matrix.nearest('c1036', None, candidates={'c1005', 'c1036'}))
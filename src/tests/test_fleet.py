@@ -0,0 +1,161 @@
+import logging
+import os
+import unittest.mock
+
+import moto
+
+import storage
+from tests import shared_test_utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialize test http client and set up the requestContext
+        :return:
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+        from utils import clock, fleet, utils
+        from micro_airlines_api import app
+        self.fleet = fleet
+        self.utils = utils
+        self.clock = clock.FakeClock(1600000000)
+        clock.set_clock(self.clock)
+        self.addCleanup(clock.set_clock, None)
+        self.http_client = app.test_client()
+        self.player_name = 'test_player_1'
+        self.http_client.environ_base['awsgi.event'] = {
+            'requestContext': {
+                'authorizer': {
+                    'claims': {
+                        'cognito:username': self.player_name
+                    }
+                }
+            }
+        }
+
+    def create_fleet(self, plane_count):
+        """
+        Create a player with planes at c1005 and the job board of c1005
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=1000000)
+        for city_id in ['c1005', 'c1036', 'c1003']:
+            self.utils.add_city_to_player(player_id=self.player_name, city_id=city_id)
+        for _ in range(plane_count):
+            self.utils.add_plane_to_player(player_id=self.player_name, plane_id='a1', current_city_id='c1005')
+
+        jobs = self.http_client.get('/v1/cities/c1005/jobs').get_json()['jobs']
+        plane_ids = sorted(self.http_client.get('/v1/planes').get_json()['planes'])
+        # The jobs to c1036 first so the planes complete jobs when they land there
+        return plane_ids, sorted((job_id for job_id, job in jobs.items() if job['job_type'] == 'C'),
+                                 key=lambda job_id: jobs[job_id]['destination_city_id'] != 'c1036')
+
+    @moto.mock_dynamodb2
+    def test_fleet_actions(self):
+        """
+        Test loading and departing planes in one request, then unloading them in a second request
+        """
+        (plane_1_id, plane_2_id), job_ids = self.create_fleet(2)
+
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'transact', wraps=repository.transact) as transact:
+            result = self.http_client.post('/v1/fleet/actions', json={'actions': [
+                {'plane_id': plane_1_id, 'action': 'load', 'loaded_jobs': job_ids[:2]},
+                {'plane_id': plane_2_id, 'action': 'load', 'loaded_jobs': job_ids[1:3]},
+                {'plane_id': plane_2_id, 'action': 'load', 'loaded_jobs': job_ids[2:3]},
+                {'plane_id': plane_1_id, 'action': 'depart', 'destination_city_id': 'c1036'},
+                {'plane_id': plane_2_id, 'action': 'depart', 'destination_city_id': 'c1036'},
+                {'plane_id': 'missing', 'action': 'depart', 'destination_city_id': 'c1036'},
+                {'plane_id': plane_1_id, 'action': 'fly'},
+            ]})
+        self.assertEqual(200, result.status_code)
+        self.assertEqual(1, transact.call_count)
+
+        results = result.get_json()['results']
+        self.assertEqual([True, False, True, True, True, False, False], [result['success'] for result in results])
+        self.assertEqual('One or more job ids is invalid', results[1]['message'])
+        self.assertEqual({'loaded_jobs': job_ids[2:3]}, results[2]['result'])
+        self.assertEqual({'destination_city_id': 'c1036', 'state': 'in_flight', 'departed_at': 1600000000,
+                          'arrives_at': 1600004145}, results[3]['result'])
+        self.assertEqual('Invalid plane_id', results[5]['message'])
+        self.assertEqual('action must be one of: load, depart, unload', results[6]['message'])
+
+        planes = self.http_client.get('/v1/planes').get_json()['planes']
+        self.assertEqual(set(job_ids[:2]), set(planes[plane_1_id]['loaded_jobs']))
+        self.assertEqual(set(job_ids[2:3]), set(planes[plane_2_id]['loaded_jobs']))
+        self.assertEqual('c1036', planes[plane_2_id]['destination_city_id'])
+        jobs = self.http_client.get('/v1/cities/c1005/jobs').get_json()['jobs']
+        self.assertFalse(set(job_ids[:3]) & set(jobs))
+
+        # Unload both planes once they landed, the revenue of both planes is added to the balance in one write
+        self.clock.advance(4145)
+        balance = self.utils.get_balance(self.player_name)
+        revenue = sum(job['revenue'] for plane in planes.values() for job in plane['loaded_jobs'].values()
+                      if job['destination_city_id'] == 'c1036')
+        result = self.http_client.post('/v1/fleet/actions', json={'actions': [
+            {'plane_id': plane_1_id, 'action': 'unload'},
+            {'plane_id': plane_2_id, 'action': 'unload'},
+        ]}).get_json()
+        self.assertEqual(balance + revenue, result['balance'])
+
+    @moto.mock_dynamodb2
+    def test_fleet_actions_many_planes(self):
+        """
+        Test a request writing more items than fit in one transaction is split into transactions. Every
+        departure writes the plane and its arrival.
+        """
+        plane_ids, _ = self.create_fleet(30)
+
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'transact', wraps=repository.transact) as transact:
+            result = self.http_client.post('/v1/fleet/actions', json={'actions': [
+                {'plane_id': plane_id, 'action': 'depart', 'destination_city_id': 'c1036'} for plane_id in plane_ids
+            ]})
+        self.assertEqual(3, transact.call_count)
+        self.assertTrue(all(result['success'] for result in result.get_json()['results']))
+        self.assertTrue(all(plane['destination_city_id'] == 'c1036'
+                            for plane in self.http_client.get('/v1/planes').get_json()['planes'].values()))
+
+    @moto.mock_dynamodb2
+    def test_fleet_actions_conflict(self):
+        """
+        Test every action written by a transaction fails when the transaction conflicts with a
+        concurrent request
+        """
+        (plane_1_id, plane_2_id), job_ids = self.create_fleet(2)
+
+        fleet = self.fleet.FleetRequest(self.player_name)
+        fleet.apply({'plane_id': plane_1_id, 'action': 'depart', 'destination_city_id': 'c1036'})
+        fleet.apply({'plane_id': plane_2_id, 'action': 'load', 'loaded_jobs': job_ids[:1]})
+
+        # A concurrent request loads the same job onto another plane before this request writes
+        self.assertTrue(self.utils.load_plane(self.player_name, plane_1_id, job_ids[:1])[0])
+
+        self.assertEqual(1, fleet.commit())
+        self.assertEqual([{'plane_id': plane_1_id, 'action': 'depart', 'success': False,
+                           'message': 'Conflicting update, please retry'}], fleet.changes[plane_1_id].results)
+        self.assertFalse(fleet.changes[plane_2_id].results[0]['success'])
+
+    @moto.mock_dynamodb2
+    def test_fleet_actions_invalid(self):
+        """
+        Test invalid fleet requests
+        """
+        shared_test_utils.create_table()
+        result = self.http_client.post('/v1/fleet/actions', json={'actions': ['load']})
+        self.assertEqual('actions is a required field', result.get_data().decode('utf-8'))
+        self.assertEqual(400, result.status_code)
+
+        result = self.http_client.post('/v1/fleet/actions', json={'actions': [{}] * 1000})
+        self.assertEqual('A maximum of 200 actions is allowed', result.get_data().decode('utf-8'))
+        self.assertEqual(400, result.status_code)
+
+        result = self.http_client.post('/v1/fleet/actions', json={'actions': [{'action': 'load'}]})
+        self.assertEqual('Player does not exist', result.get_data().decode('utf-8'))
+        self.assertEqual(400, result.status_code)
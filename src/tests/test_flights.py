@@ -0,0 +1,43 @@
+import unittest
+
+from storage import layout
+from storage.memory import InMemoryPlayerRepository
+from storage.repository import ConditionalCheckFailed
+from utils import flights
+
+
+class TestFlights(unittest.TestCase):
+
+    def test_status(self):
+        """
+        Test the flight state is computed from the absolute arrival time, for current and legacy planes
+        """
+        plane = {'state': 'in_flight', 'departed_at': 100, 'arrives_at': 200}
+        self.assertEqual('grounded', flights.status({'state': 'grounded'}, now=150))
+        self.assertEqual('in_flight', flights.status(plane, now=199))
+        self.assertEqual('arrived', flights.status(plane, now=200))
+        self.assertEqual({'state': 'in_flight', 'departed_at': 100, 'arrives_at': 200, 'seconds_remaining': 50},
+                         flights.describe(plane, now=150))
+        self.assertEqual((False, 'Plane is currently in flight'), flights.check_grounded(plane, now=150))
+
+        # Planes departed before the flight state was stored
+        self.assertEqual('grounded', flights.status({}, now=150))
+        self.assertEqual('grounded', flights.status({'eta': 0}, now=150))
+        self.assertEqual('in_flight', flights.status({'eta': 4145, 'arrives_at': 200}, now=150))
+        self.assertEqual('arrived', flights.status({'eta': 4145}, now=150))
+
+    def test_grounded_condition(self):
+        """
+        Test writes conditional on a grounded plane only succeed on grounded planes
+        """
+        repository = InMemoryPlayerRepository()
+        for plane_id, plane in [('p1', {'state': 'grounded'}), ('p2', {}), ('p3', {'eta': 0}),
+                                ('p4', {'state': 'in_flight', 'arrives_at': 200}), ('p5', {'eta': 4145})]:
+            repository.put(layout.plane_item('foo', plane_id, plane))
+        for plane_id in ['p1', 'p2', 'p3']:
+            repository.update(layout.plane_key('foo', plane_id), updates={'loaded': True},
+                              condition=flights.grounded_condition())
+        for plane_id in ['p4', 'p5']:
+            with self.assertRaises(ConditionalCheckFailed):
+                repository.update(layout.plane_key('foo', plane_id), updates={'loaded': True},
+                                  condition=flights.grounded_condition())
@@ -0,0 +1,49 @@
+import logging
+import unittest.mock
+
+from config import config
+from utils import logs
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.level = logging.getLogger().level
+
+    def tearDown(self):
+        logging.getLogger().setLevel(self.level)
+
+    def test_setup(self):
+        """
+        Test logging is configured once per process
+        """
+        with unittest.mock.patch.object(logs, '_configured', False), \
+                unittest.mock.patch('aws_lambda_logging.setup') as setup:
+            logs.setup()
+            logs.setup()
+        setup.assert_called_once_with(level=config.log_level, boto_level=config.boto_log_level)
+
+    def test_truncate(self):
+        """
+        Test payloads are cut to the limit when formatted
+        """
+        payload = {'jobs': 'x' * 50}
+        self.assertEqual(str(payload), str(logs.truncate(payload)))
+        self.assertEqual(f'{str(payload)[:10]}... (62 characters)', str(logs.truncate(payload, 10)))
+        self.assertEqual(str(payload), str(logs.truncate(payload, 0)))
+        with unittest.mock.patch.object(config, 'log_payload_limit', 20):
+            self.assertEqual(f'{str(payload)[:20]}... (62 characters)', '%s' % logs.truncate(payload))
+
+    def test_set_route_level(self):
+        """
+        Test the level is set per route and falls back to config.log_level
+        """
+        self.assertEqual({'GET /v1/planes': 'WARNING', 'PUT /v1/planes/<string:plane_id>/load': 'DEBUG'},
+                         logs.parse_route_levels('GET /v1/planes=warning; PUT /v1/planes/<string:plane_id>/load=DEBUG;'))
+        with unittest.mock.patch.object(config, 'log_route_levels', 'GET /v1/planes=WARNING'):
+            logs.set_route_level('GET /v1/planes')
+            self.assertEqual(logging.WARNING, logging.getLogger().level)
+            logs.set_route_level('GET /v1/cities')
+            self.assertEqual(logging.getLevelName(config.log_level), logging.getLogger().level)
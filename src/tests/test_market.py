@@ -1,7 +1,11 @@
+import base64
+import gzip
+import json
 import logging
 import os
-import unittest
+import unittest.mock
 
+import flask
 import moto
 
 logging.basicConfig(level=logging.INFO)
@@ -52,3 +56,123 @@ class TestMarket(unittest.TestCase):
         self.assertEqual(2, len(result.get_json()['planes']))
         self.assertEqual(200, result.get_json()['planes'][0]['cost'])
         self.assertEqual(200, result.status_code)
+
+    @moto.mock_dynamodb2
+    def test_market_cities_get_cached(self):
+        """
+        Test the cities response is only rendered once
+        """
+        from handlers import market
+        from utils import response_cache
+        with unittest.mock.patch.dict(response_cache._cache, clear=True), \
+                unittest.mock.patch.object(market, 'render_available_cities',
+                                           wraps=market.render_available_cities) as render:
+            first = self.http_client.get('/v1/market/cities')
+            second = self.http_client.get('/v1/market/cities')
+        self.assertEqual(first.get_data(), second.get_data())
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertEqual(1, render.call_count)
+
+    @moto.mock_dynamodb2
+    def test_market_cities_get_not_modified(self):
+        """
+        Test getting cities with a matching ETag
+        """
+        etag = self.http_client.get('/v1/market/cities').headers['ETag']
+        result = self.http_client.get('/v1/market/cities', headers={'If-None-Match': etag})
+        self.assertEqual(304, result.status_code)
+        self.assertEqual(b'', result.get_data())
+        self.assertEqual(etag, result.headers['ETag'])
+
+        result = self.http_client.get('/v1/market/cities', headers={'If-None-Match': '"foo"'})
+        self.assertEqual(200, result.status_code)
+
+    @moto.mock_dynamodb2
+    def test_market_cities_get_gzip(self):
+        """
+        Test getting cities with gzip encoding
+        """
+        identity = self.http_client.get('/v1/market/cities')
+        result = self.http_client.get('/v1/market/cities', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(200, result.status_code)
+        self.assertEqual('gzip', result.headers['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', result.headers['Vary'])
+        self.assertNotEqual(identity.headers['ETag'], result.headers['ETag'])
+        self.assertLess(len(result.get_data()), len(identity.get_data()))
+        self.assertEqual(identity.get_data(), gzip.decompress(result.get_data()))
+        self.assertNotIn('Content-Encoding', identity.headers)
+
+        result = self.http_client.get('/v1/market/cities', headers={'Accept-Encoding': 'gzip',
+                                                                    'If-None-Match': result.headers['ETag']})
+        self.assertEqual(304, result.status_code)
+
+    @moto.mock_dynamodb2
+    def test_market_planes_get_not_modified(self):
+        """
+        Test getting planes with a matching ETag
+        """
+        etag = self.http_client.get('/v1/market/planes').headers['ETag']
+        result = self.http_client.get('/v1/market/planes', headers={'If-None-Match': etag})
+        self.assertEqual(304, result.status_code)
+
+    @moto.mock_dynamodb2
+    def test_lambda_handler_gzip(self):
+        """
+        Test compressed responses are base64 encoded for API Gateway
+        """
+        from micro_airlines_api import lambda_handler
+        event = {
+            'httpMethod': 'GET',
+            'path': '/v1/market/planes',
+            'queryStringParameters': None,
+            'headers': {'Accept-Encoding': 'gzip'},
+            **self.request
+        }
+        result = lambda_handler(event, None)
+        self.assertEqual('200', result['statusCode'])
+        self.assertTrue(result['isBase64Encoded'])
+        body = json.loads(gzip.decompress(base64.b64decode(result['body'])))
+        self.assertEqual(2, len(body['planes']))
+
+        event['headers'] = {}
+        result = lambda_handler(event, None)
+        self.assertFalse(result['isBase64Encoded'])
+        self.assertEqual(2, len(json.loads(result['body'])['planes']))
+
+    @moto.mock_dynamodb2
+    def test_market_cities_etag_stable(self):
+        """
+        Test the cities ETag does not depend on when the catalog was loaded, so every container returns the same one
+        """
+        from definitions import catalog
+        from handlers import market
+        from micro_airlines_api import app
+        from utils import response_cache
+        etags = []
+        for now in [1600000000, 1600009999]:
+            with unittest.mock.patch('time.time', return_value=now), \
+                    unittest.mock.patch.object(market, 'cities', catalog.LazyCatalog('cities')), \
+                    app.test_request_context():
+                etags.append(response_cache.CachedResponse(flask.jsonify(market.render_available_cities()).get_data()).etag)
+        self.assertEqual(etags[0], etags[1])
+        self.assertEqual(0, self.http_client.get('/v1/market/cities').get_json()['cities'][0]['jobs_expire'])
+
+    @moto.mock_dynamodb2
+    def test_lambda_handler_not_modified(self):
+        """
+        Test a matching If-None-Match through the lambda handler returns a 304 without a body
+        """
+        from micro_airlines_api import lambda_handler
+        event = {
+            'httpMethod': 'GET',
+            'path': '/v1/market/cities',
+            'queryStringParameters': None,
+            'headers': {},
+            **self.request
+        }
+        etag = lambda_handler(event, None)['headers']['ETag']
+        event['headers'] = {'If-None-Match': etag}
+        result = lambda_handler(event, None)
+        self.assertEqual('304', result['statusCode'])
+        self.assertFalse(result['isBase64Encoded'])
+        self.assertEqual('', result['body'])
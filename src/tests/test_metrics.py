@@ -0,0 +1,155 @@
+import io
+import json
+import logging
+import os
+import unittest.mock
+
+import moto
+from boto3.dynamodb.conditions import Attr
+
+import storage
+from config import config
+from storage import layout
+from storage.dynamodb import DynamoDBPlayerRepository
+from storage.repository import ConditionalCheckFailed
+from tests import shared_test_utils
+from utils import metrics
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+        metrics.start_invocation()
+
+    def use_dynamodb(self):
+        """
+        Measure the DynamoDB repository whichever repository the tests run with
+        """
+        shared_test_utils.create_dynamodb_table()
+        storage.set_repository(DynamoDBPlayerRepository(config.dynamodb_players_table))
+        self.addCleanup(storage.set_repository, None)
+
+    def test_summary(self):
+        """
+        Test calls are added up per operation and in total in an EMF document
+        """
+        metrics.start_invocation('GET /v1/planes')
+        metrics.record('GetItem', 2.0, read_units=0.5, item_bytes=100)
+        metrics.record('GetItem', 3.0, read_units=0.5, item_bytes=50, retries=1)
+        metrics.record('UpdateItem', 5.0, write_units=1, item_bytes=200, error=True)
+
+        summary = metrics._invocation.summary()
+        self.assertEqual('GET /v1/planes', summary['Route'])
+        self.assertEqual([['Route']], summary['_aws']['CloudWatchMetrics'][0]['Dimensions'])
+        self.assertEqual(config.metrics_namespace, summary['_aws']['CloudWatchMetrics'][0]['Namespace'])
+        self.assertEqual({'Calls': 2, 'Errors': 0, 'Latency': 5.0, 'ReadCapacityUnits': 1.0, 'WriteCapacityUnits': 0,
+                          'ItemBytes': 150, 'Retries': 1}, summary['Operations']['GetItem'])
+        self.assertEqual((3, 1, 10.0, 1.0, 1, 350, 1),
+                         tuple(summary[name] for name, _ in metrics.METRICS))
+
+    def test_histogram(self):
+        """
+        Test percentiles are within the accuracy of the histogram
+        """
+        histogram = metrics.Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for value in range(1, 1001):
+            histogram.record(value)
+
+        self.assertEqual(1000, histogram.count)
+        for percentile, expected in [(50, 500), (95, 950), (99, 990), (100, 1000)]:
+            self.assertAlmostEqual(expected, histogram.percentile(percentile), delta=expected * metrics.HISTOGRAM_ACCURACY)
+        self.assertLess(len(histogram.buckets), 400)
+        self.assertEqual({'count', 'p50', 'p95', 'p99'}, set(histogram.summary()))
+
+    @moto.mock_dynamodb2
+    def test_request_duration(self):
+        """
+        Test the wall time of a request is recorded in the histogram of its route
+        """
+        from micro_airlines_api import app
+        route = 'GET /v1/market/planes'
+        count = metrics.get_histogram(route).count
+        app.test_client().get('/v1/market/planes')
+
+        self.assertEqual(route, metrics._invocation.route)
+        self.assertGreater(metrics._invocation.duration, 0)
+        self.assertEqual(count + 1, metrics.get_histogram(route).count)
+        summary = metrics._invocation.summary()
+        self.assertEqual(metrics._invocation.duration, summary['Duration'])
+        self.assertEqual(count + 1, summary['RouteLatency']['count'])
+        self.assertIn({'Name': 'Duration', 'Unit': 'Milliseconds'}, summary['_aws']['CloudWatchMetrics'][0]['Metrics'])
+
+    def test_request_duration_unmatched(self):
+        """
+        Test requests no route matched share one histogram, whatever their path
+        """
+        from micro_airlines_api import app, UNMATCHED_ROUTE
+        route = f'GET {UNMATCHED_ROUTE}'
+        count = metrics.get_histogram(route).count
+        for path in ['/foo', '/wp-login.php']:
+            self.assertEqual(404, app.test_client().get(path).status_code)
+            self.assertEqual(route, metrics._invocation.route)
+
+        self.assertEqual(count + 2, metrics.get_histogram(route).count)
+        self.assertFalse(any('/foo' in name or 'wp-login' in name for name in metrics._histograms))
+
+    def test_consumed_capacity(self):
+        """
+        Test reading the consumed capacity of single item and transaction responses
+        """
+        self.assertEqual((0, 0), metrics.consumed_capacity(None))
+        self.assertEqual((0.5, 0), metrics.consumed_capacity({'CapacityUnits': 0.5}))
+        self.assertEqual((0, 4.0), metrics.consumed_capacity([{'CapacityUnits': 2.0}, {'CapacityUnits': 2.0}],
+                                                             write=True))
+        self.assertEqual((1.0, 2.0), metrics.consumed_capacity({'CapacityUnits': 3.0, 'ReadCapacityUnits': 1.0,
+                                                                'WriteCapacityUnits': 2.0}))
+
+    @moto.mock_dynamodb2
+    def test_measure_repository(self):
+        """
+        Test every DynamoDB call is measured, including the calls which fail
+        """
+        self.use_dynamodb()
+        repository = storage.get_repository()
+        profile = layout.profile_key('foo')
+        repository.put({**profile, 'balance': 500})
+        repository.get(profile)
+        with self.assertRaises(ConditionalCheckFailed):
+            repository.update(profile, increments={'balance': -1000}, condition=Attr('balance').gte(1000))
+
+        operations = metrics._invocation.operations
+        self.assertEqual({'PutItem', 'GetItem', 'UpdateItem'}, set(operations))
+        self.assertEqual(layout.item_size({**profile, 'balance': 500}), operations['GetItem']['ItemBytes'])
+        self.assertEqual(1, operations['UpdateItem']['Errors'])
+        self.assertGreater(operations['GetItem']['Latency'], 0)
+
+    @moto.mock_dynamodb2
+    def test_lambda_handler_emits(self):
+        """
+        Test the lambda handler prints one EMF line tagged with the route of the request
+        """
+        self.use_dynamodb()
+        from micro_airlines_api import lambda_handler
+        event = {
+            'httpMethod': 'GET',
+            'path': '/v1/player',
+            'queryStringParameters': None,
+            'headers': {},
+            'requestContext': {'authorizer': {'claims': {'cognito:username': 'test_player_1'}}}
+        }
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            lambda_handler(event, None)
+        summaries = [json.loads(line) for line in stdout.getvalue().splitlines() if '"_aws"' in line]
+
+        self.assertEqual(1, len(summaries))
+        self.assertEqual('GET /v1/player', summaries[0]['Route'])
+        self.assertEqual(1, summaries[0]['Operations']['GetItem']['Calls'])
+
+        with unittest.mock.patch.object(config, 'metrics_enabled', False):
+            self.assertIsNone(metrics.emit())
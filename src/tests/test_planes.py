@@ -6,7 +6,9 @@ import time
 import moto
 
 from definitions.planes import planes
+import storage
 from tests import shared_test_utils
+from utils import arrivals, clock
 
 logging.basicConfig(level=logging.INFO)
 
@@ -52,9 +54,37 @@ class TestPlanes(unittest.TestCase):
 
         _, first_plane = result.get_json()['planes'].popitem()
 
-        self.assertEqual(planes['a1'].serialize(), first_plane)
+        self.assertEqual({**planes['a1'].serialize(), 'current_city_id': 'c1001'}, first_plane)
+        self.assertEqual('none', planes['a1'].current_city_id)
         self.assertEqual(200, result.status_code)
 
+    @moto.mock_dynamodb2
+    def test_planes_get_fields_and_pages(self):
+        """
+        Test getting only some fields of the planes, and the planes one page at a time
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=100000)
+        for city_id in ['c1001', 'c1002', 'c1003']:
+            self.utils.add_plane_to_player(player_id=self.player_name, plane_id='a1', current_city_id=city_id)
+        planes = self.http_client.get('/v1/planes').get_json()['planes']
+        plane_ids = sorted(planes)
+
+        result = self.http_client.get('/v1/planes?fields=planes.*.current_city_id,planes.*.loaded_jobs')
+        self.assertEqual({plane_id: {'current_city_id': plane['current_city_id'], 'loaded_jobs': {}}
+                          for plane_id, plane in planes.items()}, result.get_json()['planes'])
+
+        result = self.http_client.get(f'/v1/planes?fields=planes.{plane_ids[1]}')
+        self.assertEqual({plane_ids[1]: planes[plane_ids[1]]}, result.get_json()['planes'])
+
+        result = self.http_client.get('/v1/planes?limit=2&fields=planes.*.state').get_json()
+        self.assertEqual({plane_id: {'state': 'grounded'} for plane_id in plane_ids[:2]}, result['planes'])
+        self.assertEqual(plane_ids[1], result['cursor'])
+        result = self.http_client.get(f'/v1/planes?limit=2&cursor={result["cursor"]}').get_json()
+        self.assertEqual({'planes': {plane_ids[2]: planes[plane_ids[2]]}}, result)
+
+        self.assertEqual(400, self.http_client.get('/v1/planes?limit=101').status_code)
+
     @moto.mock_dynamodb2
     def test_planes_get_not_exist(self):
         """
@@ -82,7 +112,7 @@ class TestPlanes(unittest.TestCase):
         # Query the table to validate the result
         _, result = self.utils.get_player_attributes(self.player_name, attributes_to_get=['planes'])
         _, first_plane = result['planes'].popitem()
-        self.assertEqual(planes['a1'].serialize(), first_plane)
+        self.assertEqual({**planes['a1'].serialize(), 'current_city_id': 'c1001'}, first_plane)
 
     @moto.mock_dynamodb2
     def test_planes_post_multiple(self):
@@ -311,12 +341,8 @@ class TestPlanes(unittest.TestCase):
         plane_id, _ = self.http_client.get('/v1/planes').get_json().get('planes').popitem()
 
         # Update city to fake the jobs expiring
-        self.utils.table.update_item(
-            Key={'player_id': self.player_name},
-            UpdateExpression="SET cities.c1001.jobs_expire = :jobs_expire",
-            ExpressionAttributeValues={
-                ':jobs_expire': int(time.time() - 60)
-            })
+        storage.get_repository().update({'player_id': self.player_name, 'entity': 'jobs#c1001'},
+                                        updates={'jobs_expire': int(time.time() - 60)})
 
         # Pick some jobs of compatible type
         job_ids = [key for key, values in jobs.items()
@@ -371,3 +397,102 @@ class TestPlanes(unittest.TestCase):
         })
         self.assertEqual(400, result.status_code)
         self.assertEqual('Not enough capacity', result.get_data().decode('utf-8'))
+
+    @moto.mock_dynamodb2
+    def test_plane_suggest_load(self):
+        """
+        Test suggesting the highest revenue compatible jobs, for any destination and grouped by destination
+        """
+        shared_test_utils.create_table()
+        self.http_client.post('/v1/player')
+        for city_id in ['c1005', 'c1036', 'c1003', 'c1001']:
+            self.http_client.post('/v1/cities', json={'city': city_id})
+        self.http_client.post('/v1/planes', json={'plane': 'a1', 'city': 'c1005'})
+        jobs = self.http_client.get('/v1/cities/c1005/jobs').get_json().get('jobs')
+        plane_id, _ = self.http_client.get('/v1/planes').get_json().get('planes').popitem()
+        compatible = {job_id: job for job_id, job in jobs.items() if job.get('job_type') == 'C'}
+
+        result = self.http_client.get(f'/v1/planes/{plane_id}/suggest-load')
+        self.assertEqual(200, result.status_code)
+        suggested = result.get_json()
+        self.assertEqual(sorted((job['revenue'] for job in compatible.values()), reverse=True)[:4],
+                         sorted((job['revenue'] for job in suggested['loaded_jobs'].values()), reverse=True))
+        self.assertIsNone(suggested['destination_city_id'])
+
+        # c1001 is beyond the range of the plane
+        result = self.http_client.get(f'/v1/planes/{plane_id}/suggest-load?by_destination=true')
+        suggested = result.get_json()
+        best = max(['c1036', 'c1003'], key=lambda city_id: sum(sorted(
+            (job['revenue'] for job in compatible.values() if job['destination_city_id'] == city_id), reverse=True)[:4]))
+        self.assertEqual(best, suggested['destination_city_id'])
+        self.assertTrue(all(job['destination_city_id'] == best for job in suggested['loaded_jobs'].values()))
+
+        result = self.http_client.get(f'/v1/planes/{plane_id}/suggest-load?destination_city_id=c1001')
+        suggested = result.get_json()
+        self.assertTrue(all(job['destination_city_id'] == 'c1001' for job in suggested['loaded_jobs'].values()))
+
+        # The suggestion can be loaded as is
+        result = self.http_client.put(f'/v1/planes/{plane_id}/load', json={'loaded_jobs': list(suggested['loaded_jobs'])})
+        self.assertEqual(200, result.status_code)
+
+    @moto.mock_dynamodb2
+    def test_plane_suggest_load_invalid(self):
+        """
+        Test suggesting a load for an invalid plane
+        """
+        shared_test_utils.create_table()
+        result = self.http_client.get('/v1/planes/foo/suggest-load')
+        self.assertEqual(400, result.status_code)
+        self.assertEqual('Player does not exist', result.get_data().decode('utf-8'))
+
+        self.http_client.post('/v1/player')
+        result = self.http_client.get('/v1/planes/foo/suggest-load')
+        self.assertEqual('Invalid plane_id', result.get_data().decode('utf-8'))
+
+    @moto.mock_dynamodb2
+    def test_plane_flight_status(self):
+        """
+        Test the flight state of a plane through a departure and landing, busy planes are rejected
+        with one projected read of the plane
+        """
+        shared_test_utils.create_table()
+        game_clock = clock.FakeClock(1600000000)
+        clock.set_clock(game_clock)
+        self.addCleanup(clock.set_clock, None)
+        self.http_client.post('/v1/player')
+        for city_id in ['c1005', 'c1036']:
+            self.http_client.post('/v1/cities', json={'city': city_id})
+        self.http_client.post('/v1/planes', json={'plane': 'a1', 'city': 'c1005'})
+        plane_id, _ = self.http_client.get('/v1/planes').get_json().get('planes').popitem()
+
+        self.assertEqual({'state': 'grounded'}, self.http_client.get(f'/v1/planes/{plane_id}/status').get_json())
+        self.assertEqual(404, self.http_client.get('/v1/planes/foo/status').status_code)
+
+        result = self.http_client.put(f'/v1/planes/{plane_id}/depart', json={'destination_city_id': 'c1036'})
+        self.assertEqual(200, result.status_code)
+        game_clock.advance(145)
+        self.assertEqual({'state': 'in_flight', 'departed_at': 1600000000, 'arrives_at': 1600004145,
+                          'seconds_remaining': 4000}, self.http_client.get(f'/v1/planes/{plane_id}/status').get_json())
+
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'query') as query, \
+                unittest.mock.patch.object(repository, 'get', wraps=repository.get) as get:
+            result = self.http_client.put(f'/v1/planes/{plane_id}/depart', json={'destination_city_id': 'c1005'})
+            self.assertEqual('Plane is currently in flight', result.get_data().decode('utf-8'))
+            result = self.http_client.put(f'/v1/planes/{plane_id}/unload')
+            self.assertEqual('Plane has not yet landed', result.get_data().decode('utf-8'))
+        query.assert_not_called()
+        # Neither read includes the loaded jobs
+        self.assertEqual(2, get.call_count)
+        self.assertTrue(all('loaded_jobs' not in call[1]['attributes'] for call in get.call_args_list))
+
+        game_clock.advance(4000)
+        self.assertEqual('arrived', self.http_client.get(f'/v1/planes/{plane_id}/status').get_json()['state'])
+        result = self.http_client.put(f'/v1/planes/{plane_id}/load', json={'loaded_jobs': ['foo']})
+        self.assertEqual('Plane has arrived and must be unloaded first', result.get_data().decode('utf-8'))
+
+        result = self.http_client.post('/v1/fleet/actions', json={'actions': [
+            {'plane_id': plane_id, 'action': 'unload'}]})
+        self.assertEqual('No jobs to remove at city', result.get_json()['results'][0]['message'])
+        self.assertEqual(0, arrivals.process_arrivals()['failed'])
+        self.assertEqual({'state': 'grounded'}, self.http_client.get(f'/v1/planes/{plane_id}/status').get_json())
@@ -0,0 +1,59 @@
+import logging
+import os
+import tempfile
+import unittest.mock
+
+from config import config
+from utils import profiling, rng
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+
+    def tearDown(self):
+        rng.set_seed(None)
+
+    def test_should_profile(self):
+        """
+        Test requests are only profiled when sampled or, if enabled, asked for with the header
+        """
+        headers = {profiling.PROFILE_HEADER: 'true'}
+        self.assertFalse(profiling.should_profile(headers))
+        with unittest.mock.patch.object(config, 'profile_header', True):
+            self.assertTrue(profiling.should_profile(headers))
+            self.assertFalse(profiling.should_profile({}))
+        with unittest.mock.patch.object(config, 'profile_sample_rate', 1):
+            self.assertTrue(profiling.should_profile({}))
+
+    def test_should_profile_keeps_seeded_generator(self):
+        """
+        Test sampling requests does not draw from the seeded process generator
+        """
+        rng.set_seed(42)
+        expected = rng.get_generator().random()
+        rng.set_seed(42)
+        with unittest.mock.patch.object(config, 'profile_sample_rate', 0.5):
+            for _ in range(10):
+                profiling.should_profile({})
+        self.assertEqual(expected, rng.get_generator().random())
+
+    def test_profile_request(self):
+        """
+        Test a profiled request logs its report and dumps its stats
+        """
+        from micro_airlines_api import app
+        with tempfile.TemporaryDirectory() as profile_dir, \
+                unittest.mock.patch.object(config, 'profile_header', True), \
+                unittest.mock.patch.object(config, 'profile_dir', profile_dir), \
+                self.assertLogs(level='INFO') as logs:
+            result = app.test_client().get('/v1/market/planes', headers={profiling.PROFILE_HEADER: 'true'})
+            self.assertEqual(200, result.status_code)
+            self.assertTrue(any('Profile of "GET /v1/market/planes"' in line for line in logs.output))
+            self.assertEqual(1, len(os.listdir(profile_dir)))
+            self.assertTrue(os.listdir(profile_dir)[0].startswith('GET_v1_market_planes-'))
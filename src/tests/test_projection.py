@@ -0,0 +1,46 @@
+import unittest
+
+from utils import projection
+
+
+class TestProjection(unittest.TestCase):
+
+    def test_parse_fields(self):
+        """
+        Test fields are parsed into the attribute paths requested per entity
+        """
+        self.assertEqual((True, {'*': None}), projection.parse_fields(None, 'cities'))
+        self.assertEqual((True, {'*': ['name', 'layovers.c1002'], 'c1001': None}),
+                         projection.parse_fields('cities.*.name, cities.*.layovers.c1002,cities.c1001.name,cities.c1001',
+                                                 'cities'))
+        self.assertFalse(projection.parse_fields('planes.*.name', 'cities')[0])
+        self.assertFalse(projection.parse_fields('cities.*.', 'cities')[0])
+
+    def test_select(self):
+        """
+        Test selecting the requested entities and nested fields
+        """
+        entities = {'p1': {'name': 'Plane 1', 'loaded_jobs': {'j1': {'revenue': 10, 'job_type': 'C'}}},
+                    'p2': {'name': 'Plane 2', 'loaded_jobs': {}}}
+        _, requested = projection.parse_fields('planes.*.loaded_jobs.j1.revenue,planes.p2.name', 'planes')
+        self.assertEqual(['loaded_jobs.j1.revenue', 'name'], projection.read_paths(requested))
+        self.assertEqual({'p1': {'loaded_jobs': {'j1': {'revenue': 10}}}, 'p2': {'name': 'Plane 2'}},
+                         projection.select(entities, requested))
+        self.assertEqual({'p2': entities['p2']}, projection.select(entities, {'p2': None}))
+
+    def test_read_paths_overlapping(self):
+        """
+        Test paths inside another requested path, and the key attributes, are not read twice
+        """
+        _, requested = projection.parse_fields('planes.*.loaded_jobs.j1,planes.*.loaded_jobs,planes.p1.loaded_jobs_count,'
+                                               'planes.*.entity.x,planes.p1.name,planes.p2.name', 'planes')
+        self.assertEqual(['loaded_jobs', 'loaded_jobs_count', 'name'], projection.read_paths(requested))
+
+    def test_paginate(self):
+        """
+        Test paging through a collection in entity id order
+        """
+        entities = {entity_id: {} for entity_id in ['c', 'a', 'b']}
+        self.assertEqual(({'a': {}, 'b': {}}, 'b'), projection.paginate(entities, limit=2))
+        self.assertEqual(({'c': {}}, None), projection.paginate(entities, limit=2, cursor='b'))
+        self.assertEqual((entities, None), projection.paginate(entities))
@@ -0,0 +1,308 @@
+import logging
+import os
+import threading
+import unittest.mock
+from decimal import Decimal
+
+import moto
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+import storage
+from config import config
+from storage import layout
+from storage.dynamodb import DynamoDBPlayerRepository
+from storage.memory import InMemoryPlayerRepository
+from storage.repository import (MAX_BATCH_GET_ITEMS, ConditionalCheckFailed, ConditionCheck, Delete, Put, RepositoryError,
+                                TransactionConflict, Update)
+from tests import shared_test_utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class RepositoryContract:
+    """
+    Behaviour every PlayerRepository backend must share, run against each backend below
+    """
+
+    def create_repository(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.repository = self.create_repository()
+        self.profile = layout.profile_key('foo')
+        self.plane = layout.plane_key('foo', 'p1')
+        self.repository.put({**self.profile, 'balance': 500})
+        self.repository.put({**self.plane, 'speed': 165, 'loaded_jobs': {'j1': {'revenue': 10}}})
+
+    def test_get(self):
+        """
+        Test getting an item, a projection of an item and a missing item
+        """
+        self.assertEqual({**self.profile, 'balance': 500}, self.repository.get(self.profile))
+        self.assertEqual({'balance': 500}, self.repository.get(self.profile, attributes=['balance'], consistent=True))
+        self.assertIsNone(self.repository.get(layout.profile_key('bar')))
+
+    def test_query(self):
+        """
+        Test querying the items of a player by sort key prefix, in sort key order
+        """
+        self.repository.put({**layout.plane_key('foo', 'a0'), 'speed': 100})
+        self.repository.put({**layout.plane_key('bar', 'b0'), 'speed': 100})
+        self.repository.put({**layout.city_key('foo', 'c1001')})
+
+        self.assertEqual(['plane#a0', 'plane#p1'],
+                         [item['entity'] for item in self.repository.query('foo', layout.PLANE_PREFIX)])
+        self.assertEqual([], self.repository.query('baz', layout.PLANE_PREFIX))
+
+    def test_query_page(self):
+        """
+        Test querying a page of projected items after a sort key
+        """
+        for plane_id in ['a0', 'a1', 'a2']:
+            self.repository.put({**layout.plane_key('foo', plane_id), 'speed': 100, 'loaded_jobs': {'j1': {'revenue': 10}}})
+
+        items = self.repository.query('foo', layout.PLANE_PREFIX, attributes=['loaded_jobs.j1.revenue'], limit=2,
+                                      start_after='plane#a0')
+        self.assertEqual([{**layout.plane_key('foo', plane_id), 'loaded_jobs': {'j1': {'revenue': 10}}}
+                          for plane_id in ['a1', 'a2']], items)
+        self.assertEqual(['plane#p1'], [item['entity'] for item in
+                                        self.repository.query('foo', layout.PLANE_PREFIX, limit=5, start_after='plane#a2')])
+        self.assertEqual({'speed': 165, 'loaded_jobs': {'j1': {'revenue': 10}}},
+                         self.repository.get(self.plane, attributes=['speed', 'loaded_jobs.j1.revenue', 'missing.path']))
+
+    def test_batch_get(self):
+        """
+        Test getting several items, projected, in the order of their keys
+        """
+        keys = [self.plane, layout.profile_key('bar'), self.profile]
+        self.assertEqual([{**self.plane, 'speed': 165, 'loaded_jobs': {'j1': {'revenue': 10}}}, None,
+                          {**self.profile, 'balance': 500}], self.repository.batch_get(keys))
+        self.assertEqual([{'speed': 165}, None, {}],
+                         [item and {name: value for name, value in item.items() if name not in layout.KEY_ATTRIBUTES}
+                          for item in self.repository.batch_get(keys, attributes=['speed'], consistent=True)])
+
+    def test_put_condition(self):
+        """
+        Test a put which must not replace an existing item
+        """
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.put({**self.profile, 'balance': 0}, condition=Attr('player_id').not_exists())
+        self.assertEqual(500, self.repository.get(self.profile)['balance'])
+
+    def test_update(self):
+        """
+        Test setting, removing and adding attributes, including nested map keys
+        """
+        result = self.repository.update(self.plane,
+                                        updates={'eta': 60, 'loaded_jobs.j2': {'revenue': 20}},
+                                        removes=['loaded_jobs.j1', 'speed'],
+                                        increments={'trips': 1})
+        self.assertEqual({'eta': 60, 'loaded_jobs': {'j2': {'revenue': 20}}, 'trips': 1}, result)
+        self.assertEqual({**self.plane, 'eta': 60, 'loaded_jobs': {'j2': {'revenue': Decimal(20)}}, 'trips': 1},
+                         self.repository.get(self.plane))
+
+        # Updating a missing item creates it
+        self.repository.update(layout.plane_key('foo', 'p2'), updates={'eta': 0})
+        self.assertEqual({**layout.plane_key('foo', 'p2'), 'eta': 0}, self.repository.get(layout.plane_key('foo', 'p2')))
+
+    def test_update_conditions(self):
+        """
+        Test the conditions used by the game: balance gte, exists, not_exists, nested exists and size
+        """
+        self.repository.update(self.profile, increments={'balance': -200}, condition=Attr('balance').gte(200))
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.update(self.profile, increments={'balance': -400}, condition=Attr('balance').gte(400))
+        self.assertEqual(300, self.repository.get(self.profile)['balance'])
+
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.update(layout.plane_key('foo', 'missing'), updates={'eta': 1},
+                                   condition=Attr('entity').exists())
+        self.assertIsNone(self.repository.get(layout.plane_key('foo', 'missing')))
+
+        self.repository.update(self.plane, updates={'eta': 1},
+                               condition=Attr('loaded_jobs.j1').exists() & Attr('loaded_jobs').size().lte(1))
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.update(self.plane, updates={'eta': 2},
+                                   condition=Attr('loaded_jobs.j9').exists() | Attr('speed').lt(100))
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.update(self.plane, updates={'eta': 2}, condition=~Attr('speed').between(100, 200))
+        self.assertEqual(1, self.repository.get(self.plane)['eta'])
+
+    def test_delete(self):
+        """
+        Test deleting an item, with a condition and inside a transaction
+        """
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.delete(self.plane, condition=Attr('speed').eq(100))
+        self.repository.delete(self.plane, condition=Attr('speed').eq(165))
+        self.repository.delete(layout.plane_key('foo', 'missing'))
+        self.assertIsNone(self.repository.get(self.plane))
+
+        self.repository.transact([Delete(self.profile), Put({**self.plane, 'speed': 100})])
+        self.assertIsNone(self.repository.get(self.profile))
+        self.assertEqual(100, self.repository.get(self.plane)['speed'])
+
+    def test_transact(self):
+        """
+        Test a transaction is applied completely or not at all
+        """
+        self.repository.transact([
+            Update(self.profile, increments={'balance': -100}, condition=Attr('balance').gte(100)),
+            Put({**layout.city_key('foo', 'c1001'), 'cost': 100}, condition=Attr('entity').not_exists()),
+            ConditionCheck(self.plane, Attr('speed').is_in([165, 200]))
+        ])
+        self.assertEqual(400, self.repository.get(self.profile)['balance'])
+
+        with self.assertRaises(ConditionalCheckFailed):
+            self.repository.transact([
+                Update(self.profile, increments={'balance': -100}, condition=Attr('balance').gte(100)),
+                Put({**layout.city_key('foo', 'c1001'), 'cost': 0}, condition=Attr('entity').not_exists())
+            ])
+        self.assertEqual(400, self.repository.get(self.profile)['balance'])
+        self.assertEqual(100, self.repository.get(layout.city_key('foo', 'c1001'))['cost'])
+
+
+class TestInMemoryPlayerRepository(RepositoryContract, unittest.TestCase):
+
+    def create_repository(self):
+        return InMemoryPlayerRepository()
+
+    def test_concurrent_purchases(self):
+        """
+        Test the balance condition holds when many threads spend from one balance at the same time
+        """
+        purchases = []
+
+        def purchase():
+            for _ in range(100):
+                try:
+                    self.repository.update(self.profile, increments={'balance': -1}, condition=Attr('balance').gte(1))
+                    purchases.append(1)
+                except ConditionalCheckFailed:
+                    pass
+
+        threads = [threading.Thread(target=purchase) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(500, len(purchases))
+        self.assertEqual(0, self.repository.get(self.profile)['balance'])
+
+    def test_invalid_update(self):
+        """
+        Test updates DynamoDB would reject
+        """
+        with self.assertRaises(RepositoryError):
+            self.repository.update(self.plane, updates={'missing.j1': 1})
+        with self.assertRaises(RepositoryError):
+            self.repository.update(self.plane, increments={'loaded_jobs': 1})
+        with self.assertRaises(RepositoryError):
+            self.repository.transact([Update(self.profile, updates={'a': 1}), Update(self.profile, updates={'b': 1})])
+        self.assertFalse(self.repository.get(self.plane).get('missing'))
+
+
+class TestDynamoDBPlayerRepository(RepositoryContract, unittest.TestCase):
+
+    def create_repository(self):
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+
+        self.mock = moto.mock_dynamodb2()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        shared_test_utils.create_dynamodb_table()
+        return DynamoDBPlayerRepository('players')
+
+    def test_batch_get_unprocessed_keys(self):
+        """
+        Test keys left unprocessed by a BatchGetItem are asked again
+        """
+        client = self.repository.table.meta.client
+        batch_get_item = client.batch_get_item
+
+        def throttled(RequestItems, **kwargs):
+            # The first request only returns the first key
+            keys = RequestItems['players']['Keys']
+            response = batch_get_item(RequestItems={'players': {**RequestItems['players'], 'Keys': keys[:1]}}, **kwargs)
+            if len(keys) > 1:
+                response['UnprocessedKeys'] = {'players': {**RequestItems['players'], 'Keys': keys[1:]}}
+            return response
+
+        with unittest.mock.patch.object(client, 'batch_get_item', side_effect=throttled) as mock:
+            items = self.repository.batch_get([self.plane, self.profile])
+        self.assertEqual(2, mock.call_count)
+        self.assertEqual([165, 500], [items[0]['speed'], items[1]['balance']])
+
+    def test_batch_get_many_keys(self):
+        """
+        Test more keys than one BatchGetItem may get are read in several requests
+        """
+        client = self.repository.table.meta.client
+        keys = [layout.plane_key('foo', f'p{i}') for i in range(MAX_BATCH_GET_ITEMS + 50)]
+        with unittest.mock.patch.object(client, 'batch_get_item', wraps=client.batch_get_item) as mock:
+            items = self.repository.batch_get(keys, attributes=['speed'])
+        self.assertEqual([100, 50], [len(call[1]['RequestItems']['players']['Keys']) for call in mock.call_args_list])
+        self.assertEqual([{**self.plane, 'speed': 165}], [item for item in items if item])
+        self.assertEqual({'speed': 165}, layout.strip_key(items[1]))
+
+    def test_transaction_conflict(self):
+        """
+        Test a transaction cancelled by a concurrent transaction is raised as a conflict and retried
+        by versions.write_player
+        """
+        from utils import versions
+        storage.set_repository(self.repository)
+        self.addCleanup(storage.set_repository, None)
+        client = self.repository.table.meta.client
+        transact_write_items = client.transact_write_items
+        cancelled = ClientError({'Error': {'Code': 'TransactionCanceledException',
+                                           'Message': 'Transaction cancelled, please refer cancellation reasons for '
+                                                      'specific reasons [None, TransactionConflict]'},
+                                 'CancellationReasons': [{'Code': 'None'}, {'Code': 'TransactionConflict'}]},
+                                'TransactWriteItems')
+
+        with unittest.mock.patch.object(client, 'transact_write_items', side_effect=cancelled), \
+                self.assertRaises(TransactionConflict):
+            self.repository.transact([Update(self.profile, increments={'balance': 10})])
+
+        def conflicting(**kwargs):
+            # The first attempt is cancelled by a concurrent transaction
+            if conflicting.first:
+                conflicting.first = False
+                raise cancelled
+            return transact_write_items(**kwargs)
+
+        conflicting.first = True
+        with unittest.mock.patch.object(client, 'transact_write_items', side_effect=conflicting) as mock, \
+                unittest.mock.patch('time.sleep') as sleep:
+            self.assertEqual(1, versions.write_player('foo', [Update(self.profile, increments={'balance': 10})]))
+        self.assertEqual(2, mock.call_count)
+        self.assertEqual(1, sleep.call_count)
+        self.assertEqual({'balance': 510, layout.VERSION: 1},
+                         self.repository.get(self.profile, attributes=['balance', layout.VERSION]))
+
+
+class TestGetRepository(unittest.TestCase):
+
+    def tearDown(self):
+        storage.set_repository(None)
+
+    def test_get_repository(self):
+        """
+        Test the repository backend is selected by config and created once
+        """
+        for name, repository_class in [('memory', InMemoryPlayerRepository), ('dynamodb', DynamoDBPlayerRepository)]:
+            storage.set_repository(None)
+            with unittest.mock.patch.object(config, 'player_repository', name):
+                repository = storage.get_repository()
+                self.assertIsInstance(repository, repository_class)
+                self.assertIs(repository, storage.get_repository())
+
+        storage.set_repository(None)
+        with unittest.mock.patch.object(config, 'player_repository', 'sqlite'):
+            with self.assertRaises(ValueError):
+                storage.get_repository()
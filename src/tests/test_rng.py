@@ -0,0 +1,47 @@
+import logging
+import unittest.mock
+
+from config import config
+from utils import rng, utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestRng(unittest.TestCase):
+
+    def tearDown(self):
+        rng.set_seed(None)
+
+    def test_stream(self):
+        """
+        Test a named stream always produces the same numbers and different names produce different numbers
+        """
+        self.assertEqual(rng.stream('jobs', 'foo', 'c1001', 240).integers(1000, size=10).tolist(),
+                         rng.stream('jobs', 'foo', 'c1001', 240).integers(1000, size=10).tolist())
+        self.assertNotEqual(rng.stream('jobs', 'foo', 'c1001', 240).integers(1000, size=10).tolist(),
+                            rng.stream('jobs', 'foo', 'c1001', 480).integers(1000, size=10).tolist())
+
+        # The key only depends on the names, not on the process (eg: python's randomized hash())
+        self.assertEqual(323701510564072974606780985748102793990, rng.stream_key('jobs', 'foo', 'c1001', 240))
+
+    def test_stream_seed(self):
+        """
+        Test the configured seed keys every stream
+        """
+        key = rng.stream_key('jobs', 'foo')
+        with unittest.mock.patch.object(config, 'rng_seed', 42):
+            self.assertNotEqual(key, rng.stream_key('jobs', 'foo'))
+            self.assertEqual(rng.stream_key('jobs', 'foo'), rng.stream_key('jobs', 'foo'))
+
+    def test_set_seed(self):
+        """
+        Test seeding the process generator makes generated jobs and ids reproducible
+        """
+        player_cities = ['c1001', 'c1002', 'c1003']
+        rng.set_seed(7)
+        first = utils.generate_random_jobs(player_cities, 'c1001'), utils.generate_random_string()
+        rng.set_seed(7)
+        self.assertEqual(first, (utils.generate_random_jobs(player_cities, 'c1001'), utils.generate_random_string()))
+
+        generator = rng.get_generator()
+        self.assertIs(generator, rng.get_generator())
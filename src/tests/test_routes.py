@@ -0,0 +1,106 @@
+import logging
+import os
+import unittest
+
+import moto
+
+from tests import shared_test_utils
+from utils.distances import distance_matrix
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestRoutes(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialize test http client and set up the requestContext
+        :return:
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+
+        from utils import routes, utils
+        from micro_airlines_api import app
+        self.routes = routes
+        self.utils = utils
+        self.http_client = app.test_client()
+        self.player_name = 'test_player_1'
+        self.http_client.environ_base['awsgi.event'] = {
+            'requestContext': {
+                'authorizer': {
+                    'claims': {
+                        'cognito:username': self.player_name
+                    }
+                }
+            }
+        }
+
+    def test_route_graph(self):
+        """
+        Test the flight graph of a plane type only has legs within its flight range and is only built once
+        """
+        graph = self.routes.get_route_graph('a1')
+        self.assertIs(graph, self.routes.get_route_graph('a1'))
+        self.assertEqual(len(distance_matrix.city_ids), graph.number_of_nodes())
+        self.assertTrue(all(0 < distance_matrix.distance(origin, destination) <= 900
+                            for origin, destination in graph.edges))
+        self.assertEqual({'distance': 190, 'eta': 4145}, graph.edges['c1005', 'c1036'])
+        self.assertNotIn(('c1001', 'c1036'), graph.edges)
+
+    def test_get_route(self):
+        """
+        Test the fastest route and the route with the fewest legs, and that the trees are cached
+        """
+        fastest = self.routes.get_route('a1', 'c1001', 'c1036')
+        fewest = self.routes.get_route('a1', 'c1001', 'c1036', optimize='hops')
+        self.assertEqual(['c1001', 'c1036'], [fastest['cities'][0], fastest['cities'][-1]])
+        self.assertEqual(len(fastest['cities']) - 1, len(fastest['legs']))
+        self.assertLess(len(fewest['legs']), len(fastest['legs']))
+        self.assertLess(fastest['eta'], fewest['eta'])
+        self.assertEqual(sum(leg['eta'] for leg in fastest['legs']), fastest['eta'])
+        for leg in fastest['legs']:
+            self.assertLessEqual(distance_matrix.distance(leg['origin_city_id'], leg['destination_city_id']), 900)
+
+        hits = self.routes.get_shortest_paths.cache_info().hits
+        self.assertEqual(fastest, self.routes.get_route('a1', 'c1001', 'c1036'))
+        self.assertEqual(hits + 1, self.routes.get_shortest_paths.cache_info().hits)
+
+    @moto.mock_dynamodb2
+    def test_get_route_endpoint(self):
+        """
+        Test planning a route between two cities owned by the player
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id=self.player_name, balance=100000)
+        self.utils.add_city_to_player(player_id=self.player_name, city_id='c1005')
+        self.utils.add_city_to_player(player_id=self.player_name, city_id='c1036')
+
+        result = self.http_client.get('/v1/routes?plane_id=a1&origin_city_id=c1005&destination_city_id=c1036')
+        self.assertEqual(200, result.status_code)
+        self.assertEqual({'cities': ['c1005', 'c1036'], 'distance': 190, 'eta': 4145,
+                          'legs': [{'origin_city_id': 'c1005', 'destination_city_id': 'c1036',
+                                    'distance': 190, 'eta': 4145}]}, result.get_json()['route'])
+
+    @moto.mock_dynamodb2
+    def test_get_route_invalid(self):
+        """
+        Test planning a route with invalid parameters
+        """
+        shared_test_utils.create_table()
+        path = '/v1/routes?plane_id={}&origin_city_id=c1005&destination_city_id={}&optimize={}'
+        for args, message in [(('a1', 'c1036', 'time'), 'Player does not exist'),
+                              (('foo', 'c1036', 'time'), 'Plane does not exist'),
+                              (('a1', 'c1036', 'foo'), 'optimize must be one of: time, hops')]:
+            result = self.http_client.get(path.format(*args))
+            self.assertEqual(message, result.get_data().decode('utf-8'))
+            self.assertEqual(400, result.status_code)
+
+        result = self.http_client.get('/v1/routes?plane_id=a1&origin_city_id=c1005')
+        self.assertEqual('destination_city_id is a required parameter', result.get_data().decode('utf-8'))
+
+        self.utils.create_player(player_id=self.player_name, balance=100000)
+        self.utils.add_city_to_player(player_id=self.player_name, city_id='c1005')
+        result = self.http_client.get(path.format('a1', 'c1036', 'time'))
+        self.assertEqual('Player does not own both cities', result.get_data().decode('utf-8'))
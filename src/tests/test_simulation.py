@@ -0,0 +1,69 @@
+import logging
+import unittest
+
+from boto3.dynamodb.conditions import Attr
+
+from simulation import engine
+from simulation.counting import CountingRepository
+from storage import layout
+from storage.memory import InMemoryPlayerRepository
+from storage.repository import ConditionalCheckFailed, Delete, Update
+from utils import rng
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestSimulation(unittest.TestCase):
+
+    def tearDown(self):
+        rng.set_seed(None)
+
+    def test_counting_repository(self):
+        """
+        Test reads and writes are counted per operation with the capacity they would consume
+        """
+        repository = CountingRepository(InMemoryPlayerRepository())
+        profile = layout.profile_key('foo')
+        repository.put({**profile, 'balance': 500})
+        repository.get(profile)
+        repository.get(layout.profile_key('bar'))
+        repository.transact([Update(profile, increments={'balance': -100}),
+                             Delete(layout.plane_key('foo', 'p1'))])
+        with self.assertRaises(ConditionalCheckFailed):
+            repository.update(profile, increments={'balance': -1000}, condition=Attr('balance').gte(1000))
+
+        size = layout.item_size({**profile, 'balance': 500})
+        # A missing item still consumes one read unit, a transaction twice the write units
+        self.assertEqual({'calls': 2, 'items': 1, 'bytes': size, 'units': 1}, repository.operations['get'])
+        self.assertEqual({'calls': 1, 'items': 1, 'bytes': size, 'units': 1}, repository.operations['put'])
+        self.assertEqual({'calls': 1, 'items': 2, 'bytes': size, 'units': 4}, repository.operations['transact'])
+        self.assertNotIn('update', repository.operations)
+        self.assertEqual({'update': 1}, repository.conditional_failures)
+
+    def test_simulate(self):
+        """
+        Test agents buy, load, depart and land planes, and that a seed replays the same game
+        """
+        result = engine.simulate(players=3, ticks=24, seed=1)
+        self.assertEqual(3, result['players'])
+        self.assertEqual(3, len(result['balances']))
+        self.assertGreater(result['actions']['departures'], 0)
+        self.assertGreater(result['landings']['landed'], 0)
+        self.assertGreater(result['revenue'], 0)
+        self.assertEqual(2, len(result['samples']))
+        self.assertGreater(result['samples'][-1]['largest_item']['plane'], 0)
+
+        replay = engine.simulate(players=3, ticks=24, seed=1)
+        for name in ['actions', 'landings', 'revenue', 'balances', 'operations', 'samples']:
+            self.assertEqual(result[name], replay[name])
+
+    def test_merge_results(self):
+        """
+        Test the results of several shards are added up
+        """
+        result = engine.run_shard(0, players=1, ticks=12, seed=1)
+        merged = engine.merge_results([result, result], elapsed=1)
+        self.assertEqual(2, merged['players'])
+        self.assertEqual(2 * result['revenue'], merged['revenue'])
+        self.assertEqual(2 * result['operations']['get']['calls'], merged['operations']['get']['calls'])
+        self.assertEqual(2 * result['samples'][0]['bytes'], merged['samples'][0]['bytes'])
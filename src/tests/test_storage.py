@@ -0,0 +1,159 @@
+import logging
+import os
+import unittest.mock
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.table import BatchWriter
+import moto
+
+from definitions.cities import cities
+from definitions.planes import planes
+import storage
+from storage import layout
+from storage.dynamodb import DynamoDBPlayerRepository
+from storage.migrate import migrate_table
+from tests import shared_test_utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a player in the original single-item layout
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+
+        from utils import utils
+        self.utils = utils
+
+        city_1 = cities['c1001'].serialize()
+        city_2 = {**cities['c1002'].serialize(),
+                  'jobs': {'abc': {'id': 'abc', 'origin_city_id': 'c1002', 'destination_city_id': 'c1001',
+                                   'revenue': 100, 'job_type': 'P'}},
+                  'jobs_expire': 1234}
+        self.player = {
+            'player_id': 'foo',
+            'balance': 5000,
+            'cities': {'c1001': city_1, 'c1002': city_2},
+            'planes': {'xyz': {**planes['a1'].serialize(), 'current_city_id': 'c1001'}}
+        }
+
+    @staticmethod
+    def without_jobs(player):
+        return {**player, 'cities': {city_id: {**city, 'jobs': {}, 'jobs_expire': 0}
+                                     for city_id, city in player['cities'].items()}}
+
+    def test_split_player(self):
+        """
+        Test splitting a single-item player into entity items
+        """
+        items = {item['entity']: item for item in layout.split_player(self.player)}
+
+        self.assertEqual(['profile', 'city#c1001', 'jobs#c1001', 'city#c1002', 'jobs#c1002', 'plane#xyz'],
+                         list(items.keys()))
+        self.assertEqual({'player_id': 'foo', 'entity': 'profile', 'balance': 5000}, items['profile'])
+        self.assertNotIn('jobs', items['city#c1002'])
+        self.assertEqual({'player_id': 'foo', 'entity': 'jobs#c1002', 'jobs_expire': 0, 'destinations': [], 'consumed': {}},
+                         items['jobs#c1002'])
+        self.assertEqual('c1001', items['plane#xyz']['current_city_id'])
+        for item in items.values():
+            self.assertEqual('foo', item['player_id'])
+
+    def test_merge_entities(self):
+        """
+        Test merging entity items back into the cities and planes returned by the API
+        """
+        items = layout.split_player(self.player)
+        city_items = [item for item in items if item['entity'].startswith(layout.CITY_PREFIX)]
+        job_board_items = [item for item in items if item['entity'].startswith(layout.JOB_BOARD_PREFIX)]
+        plane_items = [item for item in items if item['entity'].startswith(layout.PLANE_PREFIX)]
+
+        # Stored jobs of the original layout are not kept, job boards start expired
+        self.assertEqual(self.without_jobs(self.player)['cities'], layout.merge_cities(city_items, job_board_items))
+        self.assertEqual(self.player['planes'], layout.merge_planes(plane_items))
+        self.assertEqual({}, layout.merge_cities(city_items[1:], [])['c1002']['jobs'])
+
+    def test_item_size(self):
+        """
+        Test approximating the size of items
+        """
+        self.assertEqual(len('player_id') + 3 + len('balance') + 2, layout.item_size({'player_id': 'foo',
+                                                                                     'balance': 500}))
+        self.assertEqual(4, layout.attribute_size(Decimal('12345')))
+        self.assertEqual(3 + 1 + 1 + 1, layout.attribute_size({'a': True}))
+        self.assertEqual(3 + 2 + 2, layout.attribute_size(['a', 'b']))
+        self.assertEqual(2, layout.attribute_size({'a', 'b'}))
+        self.assertEqual(3, layout.attribute_size(b'abc'))
+        self.assertEqual(1, layout.attribute_size(None))
+
+        whole_player = layout.item_size(self.player)
+        split_items = sum(layout.item_size(item) for item in layout.split_player(self.player))
+        self.assertLess(whole_player, split_items)
+
+        with self.assertRaises(TypeError):
+            layout.attribute_size(object())
+
+    @moto.mock_dynamodb2
+    def test_migrate_table(self):
+        """
+        Test migrating players from the single-item table
+        """
+        shared_test_utils.create_dynamodb_table()
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='players_legacy',
+            AttributeDefinitions=[{'AttributeName': 'player_id', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'player_id', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST')
+        dynamodb.Table('players_legacy').put_item(Item=self.player)
+        dynamodb.Table('players_legacy').put_item(Item={'player_id': 'bar', 'balance': 10, 'cities': {}, 'planes': {}})
+
+        self.assertEqual((2, 0), migrate_table('players_legacy', 'players', dynamodb))
+
+        # Read back from the migrated table, whichever repository the tests are configured with
+        with unittest.mock.patch.object(storage, '_repository', DynamoDBPlayerRepository('players', dynamodb)):
+            _, result = self.utils.get_player_attributes('foo', ['player_id', 'balance', 'cities', 'planes'])
+            self.assertEqual(self.without_jobs(self.player), result)
+            _, result = self.utils.get_player_attributes('bar', ['balance', 'cities', 'planes'])
+            self.assertEqual({'balance': 10, 'cities': {}, 'planes': {}}, result)
+
+        # Running again skips players which were already migrated
+        self.assertEqual((0, 2), migrate_table('players_legacy', 'players', dynamodb))
+
+    @moto.mock_dynamodb2
+    def test_migrate_table_resume(self):
+        """
+        Test a migration interrupted in the middle of a player migrates the player when it is run again
+        """
+        shared_test_utils.create_dynamodb_table()
+        dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+        dynamodb.create_table(
+            TableName='players_legacy',
+            AttributeDefinitions=[{'AttributeName': 'player_id', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'player_id', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST')
+        dynamodb.Table('players_legacy').put_item(Item=self.player)
+
+        # The job dies after the first item of the player was buffered
+        put_item = BatchWriter.put_item
+        calls = []
+
+        def interrupted(batch, Item):
+            calls.append(Item)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            put_item(batch, Item=Item)
+
+        with unittest.mock.patch.object(BatchWriter, 'put_item', interrupted), self.assertRaises(KeyboardInterrupt):
+            migrate_table('players_legacy', 'players', dynamodb)
+        self.assertEqual(1, len(dynamodb.Table('players').scan()['Items']))
+
+        self.assertEqual((1, 0), migrate_table('players_legacy', 'players', dynamodb))
+        with unittest.mock.patch.object(storage, '_repository', DynamoDBPlayerRepository('players', dynamodb)):
+            _, result = self.utils.get_player_attributes('foo', ['player_id', 'balance', 'cities', 'planes'])
+        self.assertEqual(self.without_jobs(self.player), result)
@@ -0,0 +1,143 @@
+import logging
+import os
+import unittest.mock
+
+import moto
+from boto3.dynamodb.conditions import Attr
+
+import storage
+from config import config
+from storage import layout
+from storage.repository import ConditionalCheckFailed, TransactionConflict, Update
+from tests import shared_test_utils
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Initialize test http client and set up the requestContext
+        :return:
+        """
+        # These are needed to avoid a credential error when testing
+        os.environ["AWS_ACCESS_KEY_ID"] = "test"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
+
+        from utils import utils, versions
+        from micro_airlines_api import app
+        self.utils = utils
+        self.versions = versions
+        self.http_client = app.test_client()
+        self.player_name = 'test_player_1'
+        self.http_client.environ_base['awsgi.event'] = {
+            'requestContext': {
+                'authorizer': {
+                    'claims': {
+                        'cognito:username': self.player_name
+                    }
+                }
+            }
+        }
+
+    @moto.mock_dynamodb2
+    def test_sync(self):
+        """
+        Test a sync only returns the cities, planes and jobs changed since the version of the last sync
+        """
+        shared_test_utils.create_table()
+        self.assertEqual(404, self.http_client.get('/v1/sync').status_code)
+        self.http_client.post('/v1/player')
+        for city_id in ['c1005', 'c1036']:
+            self.http_client.post('/v1/cities', json={'city': city_id})
+        self.http_client.post('/v1/planes', json={'plane': 'a1', 'city': 'c1005'})
+
+        result = self.http_client.get('/v1/sync').get_json()
+        self.assertEqual(4, result['version'])
+        self.assertEqual({'c1005', 'c1036'}, set(result['cities']))
+        self.assertEqual(1, len(result['planes']))
+        self.assertEqual({'jobs': {}, 'jobs_expire': 0}, result['jobs']['c1005'])
+
+        # Nothing changed, only the profile is read
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'query') as query:
+            self.assertEqual({'version': 4}, self.http_client.get('/v1/sync?since=4').get_json())
+        query.assert_not_called()
+
+        # Reading the job board of a city starts its window
+        jobs = self.http_client.get('/v1/cities/c1005/jobs').get_json()['jobs']
+        result = self.http_client.get('/v1/sync?since=4').get_json()
+        self.assertEqual({'version': 5, 'balance': result['balance'], 'cities': {}, 'planes': {},
+                          'jobs': {'c1005': {'jobs': jobs, 'jobs_expire': result['jobs']['c1005']['jobs_expire']}}},
+                         result)
+
+        plane_id = next(iter(self.http_client.get('/v1/planes').get_json()['planes']))
+        self.http_client.put(f'/v1/planes/{plane_id}/depart', json={'destination_city_id': 'c1036'})
+        result = self.http_client.get('/v1/sync?since=5').get_json()
+        self.assertEqual([plane_id], list(result['planes']))
+        self.assertEqual('in_flight', result['planes'][plane_id]['state'])
+        self.assertEqual({}, result['jobs'])
+
+        self.assertEqual(400, self.http_client.get('/v1/sync?since=foo').status_code)
+
+    @moto.mock_dynamodb2
+    def test_write_player_version_race(self):
+        """
+        Test a write which lost the race for the version is retried and other failed conditions are not
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id='foo', balance=100)
+        repository = storage.get_repository()
+        transact = repository.transact
+
+        def concurrent_transact(operations):
+            # A concurrent write bumps the version between the read of the version and the write
+            if concurrent_transact.first:
+                concurrent_transact.first = False
+                transact([Update(layout.profile_key('foo'), updates={layout.VERSION: 2})])
+            return transact(operations)
+
+        concurrent_transact.first = True
+        with unittest.mock.patch.object(repository, 'transact', side_effect=concurrent_transact) as mock:
+            self.assertEqual(3, self.versions.write_player('foo', [Update(layout.profile_key('foo'),
+                                                                          increments={'balance': 10})]))
+        self.assertEqual(2, mock.call_count)
+        self.assertEqual({'balance': 110, layout.VERSION: 3},
+                         repository.get(layout.profile_key('foo'), attributes=['balance', layout.VERSION]))
+
+        with unittest.mock.patch.object(repository, 'transact', wraps=transact) as mock, \
+                self.assertRaises(ConditionalCheckFailed):
+            self.versions.write_player('foo', [Update(layout.profile_key('foo'), increments={'balance': -1000},
+                                                      condition=Attr('balance').gte(1000))])
+        self.assertEqual(1, mock.call_count)
+        self.assertEqual(3, self.versions.get_version('foo'))
+
+    def test_retry(self):
+        """
+        Test conflicting actions are run again after a jittered backoff, up to the configured retries
+        """
+        attempts = []
+
+        def action(attempt):
+            attempts.append(attempt)
+            if attempt == 0:
+                raise ConditionalCheckFailed('conflict')
+            if attempt == 1:
+                raise TransactionConflict('conflict')
+            return True, attempt
+
+        with unittest.mock.patch('time.sleep') as sleep:
+            self.assertEqual((True, 2), self.versions.retry(action))
+            self.assertEqual([0, 1, 2], attempts)
+            self.assertEqual(2, sleep.call_count)
+            self.assertTrue(0 <= sleep.call_args_list[1][0][0] <= 2 * config.retry_base_delay)
+
+            with unittest.mock.patch.object(config, 'version_retries', 1), self.assertRaises(ConditionalCheckFailed):
+                self.versions.retry(lambda attempt: action(0))
+            with unittest.mock.patch.object(config, 'retry_base_delay', 10):
+                self.versions.backoff(5)
+            self.assertLessEqual(sleep.call_args[0][0], config.retry_max_delay)
+
+        self.assertIsNone(self.versions.unchanged({}))
+        self.assertEqual(Attr(layout.VERSION).eq(3), self.versions.unchanged({layout.VERSION: 3}))
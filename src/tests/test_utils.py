@@ -1,12 +1,14 @@
 import logging
 import os
-import unittest
+import unittest.mock
 
 from flask import request
 from flask import Flask
 import moto
 
 from definitions.cities import cities
+import storage
+from storage import layout
 from tests import shared_test_utils
 
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +31,19 @@ class TestUtils(unittest.TestCase):
         self.player_name = 'test_player_1'
         self.http_client = Flask(__name__)
 
+    def load_jobs(self, plane_id, city_id, player_cities, destination_city_id):
+        """
+        Start a job window at the city of a plane and load the plane with cargo jobs, those to a
+        destination first
+
+        :return:            List of the loaded job ids
+        """
+        jobs, _ = self.utils.update_city_with_new_jobs('foo', city_id, player_cities)
+        job_ids = sorted((job_id for job_id, job in jobs.items() if job['job_type'] == 'C'),
+                         key=lambda job_id: jobs[job_id]['destination_city_id'] != destination_city_id)[:4]
+        self.assertTrue(self.utils.load_plane('foo', plane_id, job_ids)[0])
+        return job_ids
+
     def test_get_username_cognito(self):
         """
         Test getting username from cognito
@@ -78,6 +93,71 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(5 < len(p_jobs) > 5)
         self.assertTrue(5 < len(c_jobs) > 5)
 
+    def test_generate_random_jobs_fields(self):
+        """
+        Test generated jobs have the same shape as the Job model and are priced for their destination
+        """
+        player_cities = {city_id: cities[city_id] for city_id in ['c1001', 'c1002', 'c1003', 'c1004']}
+
+        result = self.utils.generate_random_jobs(player_cities, 'c1001', count=300)
+
+        self.assertEqual(300, len(result))
+        for job_id, job in result.items():
+            self.assertEqual({'id', 'origin_city_id', 'destination_city_id', 'revenue', 'job_type'}, set(job))
+            self.assertEqual(job_id, job['id'])
+            self.assertEqual('c1001', job['origin_city_id'])
+            self.assertIn(job['destination_city_id'], ['c1002', 'c1003', 'c1004'])
+            self.assertIn(job['job_type'], ['P', 'C'])
+            self.assertIs(int, type(job['revenue']))
+            self.assertEqual(self.utils.calculate_job_revenue('c1001', job['destination_city_id']),
+                             job['revenue'])
+        self.assertEqual({'c1002', 'c1003', 'c1004'}, {job['destination_city_id'] for job in result.values()})
+
+    def test_generate_random_jobs_no_destinations(self):
+        """
+        Test generating random jobs when the player only owns the current city
+        """
+        self.assertEqual({}, self.utils.generate_random_jobs({'c1001': cities['c1001']}, 'c1001'))
+
+    def test_get_revenue_table(self):
+        """
+        Test the revenue table is priced per destination and memoized per (origin, player city set)
+        """
+        self.utils.get_revenue_table.cache_clear()
+
+        destination_city_ids, revenues = self.utils.get_revenue_table('c5052', frozenset(['c5052', 'c5046', 'c5012']))
+        self.assertEqual(('c5012', 'c5046'), destination_city_ids)
+        self.assertEqual((666, 236), revenues)
+
+        self.utils.generate_random_jobs({'c5046': {}, 'c5052': {}, 'c5012': {}}, 'c5052')
+        self.assertEqual(1, self.utils.get_revenue_table.cache_info().hits)
+        self.assertEqual(1, self.utils.get_revenue_table.cache_info().misses)
+
+        self.utils.generate_random_jobs({'c5046': {}, 'c5052': {}, 'c5012': {}, 'c2027': {}}, 'c5052')
+        self.assertEqual(2, self.utils.get_revenue_table.cache_info().misses)
+
+        self.assertEqual(((), ()), self.utils.get_revenue_table('c5052', frozenset(['c5052'])))
+
+    def test_calculate_job_revenues(self):
+        """
+        Test calculating job revenue to many cities at once
+        """
+        destination_city_ids = ['c5012', 'c5046', 'c2027', 'c5052']
+        result = self.utils.calculate_job_revenues('c5052', destination_city_ids)
+        self.assertEqual([666, 236, self.utils.calculate_job_revenue('c5052', 'c2027'), 50], result)
+
+    def test_generate_random_strings(self):
+        """
+        Test generating a batch of random strings
+        """
+        result = self.utils.generate_random_strings(50)
+        self.assertEqual(50, len(result))
+        self.assertEqual(50, len(set(result)))
+        for value in result:
+            self.assertEqual(20, len(value))
+            self.assertTrue(set(value) <= set('abcdefghijklmnopqrstuvwxyz'))
+        self.assertEqual([], self.utils.generate_random_strings(0))
+
     def test_generate_random_string(self):
         """
         Test generating a random string
@@ -109,6 +189,17 @@ class TestUtils(unittest.TestCase):
         self.assertFalse(created)
         self.assertEqual('Player "foo" already exists', message)
 
+    @moto.mock_dynamodb2
+    def test_create_player_reserved(self):
+        """
+        Test a player can not be created in a partition of the arrivals index
+        """
+        shared_test_utils.create_table()
+        created, message = self.utils.create_player(player_id='arrivals#cursor', balance=10000)
+        self.assertFalse(created)
+        self.assertEqual('Player ID "arrivals#cursor" is reserved', message)
+        self.assertIsNone(storage.get_repository().get(layout.profile_key('arrivals#cursor')))
+
     @moto.mock_dynamodb2
     def test_get_player_attributes(self):
         """
@@ -260,72 +351,136 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(87, result)
 
     @moto.mock_dynamodb2
-    def test_add_jobs_to_plane(self):
+    def test_load_plane(self):
         """
-        Test adding a jobs to a plane
+        Test jobs are moved from the job board to the plane in one write
         """
         shared_test_utils.create_table()
         self.utils.create_player(player_id='foo', balance=100000)
         self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1001')
         self.utils.add_city_to_player(player_id='foo', city_id='c1001')
         self.utils.add_city_to_player(player_id='foo', city_id='c1002')
-        self.utils.add_city_to_player(player_id='foo', city_id='c1003')
-
-        # Get the new cities and plane added to the player
-        _, result = self.utils.get_player_attributes(player_id='foo',
-                                                     attributes_to_get=['cities', 'planes'])
 
-        plane_1_id, _ = result.get('planes').popitem()
-        player_cities = result.get('cities')
+        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities', 'planes'])
+        plane_id = next(iter(result['planes']))
+        jobs, _ = self.utils.update_city_with_new_jobs('foo', 'c1001', result['cities'])
+        job_ids = [job_id for job_id, job in jobs.items() if job['job_type'] == 'C'][:2]
 
-        # Generate some random jobs
-        jobs = self.utils.generate_random_jobs(player_cities=player_cities, current_city_id='c1001')
-
-        # Add the jobs to the plane
-        success, _ = self.utils.add_jobs_to_plane(
-            player_id='foo', plane_id=plane_1_id, list_of_jobs=jobs)
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'transact', wraps=repository.transact) as transact:
+            success, result = self.utils.load_plane('foo', plane_id, job_ids + job_ids[:1])
         self.assertTrue(success)
+        self.assertEqual(1, transact.call_count)
+        self.assertEqual(set(job_ids), set(result['planes'][plane_id]['loaded_jobs']))
 
-        # Check the jobs added to the plane
-        _, result = self.utils.get_player_attributes(player_id='foo',
-                                                     attributes_to_get=['planes'])
-        self.assertEqual(30, len(result['planes'][plane_1_id]['loaded_jobs']))
+        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities', 'planes'])
+        self.assertEqual(set(job_ids), set(result['planes'][plane_id]['loaded_jobs']))
+        self.assertEqual(len(jobs) - 2, len(result['cities']['c1001']['jobs']))
+
+        self.assertEqual((False, 'Invalid plane_id'), self.utils.load_plane('foo', 'missing', job_ids))
+        self.assertEqual((False, 'Player does not exist'), self.utils.load_plane('bar', plane_id, job_ids))
 
     @moto.mock_dynamodb2
-    def test_remove_jobs_from_city(self):
+    def test_load_plane_concurrent(self):
         """
-        Test removing jobs from a city
+        Test a load validated against a stale read fails instead of loading jobs twice
         """
         shared_test_utils.create_table()
         self.utils.create_player(player_id='foo', balance=100000)
         self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1001')
+        self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1001')
+        self.utils.add_city_to_player(player_id='foo', city_id='c1001')
+        self.utils.add_city_to_player(player_id='foo', city_id='c1002')
+
+        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities', 'planes'])
+        plane_1_id, plane_2_id = result['planes']
+        jobs, _ = self.utils.update_city_with_new_jobs('foo', 'c1001', result['cities'])
+        job_ids = [job_id for job_id, job in jobs.items() if job['job_type'] == 'C'][:2]
+
+        # Both requests read the job board before either of them writes
+        repository = storage.get_repository()
+        stale_job_board = repository.get(layout.job_board_key('foo', 'c1001'))
+        self.assertTrue(self.utils.load_plane('foo', plane_1_id, job_ids)[0])
+
+        get = repository.get
+        reads = iter([repository.get(layout.plane_key('foo', plane_2_id)), stale_job_board])
+        with unittest.mock.patch.object(repository, 'get',
+                                        side_effect=lambda *args, **kwargs: next(reads, None) or get(*args, **kwargs)):
+            self.assertEqual((False, 'Failed to load jobs onto plane'),
+                             self.utils.load_plane('foo', plane_2_id, job_ids))
+
+        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['planes'])
+        self.assertEqual({}, result['planes'][plane_2_id]['loaded_jobs'])
+
+    @moto.mock_dynamodb2
+    def test_job_board_derived(self):
+        """
+        Test job boards store only their window, destinations and consumed job ids, and the jobs are
+        derived again the same way on every read
+        """
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id='foo', balance=100000)
         self.utils.add_city_to_player(player_id='foo', city_id='c1001')
         self.utils.add_city_to_player(player_id='foo', city_id='c1002')
         self.utils.add_city_to_player(player_id='foo', city_id='c1003')
+        self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1001')
 
-        # Get the new cities added to the player
-        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities'])
-        player_cities = result.get('cities')
-
-        jobs, _ = self.utils.update_city_with_new_jobs(player_id='foo', city_id='c1001',
-                                                       player_cities=player_cities)
-        jobs_ids_to_remove = [
-            jobs.popitem()[0],
-            jobs.popitem()[0],
-            jobs.popitem()[0]
-        ]
-        self.utils.remove_jobs_from_city(player_id='foo', city_id='c1001',
-                                         list_of_jobs=jobs_ids_to_remove)
+        _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities', 'planes'])
+        jobs, jobs_expire = self.utils.update_city_with_new_jobs('foo', 'c1001', result['cities'])
+        self.assertEqual(30, len(jobs))
+        loaded = [job_id for job_id, job in jobs.items() if job['job_type'] == 'C'][:3]
+        self.assertTrue(self.utils.load_plane('foo', next(iter(result['planes'])), loaded)[0])
+
+        job_board = storage.get_repository().get(layout.job_board_key('foo', 'c1001'))
+        self.assertEqual({'jobs_expire', 'destinations', 'consumed', 'version'}, set(layout.strip_key(job_board)))
+        self.assertEqual(['c1002', 'c1003'], job_board['destinations'])
+        self.assertEqual(set(loaded), set(job_board['consumed']))
 
         _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['cities'])
-        city_jobs = result.get('cities').get('c1001').get('jobs')
-        print(len(city_jobs))
+        self.assertEqual({job_id: job for job_id, job in jobs.items() if job_id not in loaded},
+                         result['cities']['c1001']['jobs'])
+        self.assertEqual(jobs_expire, result['cities']['c1001']['jobs_expire'])
+
+        # Another window or another player derives other jobs
+        self.assertFalse(set(jobs) & set(self.utils.materialize_job_board(
+            'foo', 'c1001', {**job_board, 'jobs_expire': jobs_expire + 240})['jobs']))
+        self.assertFalse(set(jobs) & set(self.utils.materialize_job_board('bar', 'c1001', job_board)['jobs']))
+
+        # The stored board is an order of magnitude smaller than a board storing its jobs
+        self.assertLess(layout.item_size(job_board) * 10, layout.item_size({**job_board, 'jobs': jobs}))
+
+    def test_plan_suggested_load(self):
+        """
+        Test the suggested load only picks compatible jobs and groups them by the best destination in range
+        """
+        def job(destination_city_id, revenue, job_type='C'):
+            return {'destination_city_id': destination_city_id, 'revenue': revenue, 'job_type': job_type}
+
+        jobs = {'j1': job('c1036', 100), 'j2': job('c1036', 300), 'j3': job('c1003', 250),
+                'j4': job('c1003', 200), 'j5': job('c1036', 900, 'P'), 'j6': job('c1001', 1000)}
+        plane = {'current_city_id': 'c1005', 'capacity': 3, 'capacity_type': 'C', 'flight_range': 900,
+                 'loaded_jobs': {'j0': job('c1036', 100)}}
+
+        self.assertEqual({'loaded_jobs': {'j6': jobs['j6'], 'j2': jobs['j2']}, 'revenue': 1300,
+                          'destination_city_id': None}, self.utils.plan_suggested_load(plane, jobs))
+
+        # c1001 is out of range and c1036 collects the already loaded job too
+        self.assertEqual({'loaded_jobs': {'j2': jobs['j2'], 'j1': jobs['j1']}, 'revenue': 400,
+                          'destination_city_id': 'c1036'},
+                         self.utils.plan_suggested_load(plane, jobs, by_destination=True))
+        self.assertEqual({'loaded_jobs': {'j3': jobs['j3'], 'j4': jobs['j4']}, 'revenue': 450,
+                          'destination_city_id': 'c1003'},
+                         self.utils.plan_suggested_load(plane, jobs, destination_city_id='c1003'))
 
     @moto.mock_dynamodb2
     def test_handle_plane_landed(self):
         """
         Test unloading a plane once it has landed
         """
+        from utils import clock
+        game_clock = clock.FakeClock(1600000000)
+        clock.set_clock(game_clock)
+        self.addCleanup(clock.set_clock, None)
         shared_test_utils.create_table()
         self.utils.create_player(player_id='foo', balance=100000)
         self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1005')
@@ -338,16 +493,7 @@ class TestUtils(unittest.TestCase):
                                                      attributes_to_get=['cities', 'planes'])
 
         plane_1_id, plane_1_values = result.get('planes').popitem()
-        player_cities = result.get('cities')
-
-        # Generate some random jobs
-        jobs = self.utils.generate_random_jobs(player_cities=player_cities,
-                                               current_city_id='c1005', count=8)
-
-        # Add the jobs to the plane
-        success, _ = self.utils.add_jobs_to_plane(
-            player_id='foo', plane_id=plane_1_id, list_of_jobs=jobs)
-        self.assertTrue(success)
+        job_ids = self.load_jobs(plane_1_id, 'c1005', result.get('cities'), 'c1036')
 
         self.utils.depart_plane(player_id='foo', plane_id=plane_1_id, plane=plane_1_values,
                                 destination_city_id='c1036', eta=1)
@@ -356,19 +502,28 @@ class TestUtils(unittest.TestCase):
         _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['planes'])
         _, plane_1_values = result.get('planes').popitem()
 
+        # The plane can not be unloaded before it arrives
+        self.assertEqual((False, 'Plane has not yet landed'),
+                         self.utils.handle_plane_landed(player_id='foo', plane_id=plane_1_id, plane=plane_1_values))
+        game_clock.advance(1)
+
         # Check the result of handling the plane landing
         success, result = self.utils.handle_plane_landed(player_id='foo', plane_id=plane_1_id,
                                                          plane=plane_1_values)
         self.assertTrue(success)
+        self.assertEqual([], storage.get_repository().query(layout.arrivals_partition(1600000001 // 300),
+                                                            layout.ARRIVAL_PREFIX))
         self.assertLess(24000, int(result.get('balance')))
 
         # Check the updated plane for the correct values after landing the plane
         _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['planes'])
         _, plane_1_values = result.get('planes').popitem()
-        self.assertEqual(0, plane_1_values['eta'])
+        self.assertEqual('grounded', plane_1_values['state'])
+        self.assertNotIn('arrives_at', plane_1_values)
+        self.assertNotIn('departed_at', plane_1_values)
         self.assertEqual('none', plane_1_values['destination_city_id'])
         self.assertEqual('c1036', plane_1_values['current_city_id'])
-        self.assertGreater(8, len(plane_1_values['loaded_jobs']))
+        self.assertGreater(len(job_ids), len(plane_1_values['loaded_jobs']))
 
     @moto.mock_dynamodb2
     def test_depart_plane(self):
@@ -387,16 +542,7 @@ class TestUtils(unittest.TestCase):
                                                      attributes_to_get=['cities', 'planes'])
 
         plane_1_id, plane_1_values = result.get('planes').popitem()
-        player_cities = result.get('cities')
-
-        # Generate some random jobs
-        jobs = self.utils.generate_random_jobs(player_cities=player_cities,
-                                               current_city_id='c1005', count=8)
-
-        # Add the jobs to the plane
-        success, _ = self.utils.add_jobs_to_plane(
-            player_id='foo', plane_id=plane_1_id, list_of_jobs=jobs)
-        self.assertTrue(success)
+        job_ids = self.load_jobs(plane_1_id, 'c1005', result.get('cities'), 'c1036')
 
         self.utils.depart_plane(player_id='foo', plane_id=plane_1_id, plane=plane_1_values,
                                 destination_city_id='c1036')
@@ -404,9 +550,10 @@ class TestUtils(unittest.TestCase):
         # Get the updated plane
         _, result = self.utils.get_player_attributes(player_id='foo', attributes_to_get=['planes'])
         _, plane_1_values = result.get('planes').popitem()
-        self.assertEqual(4145, plane_1_values.get('eta'))
+        self.assertEqual('in_flight', plane_1_values.get('state'))
+        self.assertEqual(4145, plane_1_values.get('arrives_at') - plane_1_values.get('departed_at'))
         self.assertEqual('c1036', plane_1_values.get('destination_city_id'))
-        self.assertEqual(8, len(plane_1_values.get('loaded_jobs')))
+        self.assertEqual(set(job_ids), set(plane_1_values.get('loaded_jobs')))
 
     @moto.mock_dynamodb2
     def test_depart_plane_too_far(self):
@@ -431,3 +578,61 @@ class TestUtils(unittest.TestCase):
 
         self.assertFalse(success)
         self.assertEqual('Destination city is beyond the range of the plane', result)
+
+    @moto.mock_dynamodb2
+    def test_versioned_plane_writes(self):
+        """
+        Test departures and landings planned from a plane changed since it was read are planned again
+        from a new read, so concurrent unloads credit the revenue once
+        """
+        from utils import clock
+        game_clock = clock.FakeClock(1600000000)
+        clock.set_clock(game_clock)
+        self.addCleanup(clock.set_clock, None)
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id='foo', balance=100000)
+        self.utils.add_plane_to_player(player_id='foo', plane_id='a1', current_city_id='c1005')
+        for city_id in ['c1005', 'c1036']:
+            self.utils.add_city_to_player(player_id='foo', city_id=city_id)
+        plane_id = next(iter(self.utils.get_planes('foo')[1]['planes']))
+
+        # The plane is loaded between the read and the departure
+        _, stale_plane = self.utils.get_plane('foo', plane_id, attributes=self.utils.DEPARTURE_ATTRIBUTES)
+        job_ids = self.load_jobs(plane_id, 'c1005', ['c1005', 'c1036'], 'c1036')
+        _, jobs = self.utils.get_plane('foo', plane_id, attributes=['loaded_jobs'])
+        repository = storage.get_repository()
+        with unittest.mock.patch.object(repository, 'transact', wraps=repository.transact) as transact, \
+                unittest.mock.patch('time.sleep'):
+            success, _ = self.utils.depart_plane('foo', plane_id, stale_plane, 'c1036', eta=1)
+        self.assertTrue(success)
+        self.assertEqual(2, transact.call_count)
+
+        game_clock.advance(1)
+        _, stale_plane = self.utils.get_plane('foo', plane_id)
+        balance = self.utils.get_balance('foo')
+        self.assertTrue(self.utils.handle_plane_landed('foo', plane_id, stale_plane)[0])
+        with unittest.mock.patch('time.sleep'):
+            self.assertEqual((False, 'Plane has not moved'), self.utils.handle_plane_landed('foo', plane_id, stale_plane))
+        self.assertEqual(balance + sum(jobs['loaded_jobs'][job_id]['revenue'] for job_id in job_ids),
+                         self.utils.get_balance('foo'))
+
+    @moto.mock_dynamodb2
+    def test_update_city_with_new_jobs_concurrent(self):
+        """
+        Test a job board window is only started once by concurrent requests
+        """
+        from utils import clock
+        game_clock = clock.FakeClock(1600000000)
+        clock.set_clock(game_clock)
+        self.addCleanup(clock.set_clock, None)
+        shared_test_utils.create_table()
+        self.utils.create_player(player_id='foo', balance=100000)
+        for city_id in ['c1001', 'c1002', 'c1003']:
+            self.utils.add_city_to_player(player_id='foo', city_id=city_id)
+
+        jobs, jobs_expire = self.utils.update_city_with_new_jobs('foo', 'c1001', ['c1001', 'c1002', 'c1003'])
+        game_clock.advance(1)
+        self.assertEqual((jobs, jobs_expire), self.utils.update_city_with_new_jobs('foo', 'c1001', ['c1001', 'c1002']))
+
+        game_clock.advance(240)
+        self.assertNotEqual(jobs_expire, self.utils.update_city_with_new_jobs('foo', 'c1001', ['c1001', 'c1002'])[1])
@@ -0,0 +1,129 @@
+"""
+Automatic landings
+
+Departing planes are added to the arrivals index (see storage.layout) with their arrival time. The
+arrivals worker runs on a schedule, drains every arrival which is due and lands the planes without
+the player calling /unload: the jobs completed at the destination are unloaded and their revenue is
+added to the balance. Only the due planes of a player are read, with one BatchGetItem projected to
+the attributes a landing is planned from, and their landings and revenue are written in as few
+transactions as possible.
+"""
+import logging
+
+from boto3.dynamodb.conditions import Attr
+
+import storage
+from config import config
+from storage import layout
+from storage.repository import MAX_TRANSACTION_ITEMS, ConditionalCheckFailed, RepositoryError
+from utils import clock, utils, versions
+from utils.fleet import key_of, merge
+
+logger = logging.getLogger()
+
+
+def due_arrivals(now):
+    """
+    Get the arrivals which are due, from the cursor bucket up to the bucket of now
+
+    :param now:                 Epoch seconds
+    :return:                    Cursor bucket (None before the first run), List of arrival items in arrival order
+    """
+    repository = storage.get_repository()
+    cursor = repository.get(layout.arrivals_cursor_key(), consistent=True)
+    cursor_bucket = int(cursor['bucket']) if cursor else None
+    if cursor_bucket is not None:
+        start = cursor_bucket
+    else:
+        start = layout.arrival_bucket(now - config.arrival_lookback_seconds, config.arrival_bucket_seconds)
+
+    arrivals = []
+    for bucket in range(start, layout.arrival_bucket(now, config.arrival_bucket_seconds) + 1):
+        arrivals.extend(item for item in repository.query(layout.arrivals_partition(bucket), layout.ARRIVAL_PREFIX)
+                        if item['arrives_at'] <= now)
+    return cursor_bucket, arrivals
+
+
+def land_arrivals(player_id, arrivals):
+    """
+    Land the due planes of one player
+
+    :param player_id:           Player ID owning the planes
+    :param arrivals:            List of arrival items of the player
+    :return:                    Dict of counts: landed, failed, stale
+    """
+    repository = storage.get_repository()
+    planes = repository.batch_get([layout.plane_key(player_id, arrival['plane_id']) for arrival in arrivals],
+                                  attributes=utils.LANDING_ATTRIBUTES, consistent=True)
+    counts = {'landed': 0, 'failed': 0, 'stale': 0}
+    landings = []
+    for arrival, plane in zip(arrivals, planes):
+        plane_id = arrival['plane_id']
+        plane = layout.strip_key(plane or {})
+        if plane.get('arrives_at') == arrival['arrives_at']:
+            landed, landing = utils.plan_landing(plane, allow_empty=True)
+            if landed:
+                landings.append(utils.landing_operations(player_id, plane_id, plane, landing))
+                continue
+            logging.info('Cannot land plane %s of player %s: %s', plane_id, player_id, landing)
+
+        # A plane which was already unloaded by the player leaves a stale arrival
+        repository.delete(layout.arrival_key(player_id, plane_id, arrival['arrives_at'],
+                                             config.arrival_bucket_seconds))
+        counts['stale'] += 1
+
+    # Every landing writes the plane and its arrival, the revenue of the landings of a transaction is
+    # added to the profile with one update
+    per_transaction = (MAX_TRANSACTION_ITEMS - 1) // 2
+    for start in range(0, len(landings), per_transaction):
+        operations = {}
+        for landing in landings[start:start + per_transaction]:
+            merge(operations, {key_of(operation.key): operation for operation in landing})
+        try:
+            versions.write_player(player_id, list(operations.values()))
+            counts['landed'] += len(landings[start:start + per_transaction])
+        except RepositoryError as e:
+            logger.info(e)
+            counts['failed'] += len(landings[start:start + per_transaction])
+
+    logging.info('Landed planes of player %s: %s', player_id, counts)
+    return counts
+
+
+def process_arrivals():
+    """
+    Land every plane which is due and advance the cursor past the drained buckets. Arrivals which
+    failed to land (eg: conflicting with a concurrent request of the player) stay in the index and
+    are retried by the next run.
+
+    :return:                    Dict of counts: landed, failed, stale
+    """
+    now = clock.now()
+    cursor_bucket, arrivals = due_arrivals(now)
+
+    players = {}
+    for arrival in arrivals:
+        players.setdefault(arrival['owner_id'], []).append(arrival)
+
+    counts = {'landed': 0, 'failed': 0, 'stale': 0}
+    failed_buckets = []
+    for player_id, player_arrivals in players.items():
+        player_counts = land_arrivals(player_id, player_arrivals)
+        for name, count in player_counts.items():
+            counts[name] += count
+        if player_counts['failed']:
+            failed_buckets.append(layout.arrival_bucket(player_arrivals[0]['arrives_at'],
+                                                        config.arrival_bucket_seconds))
+
+    bucket = min([layout.arrival_bucket(now, config.arrival_bucket_seconds), *failed_buckets])
+    if cursor_bucket is None:
+        condition = Attr(layout.SORT_KEY).not_exists()
+    else:
+        condition = Attr('bucket').eq(cursor_bucket)
+    try:
+        storage.get_repository().put({**layout.arrivals_cursor_key(), 'bucket': bucket}, condition=condition)
+    except ConditionalCheckFailed:
+        logging.info('Arrivals cursor was moved by a concurrent run')
+
+    logging.info('Processed %s arrivals up to bucket %s: %s', len(arrivals), bucket, counts)
+    return counts
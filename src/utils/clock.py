@@ -0,0 +1,61 @@
+"""
+Game clock
+
+Game time (job expiry, flight arrivals) is read through clock.now() so tests and local runs can
+replace the system clock with a FakeClock and move time forward explicitly.
+"""
+import time
+
+
+class SystemClock:
+    """
+    Wall clock time
+    """
+
+    def now(self):
+        return time.time()
+
+
+class FakeClock:
+    """
+    Clock which only moves when advanced
+    """
+
+    def __init__(self, start=0):
+        """
+        :param start:       (optional) Initial time in epoch seconds
+        """
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance(self, seconds):
+        """
+        Move the clock forward
+
+        :param seconds:     Number of seconds to advance
+        """
+        self.time += seconds
+
+
+_clock = SystemClock()
+
+
+def now():
+    """
+    Get the current game time
+
+    :return:            Epoch seconds
+    """
+    return _clock.now()
+
+
+def set_clock(clock):
+    """
+    Replace the game clock, eg: with a FakeClock in tests
+
+    :param clock:       Clock, or None to restore the system clock
+    """
+    global _clock
+    _clock = clock or SystemClock()
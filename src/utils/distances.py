@@ -0,0 +1,132 @@
+import numpy as np
+from haversine import Unit
+from haversine.haversine import get_avg_earth_radius
+
+from definitions.catalog import cities, coordinates
+
+
+class DistanceMatrix:
+    """
+    Dense all-pairs distance matrix (whole miles) over the city catalog. The matrix is built once,
+    on first use, with a vectorized haversine so individual lookups are O(1) array indexing.
+
+    The matrix doubles as the spatial index of the catalog: every row sorted by distance gives the
+    neighbours of a city nearest first, so k-nearest is a slice and within-radius is a binary search.
+    """
+
+    def __init__(self, city_catalog):
+        self.city_catalog = city_catalog
+        self.city_ids = list(city_catalog.keys())
+        self.index = {city_id: i for i, city_id in enumerate(self.city_ids)}
+        self._matrix = None
+        self._neighbours = None
+
+    @property
+    def matrix(self):
+        """
+        Build (once) and return the matrix of distances in whole miles
+        """
+        if self._matrix is None:
+            self._matrix = self._build()
+        return self._matrix
+
+    @property
+    def neighbours(self):
+        """
+        Build (once) and return the neighbour index: for every city, the catalog indexes of all
+        cities ordered by distance and the matching sorted distances
+        """
+        if self._neighbours is None:
+            # A stable sort keeps the order of cities at the same distance deterministic
+            order = np.argsort(self.matrix, axis=1, kind='stable')
+            self._neighbours = order, np.take_along_axis(self.matrix, order, axis=1)
+        return self._neighbours
+
+    def _build(self):
+        latitudes, longitudes = coordinates(self.city_catalog)
+        latitudes = np.radians(np.array(latitudes))
+        longitudes = np.radians(np.array(longitudes))
+
+        # Same formula and operation order as haversine() so truncating to whole miles
+        # gives exactly the same results as the per-call implementation
+        lat = latitudes[np.newaxis, :] - latitudes[:, np.newaxis]
+        lng = longitudes[np.newaxis, :] - longitudes[:, np.newaxis]
+        d = (np.sin(lat * 0.5) ** 2
+             + np.cos(latitudes)[:, np.newaxis] * np.cos(latitudes)[np.newaxis, :] * np.sin(lng * 0.5) ** 2)
+        miles = 2 * get_avg_earth_radius(Unit.MILES) * np.arcsin(np.sqrt(d))
+        return miles.astype(np.int64)
+
+    def distance(self, city_id_1, city_id_2):
+        """
+        Get the distance between two cities
+
+        :param city_id_1:       First City ID
+        :param city_id_2:       Second City ID
+        :return:                Distance in whole miles or None if either city does not exist
+        """
+        i = self.index.get(city_id_1)
+        j = self.index.get(city_id_2)
+        if i is None or j is None:
+            return None
+        return self.matrix.item(i, j)
+
+    def row(self, city_id):
+        """
+        Get the distances from one city to every city in the catalog, ordered as self.city_ids
+
+        :param city_id:         City ID
+        :return:                Numpy array of distances in whole miles
+        """
+        return self.matrix[self.index[city_id]]
+
+    def distances_from(self, city_id, destination_city_ids):
+        """
+        Get the distances from one city to a list of cities
+
+        :param city_id:                 Origin City ID
+        :param destination_city_ids:    List of destination City IDs
+        :return:                        Numpy array of distances in whole miles, ordered as destination_city_ids
+        """
+        return self.row(city_id)[[self.index[destination_city_id] for destination_city_id in destination_city_ids]]
+
+    def within(self, city_id, radius, candidates=None):
+        """
+        Get the cities within a distance of a city, nearest first
+
+        :param city_id:                 Origin City ID
+        :param radius:                  Distance in miles, inclusive
+        :param candidates:              (optional) Set of City IDs to choose from, defaults to the whole catalog
+        :return:                        List of (City ID, distance) tuples, not including the origin city
+        """
+        order, distances = self.neighbours
+        i = self.index[city_id]
+        end = int(np.searchsorted(distances[i], radius, side='right'))
+        return self._neighbour_list(i, order[i, :end], distances[i, :end], candidates)
+
+    def nearest(self, city_id, count, candidates=None):
+        """
+        Get the nearest cities to a city
+
+        :param city_id:                 Origin City ID
+        :param count:                   Number of cities to return, None for every city
+        :param candidates:              (optional) Set of City IDs to choose from, defaults to the whole catalog
+        :return:                        List of (City ID, distance) tuples, nearest first, not including the
+                                        origin city
+        """
+        order, distances = self.neighbours
+        i = self.index[city_id]
+        if candidates is None:
+            # One more row than the count, the origin city itself is nearest
+            end = None if count is None else count + 1
+            return self._neighbour_list(i, order[i, :end], distances[i, :end])[:count]
+        return self._neighbour_list(i, order[i], distances[i], candidates)[:count]
+
+    def _neighbour_list(self, i, indexes, distances, candidates=None):
+        neighbours = [(self.city_ids[j], distance)
+                      for j, distance in zip(indexes.tolist(), distances.tolist()) if j != i]
+        if candidates is not None:
+            neighbours = [neighbour for neighbour in neighbours if neighbour[0] in candidates]
+        return neighbours
+
+
+distance_matrix = DistanceMatrix(cities)
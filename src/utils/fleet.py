@@ -0,0 +1,261 @@
+"""
+Bulk fleet actions
+
+A list of load / depart / unload actions is validated, in order, against one read of the
+player's planes and job boards. Every action sees the changes of the actions before it, so a plane
+can be loaded and departed in the same request and two planes can never load the same job.
+
+The accepted actions are then written as a unit of work: the changes are grouped per plane (the
+plane item, the job boards it loaded from and the revenue it earned) and the groups are packed
+into as few transactions as possible. Every plane write is conditional on the state that was
+validated, so a group which conflicts with a concurrent request fails as a whole and its actions
+are reported as failed.
+"""
+import copy
+import functools
+import logging
+import operator
+
+from boto3.dynamodb.conditions import Attr
+
+import storage
+from storage import layout
+from storage.repository import MAX_TRANSACTION_ITEMS, RepositoryError, Update
+from utils import flights, utils, versions
+
+logger = logging.getLogger()
+
+ACTIONS = ('load', 'depart', 'unload')
+
+
+class PlaneChanges:
+    """
+    Changes accepted for one plane during a fleet request
+    """
+
+    def __init__(self, plane_id, plane):
+        self.plane_id = plane_id
+        self.original = plane
+        self.plane = copy.deepcopy(plane)
+        self.job_boards = {}
+        self.revenue = 0
+        self.results = []
+
+
+class FleetRequest:
+    """
+    Validate fleet actions against a working copy of the player and write the accepted changes
+    """
+
+    def __init__(self, player_id):
+        self.player_id = player_id
+        repository = storage.get_repository()
+        self.planes = layout.merge_planes(repository.query(player_id, layout.PLANE_PREFIX))
+        self.job_boards = {layout.entity_id(item): utils.materialize_job_board(player_id, layout.entity_id(item), item)
+                           for item in repository.query(player_id, layout.JOB_BOARD_PREFIX)}
+        self.changes = {}
+
+    def apply(self, action):
+        """
+        Validate one action and apply it to the working copy
+
+        :param action:          Dict of {'plane_id', 'action', and 'loaded_jobs' or 'destination_city_id'}
+        :return:                Result dict of the action
+        """
+        plane_id = action.get('plane_id')
+        result = {'plane_id': plane_id, 'action': action.get('action')}
+
+        if action.get('action') not in ACTIONS:
+            return {**result, 'success': False, 'message': f'action must be one of: {", ".join(ACTIONS)}'}
+        if plane_id not in self.planes:
+            return {**result, 'success': False, 'message': 'Invalid plane_id'}
+
+        changes = self.changes.get(plane_id) or PlaneChanges(plane_id, self.planes[plane_id])
+        valid, message = getattr(self, action['action'])(changes, action)
+        result.update({'success': True, 'result': message} if valid else {'success': False, 'message': message})
+        if valid:
+            self.changes[plane_id] = changes
+            changes.results.append(result)
+        return result
+
+    def load(self, changes, action):
+        plane = changes.plane
+        city_id = plane.get('current_city_id')
+        valid, jobs = utils.plan_load(plane, self.job_boards.get(city_id), action.get('loaded_jobs'))
+        if not valid:
+            return False, jobs
+
+        plane['loaded_jobs'].update(jobs)
+        for job_id in jobs:
+            del self.job_boards[city_id]['jobs'][job_id]
+        changes.job_boards.setdefault(city_id, []).extend(jobs)
+        return True, {'loaded_jobs': list(jobs)}
+
+    def depart(self, changes, action):
+        plane = changes.plane
+        grounded, message = flights.check_grounded(plane)
+        if not grounded:
+            return False, message
+        if not action.get('destination_city_id'):
+            return False, 'destination_city_id is a required field'
+
+        valid, departure = utils.plan_departure(plane, action['destination_city_id'])
+        if valid:
+            plane.update(departure)
+            plane.pop('eta', None)
+        return valid, departure
+
+    def unload(self, changes, action):
+        return self.land(changes)
+
+    def land(self, changes, allow_empty=False):
+        """
+        Land a plane at its destination and unload the jobs completed there
+
+        :param changes:         PlaneChanges of the plane
+        :param allow_empty:     (optional) Land the plane even if it completes no jobs
+        :return:                True/False if valid or not, Message or result data
+        """
+        valid, landing = utils.plan_landing(changes.plane, allow_empty)
+        if not valid:
+            return False, landing
+
+        jobs_to_remove, total_revenue, landed_plane = landing
+        for job_id in jobs_to_remove:
+            del changes.plane['loaded_jobs'][job_id]
+        changes.plane.update(landed_plane)
+        for name in flights.FLIGHT_ATTRIBUTES:
+            changes.plane.pop(name, None)
+        changes.revenue += total_revenue
+        return True, {'revenue': total_revenue, **landed_plane}
+
+    def operations(self, changes):
+        """
+        Build the writes of one plane: the plane update, the job board updates and the revenue
+
+        :param changes:         PlaneChanges
+        :return:                Dict of item key (player_id, entity) to operation
+        """
+        original, plane = changes.original, changes.plane
+        original_jobs, loaded_jobs = original.get('loaded_jobs', {}), plane.get('loaded_jobs', {})
+        added = {job_id: job for job_id, job in loaded_jobs.items() if job_id not in original_jobs}
+        removed = [job_id for job_id in original_jobs if job_id not in loaded_jobs]
+
+        plane_condition = functools.reduce(operator.and_, [
+            Attr(layout.SORT_KEY).exists(),
+            *[Attr(name).eq(original[name]) if name in original else Attr(name).not_exists()
+              for name in ('state', *flights.FLIGHT_ATTRIBUTES)],
+            Attr('current_city_id').eq(original.get('current_city_id')),
+            *[Attr(f'loaded_jobs.{job_id}').not_exists() for job_id in added],
+            *[Attr(f'loaded_jobs.{job_id}').exists() for job_id in removed]
+        ])
+        plane_key = layout.plane_key(self.player_id, changes.plane_id)
+        operations = {key_of(plane_key): Update(
+            plane_key,
+            updates={**{name: value for name, value in plane.items()
+                        if name != 'loaded_jobs' and original.get(name) != value},
+                     **{f'loaded_jobs.{job_id}': job for job_id, job in added.items()}},
+            removes=[*[name for name in original if name not in plane],
+                     *[f'loaded_jobs.{job_id}' for job_id in removed]],
+            condition=plane_condition)}
+
+        # Keep the arrivals index in step with the arrival time of the plane
+        if original.get('arrives_at') != plane.get('arrives_at'):
+            if 'arrives_at' in original:
+                cancel = utils.cancel_arrival(self.player_id, changes.plane_id, original['arrives_at'])
+                operations[key_of(cancel.key)] = cancel
+            if 'arrives_at' in plane:
+                schedule = utils.schedule_arrival(self.player_id, changes.plane_id, plane['arrives_at'])
+                operations[key_of(schedule.item)] = schedule
+
+        for city_id, job_ids in changes.job_boards.items():
+            job_board_key = layout.job_board_key(self.player_id, city_id)
+            operations[key_of(job_board_key)] = Update(
+                job_board_key,
+                updates={f'consumed.{job_id}': True for job_id in job_ids},
+                condition=utils.consume_jobs_condition(self.job_boards[city_id], job_ids))
+
+        if changes.revenue:
+            profile_key = layout.profile_key(self.player_id)
+            operations[key_of(profile_key)] = Update(profile_key,
+                                                     increments={'balance': changes.revenue},
+                                                     condition=Attr(layout.SORT_KEY).exists())
+        return operations
+
+    def commit(self):
+        """
+        Write the accepted changes with as few transactions as possible
+
+        :return:                Number of transactions written
+        """
+        # Every transaction also bumps the version on the profile
+        profile = {key_of(layout.profile_key(self.player_id))}
+        transactions = []
+        for changes in self.changes.values():
+            operations = self.operations(changes)
+            for transaction in transactions:
+                if len(set(transaction['operations']) | set(operations) | profile) <= MAX_TRANSACTION_ITEMS:
+                    break
+            else:
+                transaction = {'operations': {}, 'changes': []}
+                transactions.append(transaction)
+            merge(transaction['operations'], operations)
+            transaction['changes'].append(changes)
+
+        for transaction in transactions:
+            try:
+                versions.write_player(self.player_id, list(transaction['operations'].values()))
+            except RepositoryError as e:
+                logger.info(e)
+                for changes in transaction['changes']:
+                    for result in changes.results:
+                        result.update({'success': False, 'message': 'Conflicting update, please retry'})
+                        result.pop('result', None)
+        return len(transactions)
+
+
+def key_of(key):
+    return key[layout.PARTITION_KEY], key[layout.SORT_KEY]
+
+
+def merge(operations, new_operations):
+    """
+    Merge the writes of one plane into the writes of a transaction. Planes only share job boards
+    (different jobs consumed from the same board) and the profile (revenue).
+
+    :param operations:          Dict of item key to Update, updated in place
+    :param new_operations:      Dict of item key to Update
+    """
+    for key, operation in new_operations.items():
+        existing = operations.get(key)
+        if existing is None:
+            operations[key] = operation
+            continue
+        for path, value in operation.increments.items():
+            existing.increments[path] = existing.increments.get(path, 0) + value
+        existing.updates.update(operation.updates)
+        existing.removes.extend(operation.removes)
+        existing.condition = existing.condition & operation.condition
+
+
+def apply_fleet_actions(player_id, actions):
+    """
+    Validate and apply a list of fleet actions
+
+    :param player_id:           Player ID
+    :param actions:             List of action dicts
+    :return:                    True/False if successful or not, Message or result data
+    """
+    fleet = FleetRequest(player_id)
+    if not fleet.planes and not storage.get_repository().get(layout.profile_key(player_id)):
+        return False, 'Player does not exist'
+
+    results = [fleet.apply(action) for action in actions]
+    transactions = fleet.commit()
+    logging.info('Applied %s of %s fleet actions in %s transactions',
+                 sum(result['success'] for result in results), len(results), transactions)
+
+    response = {'results': results}
+    if any(changes.revenue for changes in fleet.changes.values()):
+        response['balance'] = utils.get_balance(player_id)
+    return True, response
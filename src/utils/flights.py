@@ -0,0 +1,94 @@
+"""
+Flight state of a plane
+
+A plane is stored either grounded at its current city or in flight, with the absolute times it
+departed and arrives at (epoch seconds, game time):
+
+    grounded    current_city_id
+    in_flight   current_city_id (origin), destination_city_id, departed_at, arrives_at
+
+A plane in flight whose arrival time has passed has arrived: it is landed by the arrivals worker,
+or by the player unloading it, which grounds it at its destination. Only status() tells the three
+apart, so every handler agrees on whether a plane is busy. It only needs STATUS_ATTRIBUTES, so a
+projected read of the plane item is enough to check it.
+
+Planes departed before the flight state was stored only have the flight time in eta.
+"""
+from boto3.dynamodb.conditions import Attr
+
+from models.plane import GROUNDED, IN_FLIGHT
+from utils import clock
+
+# Computed state of a plane in flight whose arrival time has passed
+ARRIVED = 'arrived'
+
+# Attributes of the plane item status() reads
+STATUS_ATTRIBUTES = ['state', 'departed_at', 'arrives_at', 'eta']
+
+# Attributes of the plane item only set while it is in flight
+FLIGHT_ATTRIBUTES = ['departed_at', 'arrives_at', 'eta']
+
+# Why a plane which is not grounded cannot be loaded or departed, by state
+BUSY_MESSAGES = {
+    IN_FLIGHT: 'Plane is currently in flight',
+    ARRIVED: 'Plane has arrived and must be unloaded first'
+}
+
+
+def status(plane, now=None):
+    """
+    Get the flight state of a plane
+
+    :param plane:           Plane Dict, or its STATUS_ATTRIBUTES
+    :param now:             (optional) Epoch seconds, defaults to the game clock
+    :return:                GROUNDED, IN_FLIGHT or ARRIVED
+    """
+    if plane.get('state', IN_FLIGHT if plane.get('eta') else GROUNDED) == GROUNDED:
+        return GROUNDED
+    # A plane departed before the flight state without an arrival time is long overdue
+    arrives_at = plane.get('arrives_at')
+    if arrives_at is not None and arrives_at > (clock.now() if now is None else now):
+        return IN_FLIGHT
+    return ARRIVED
+
+
+def check_grounded(plane, now=None):
+    """
+    Check a plane can be loaded or departed
+
+    :param plane:           Plane Dict
+    :param now:             (optional) Epoch seconds, defaults to the game clock
+    :return:                True/False if grounded or not, Message
+    """
+    state = status(plane, now)
+    if state in BUSY_MESSAGES:
+        return False, BUSY_MESSAGES[state]
+    return True, state
+
+
+def describe(plane, now=None):
+    """
+    Describe the flight of a plane for clients
+
+    :param plane:           Plane Dict, or its STATUS_ATTRIBUTES
+    :param now:             (optional) Epoch seconds, defaults to the game clock
+    :return:                Dict of state, departed_at, arrives_at and seconds_remaining
+    """
+    now = clock.now() if now is None else now
+    state = status(plane, now)
+    description = {'state': state}
+    if state != GROUNDED:
+        description.update({'departed_at': plane.get('departed_at'),
+                            'arrives_at': plane.get('arrives_at'),
+                            'seconds_remaining': max(int(plane.get('arrives_at') or now) - int(now), 0)})
+    return description
+
+
+def grounded_condition():
+    """
+    Condition on a plane item being grounded, for writes which require a plane on the ground
+
+    :return:                boto3 condition
+    """
+    legacy_grounded = Attr('state').not_exists() & (Attr('eta').not_exists() | Attr('eta').eq(0))
+    return Attr('state').eq(GROUNDED) | legacy_grounded
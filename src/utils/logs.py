@@ -0,0 +1,76 @@
+"""
+Logging
+
+Logging is configured once per container (setup) instead of on every invocation. Log calls pass
+their values as lazy %-style arguments, so a message is only formatted when its record is emitted,
+and payloads (bodies, job boards, attribute dicts) are wrapped in truncate() so an emitted record
+carries at most config.log_payload_limit characters of each payload.
+
+The level can be set per route with config.log_route_levels, eg: to silence a hot read route or
+to debug a single write route without raising the level of the whole API.
+"""
+import functools
+import logging
+
+import aws_lambda_logging
+
+from config import config
+
+_configured = False
+
+
+def setup():
+    """
+    Configure logging, once per process
+    """
+    global _configured
+    if not _configured:
+        aws_lambda_logging.setup(level=config.log_level, boto_level=config.boto_log_level)
+        _configured = True
+
+
+class truncate:
+    """
+    Log argument formatting a payload, only when the record is emitted, cut to a length
+    """
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit=None):
+        """
+        :param value:       Payload to log
+        :param limit:       (optional) Most characters, defaults to config.log_payload_limit
+        """
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        limit = self.limit if self.limit is not None else config.log_payload_limit
+        if limit and len(text) > limit:
+            return f'{text[:limit]}... ({len(text)} characters)'
+        return text
+
+
+@functools.lru_cache(maxsize=None)
+def parse_route_levels(route_levels):
+    """
+    Parse per-route levels, eg: 'GET /v1/planes=WARNING;PUT /v1/planes/<string:plane_id>/load=DEBUG'
+
+    :param route_levels:    Semicolon separated list of route=level
+    :return:                Dict of level keyed by route
+    """
+    levels = {}
+    for entry in filter(None, (entry.strip() for entry in route_levels.split(';'))):
+        route, _, level = entry.rpartition('=')
+        levels[route.strip()] = level.strip().upper()
+    return levels
+
+
+def set_route_level(route):
+    """
+    Set the level of the root logger for the request of a route
+
+    :param route:           Route, eg: 'GET /v1/planes'
+    """
+    logging.getLogger().setLevel(parse_route_levels(config.log_route_levels).get(route, config.log_level))
@@ -0,0 +1,268 @@
+"""
+Request and data store metrics
+
+Every DynamoDB call (see storage.dynamodb) is measured: latency, the read and write capacity it
+consumed, the bytes of the items it read or wrote and how many times botocore retried it. The
+calls of one invocation are added up per operation and tagged with the route being served, and
+the lambda handlers emit them as one CloudWatch embedded metric format (EMF) line at the end of
+the invocation: CloudWatch extracts the metrics of the Route dimension from the log line and the
+per-operation breakdown stays queryable in Logs Insights, without any PutMetricData calls.
+
+The wall time of every request is also emitted (Duration) and recorded in a latency histogram of
+its route. The histograms live as long as the process, so on a warm Lambda container the p50,
+p95 and p99 flushed with every invocation cover all the requests the container served.
+"""
+import json
+import math
+import time
+
+from config import config
+
+# Metric name, unit
+METRICS = (
+    ('Calls', 'Count'),
+    ('Errors', 'Count'),
+    ('Latency', 'Milliseconds'),
+    ('ReadCapacityUnits', 'Count'),
+    ('WriteCapacityUnits', 'Count'),
+    ('ItemBytes', 'Bytes'),
+    ('Retries', 'Count'),
+)
+
+# Relative accuracy of the latency histograms
+HISTOGRAM_ACCURACY = 0.01
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """
+    Log-bucketed histogram in the style of HdrHistogram: every bucket covers a range of values
+    whose width grows with the values, so any percentile is within HISTOGRAM_ACCURACY of the
+    recorded value while the memory only grows with the logarithm of the range of the values.
+    """
+
+    def __init__(self, accuracy=HISTOGRAM_ACCURACY):
+        """
+        :param accuracy:    (optional) Relative accuracy of the percentiles
+        """
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.count = 0
+
+    def record(self, value):
+        """
+        Record one value
+
+        :param value:       Value greater than 0, eg: milliseconds
+        """
+        bucket = math.ceil(math.log(max(value, 1e-9)) / self.log_gamma)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, percentile):
+        """
+        Get a percentile of the recorded values
+
+        :param percentile:  Percentile between 0 and 100
+        :return:            Value or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(self.count * percentile / 100), 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                break
+        # The value in the middle of the bucket, in relative terms
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def summary(self):
+        """
+        :return:            Dict of count and the PERCENTILES, eg: p99
+        """
+        return {'count': self.count,
+                **{f'p{percentile}': self.percentile(percentile) for percentile in PERCENTILES}}
+
+
+_histograms = {}
+
+
+def get_histogram(route):
+    """
+    Get the latency histogram of a route, created on first use
+
+    :param route:       Route, eg: 'GET /v1/planes'
+    :return:            Histogram
+    """
+    if route not in _histograms:
+        _histograms[route] = Histogram()
+    return _histograms[route]
+
+
+class Invocation:
+    """
+    Data store calls of one invocation, added up per operation
+    """
+
+    def __init__(self, route=None):
+        """
+        :param route:       (optional) Route being served, eg: 'GET /v1/planes'
+        """
+        self.route = route
+        self.operations = {}
+        self.duration = None
+
+    def record(self, operation, latency, read_units=0, write_units=0, item_bytes=0, retries=0, error=False):
+        """
+        Add one call to the totals of its operation
+
+        :param operation:       DynamoDB operation, eg: GetItem
+        :param latency:         Milliseconds
+        :param read_units:      (optional) Read capacity consumed
+        :param write_units:     (optional) Write capacity consumed
+        :param item_bytes:      (optional) Bytes of the items read or written
+        :param retries:         (optional) Retries made by botocore
+        :param error:           (optional) The call failed
+        """
+        totals = self.operations.setdefault(operation, {name: 0 for name, _ in METRICS})
+        totals['Calls'] += 1
+        totals['Errors'] += int(error)
+        totals['Latency'] += latency
+        totals['ReadCapacityUnits'] += read_units
+        totals['WriteCapacityUnits'] += write_units
+        totals['ItemBytes'] += item_bytes
+        totals['Retries'] += retries
+
+    def summary(self):
+        """
+        Build the EMF document of the invocation
+
+        :return:            Dict of the EMF document
+        """
+        totals = {name: sum(operation[name] for operation in self.operations.values()) for name, _ in METRICS}
+        definitions = [{'Name': name, 'Unit': unit} for name, unit in METRICS]
+        summary = {'Route': self.route or 'unknown', **totals, 'Operations': self.operations}
+        if self.duration is not None:
+            definitions.append({'Name': 'Duration', 'Unit': 'Milliseconds'})
+            summary['Duration'] = self.duration
+            summary['RouteLatency'] = get_histogram(summary['Route']).summary()
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': config.metrics_namespace,
+                    'Dimensions': [['Route']],
+                    'Metrics': definitions
+                }]
+            },
+            **summary
+        }
+
+
+_invocation = Invocation()
+
+
+def start_invocation(route=None):
+    """
+    Start collecting the calls of a new invocation
+
+    :param route:       (optional) Route being served, can be set later with set_route
+    """
+    global _invocation
+    _invocation = Invocation(route)
+
+
+def set_route(route):
+    """
+    Tag the current invocation with the route being served
+
+    :param route:       Route, eg: 'PUT /v1/planes/<string:plane_id>/load'
+    """
+    _invocation.route = route
+
+
+def record_duration(duration):
+    """
+    Record the wall time of the request of the current invocation, in the invocation and in the
+    latency histogram of its route
+
+    :param duration:    Milliseconds
+    """
+    _invocation.duration = duration
+    get_histogram(_invocation.route or 'unknown').record(duration)
+
+
+def record(operation, latency, read_units=0, write_units=0, item_bytes=0, retries=0, error=False):
+    """
+    Record one data store call of the current invocation, see Invocation.record
+    """
+    _invocation.record(operation, latency, read_units, write_units, item_bytes, retries, error)
+
+
+def emit():
+    """
+    Print the EMF line of the current invocation, if it served a request or made any data store calls
+
+    :return:            Dict of the EMF document or None
+    """
+    if not config.metrics_enabled or (not _invocation.operations and _invocation.duration is None):
+        return None
+    summary = _invocation.summary()
+    print(json.dumps(summary), flush=True)
+    return summary
+
+
+class measure:
+    """
+    Context manager timing one DynamoDB call and recording it with the consumed capacity and
+    retries its response (or the response of the error it raised) reports
+    """
+
+    def __init__(self, operation, write=False):
+        """
+        :param operation:       DynamoDB operation, eg: GetItem
+        :param write:           (optional) Capacity reported as CapacityUnits is write capacity
+        """
+        self.operation = operation
+        self.write = write
+        self.response = {}
+        self.item_bytes = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        latency = (time.perf_counter() - self.started) * 1000
+        response = self.response
+        if exc_value is not None:
+            # Repository errors keep the botocore ClientError, and its response, as their cause
+            response = getattr(exc_value.__cause__ or exc_value, 'response', None) or {}
+        read_units, write_units = consumed_capacity(response.get('ConsumedCapacity'), self.write)
+        record(self.operation, latency, read_units, write_units, self.item_bytes,
+               response.get('ResponseMetadata', {}).get('RetryAttempts', 0), error=exc_type is not None)
+        return False
+
+
+def consumed_capacity(consumed, write=False):
+    """
+    Read the capacity units of the ConsumedCapacity of a response
+
+    :param consumed:        ConsumedCapacity dict, list of dicts (transactions) or None
+    :param write:           (optional) Count CapacityUnits as write capacity when the split is not reported
+    :return:                Read capacity units, write capacity units
+    """
+    if not consumed:
+        return 0, 0
+    read_units = write_units = 0
+    for capacity in consumed if isinstance(consumed, list) else [consumed]:
+        if 'ReadCapacityUnits' in capacity or 'WriteCapacityUnits' in capacity:
+            read_units += capacity.get('ReadCapacityUnits', 0)
+            write_units += capacity.get('WriteCapacityUnits', 0)
+        elif write:
+            write_units += capacity.get('CapacityUnits', 0)
+        else:
+            read_units += capacity.get('CapacityUnits', 0)
+    return read_units, write_units
@@ -0,0 +1,73 @@
+"""
+Sampling profiler
+
+A sampled fraction of requests (config.profile_sample_rate) is run under cProfile, and when
+config.profile_header is enabled a client can also ask for a profile with the X-Profile: true
+header. The report of the functions with the most cumulative time is logged with the route and
+the wall time of the request, and the raw stats are written to config.profile_dir when it is set
+so they can be opened with pstats or snakeviz.
+
+Profiling slows the profiled request down several times, keep the sample rate low in production.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+
+from config import config
+
+logger = logging.getLogger()
+
+PROFILE_HEADER = 'X-Profile'
+
+# Requests are sampled with their own unseeded generator so profiling does not consume the seeded
+# game streams of utils.rng and change their outputs
+_sampler = random.Random()
+
+
+def should_profile(headers):
+    """
+    Decide whether to profile a request
+
+    :param headers:         Request headers
+    :return:                True/False
+    """
+    if config.profile_header and headers.get(PROFILE_HEADER, '').lower() == 'true':
+        return True
+    return config.profile_sample_rate > 0 and _sampler.random() < config.profile_sample_rate
+
+
+def start():
+    """
+    Start profiling the current request
+
+    :return:                cProfile.Profile
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+def stop(profile, route, duration):
+    """
+    Stop profiling a request, log the report and dump the stats
+
+    :param profile:         cProfile.Profile returned by start
+    :param route:           Route of the request, eg: 'GET /v1/planes'
+    :param duration:        Wall time of the request in milliseconds
+    :return:                Report text
+    """
+    profile.disable()
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(config.profile_top)
+    report = stream.getvalue()
+    logger.info('Profile of "%s" (%.1f ms):\n%s', route, duration, report)
+
+    if config.profile_dir:
+        name = re.sub(r'[^0-9A-Za-z]+', '_', route).strip('_')
+        profile.dump_stats(os.path.join(config.profile_dir, f'{name}-{int(time.time() * 1000)}.prof'))
+    return report
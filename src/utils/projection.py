@@ -0,0 +1,126 @@
+"""
+Field selection and pagination of the player read endpoints
+
+Clients pass the fields they render as paths into the response, comma separated, with '*' for
+every entity of a collection:
+
+    fields=cities.*.name,cities.c1001.jobs_expire
+    fields=planes.*.loaded_jobs,planes.*.current_city_id
+    fields=jobs.*.revenue
+
+The paths are pushed down into the ProjectionExpression of the reads, and only the listed
+entities are read when no '*' is given. Collections are paged with limit and cursor, the cursor
+being the last entity id of the previous page.
+"""
+from storage import layout
+from storage.repository import project
+
+# Most entities returned by one page
+MAX_LIMIT = 100
+
+
+def parse_fields(fields, collection):
+    """
+    Parse the fields of a collection
+
+    :param fields:          Comma separated paths, eg: 'cities.*.name,cities.c1001', or None for everything
+    :param collection:      Top level name of the collection, eg: 'cities'
+    :return:                True/False if valid or not, Message or Dict of entity id (or '*') to a list of
+                            attribute paths, None for whole entities
+    """
+    if not fields:
+        return True, {'*': None}
+
+    requested = {}
+    for field in fields.split(','):
+        parts = field.strip().split('.')
+        if parts[0] != collection or not all(parts):
+            return False, f'fields must be paths in {collection}, eg: {collection}.*.<attribute>'
+        entity_id = parts[1] if len(parts) > 1 else '*'
+        if len(parts) <= 2:
+            requested[entity_id] = None
+        elif requested.get(entity_id, []) is not None:
+            requested.setdefault(entity_id, []).append('.'.join(parts[2:]))
+    return True, requested
+
+
+def entity_paths(requested, entity_id):
+    """
+    Get the attribute paths requested for one entity
+
+    :param requested:       Parsed fields, see parse_fields
+    :param entity_id:       Entity id
+    :return:                List of attribute paths, None for the whole entity
+    """
+    paths = []
+    for key in ('*', entity_id):
+        if key in requested:
+            if requested[key] is None:
+                return None
+            paths.extend(requested[key])
+    return paths
+
+
+def read_paths(requested):
+    """
+    Get the attribute paths to read for every requested entity. DynamoDB rejects projections with
+    overlapping paths, so paths inside another requested path and the key attributes, which the reads
+    always project, are left out.
+
+    :param requested:       Parsed fields, see parse_fields
+    :return:                List of attribute paths, None for whole entities
+    """
+    if any(paths is None for paths in requested.values()):
+        return None
+    paths = sorted({path for paths in requested.values() for path in paths})
+    return [path for path in paths if path.split('.', 1)[0] not in layout.KEY_ATTRIBUTES
+            and not any(path.startswith(f'{other}.') for other in paths)]
+
+
+def select(entities, requested):
+    """
+    Keep the requested entities and fields of a collection
+
+    :param entities:        Dict of entity id to entity
+    :param requested:       Parsed fields, see parse_fields
+    :return:                Dict of entity id to entity
+    """
+    selected = {}
+    for entity_id, entity in entities.items():
+        if '*' in requested or entity_id in requested:
+            paths = entity_paths(requested, entity_id)
+            selected[entity_id] = entity if paths is None else project(entity, paths)
+    return selected
+
+
+def parse_page(args, collection):
+    """
+    Parse the fields, limit and cursor query parameters of a request
+
+    :param args:            Request query parameters
+    :param collection:      Top level name of the collection, eg: 'cities'
+    :return:                True/False if valid or not, Message or Tuple of the parsed fields (see parse_fields),
+                            limit (or None) and cursor (or None)
+    """
+    success, requested = parse_fields(args.get('fields'), collection)
+    if not success:
+        return False, requested
+    limit = args.get('limit')
+    if limit is not None and (not limit.isdigit() or not 0 < int(limit) <= MAX_LIMIT):
+        return False, f'limit must be a whole number between 1 and {MAX_LIMIT}'
+    return True, (requested, int(limit) if limit is not None else None, args.get('cursor') or None)
+
+
+def paginate(entities, limit=None, cursor=None):
+    """
+    Get one page of a collection held in memory, ordered by entity id
+
+    :param entities:        Dict of entity id to entity
+    :param limit:           (optional) Most entities in the page
+    :param cursor:          (optional) Last entity id of the previous page
+    :return:                Dict of the entities of the page, cursor of the next page or None
+    """
+    entity_ids = sorted(entity_id for entity_id in entities if cursor is None or entity_id > cursor)
+    if limit is None or len(entity_ids) <= limit:
+        return {entity_id: entities[entity_id] for entity_id in entity_ids}, None
+    return {entity_id: entities[entity_id] for entity_id in entity_ids[:limit]}, entity_ids[limit - 1]
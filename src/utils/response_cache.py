@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import logging
+
+from flask import Response, jsonify, request
+
+from config import config
+
+logger = logging.getLogger()
+
+
+class CachedResponse:
+    """
+    A JSON response body rendered once and kept as identity and gzip byte buffers
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.gzip_body = gzip.compress(body, mtime=0)
+        self.etag = hashlib.sha1(body).hexdigest()
+
+    def make_response(self):
+        """
+        Build the response for the current request. The body encoding is negotiated with
+        Accept-Encoding and a 304 is returned when If-None-Match matches the cached ETag.
+
+        :return:        Flask response
+        """
+        use_gzip = request.accept_encodings['gzip'] > 0
+        etag = f'{self.etag}-gzip' if use_gzip else self.etag
+
+        headers = {
+            'Cache-Control': f'public, max-age={config.market_cache_max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(self.gzip_body if use_gzip else self.body, status=200, headers=headers,
+                                mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+
+        response.set_etag(etag)
+        return response
+
+
+_cache = {}
+
+
+def cached_response(key, render):
+    """
+    Serve a JSON payload which only needs to be rendered once per process
+
+    :param key:             Cache key for the payload
+    :param render:          Function returning the payload dict, called on the first request only
+    :return:                Flask response
+    """
+    cached = _cache.get(key)
+    if cached is None:
+        logger.info('Rendering cached response: %s', key)
+        cached = _cache[key] = CachedResponse(jsonify(render()).get_data())
+    return cached.make_response()
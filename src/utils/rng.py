@@ -0,0 +1,67 @@
+"""
+Random number generation
+
+Two kinds of generators are used by the game:
+
+    streams             keyed, counter-based Philox generators. A stream is named by stable values
+                        (eg: 'jobs', player_id, city_id, jobs_expire) and the same names always
+                        produce the same numbers, in any process, so anything drawn from a stream
+                        can be regenerated, cached or verified instead of stored.
+    process generator   one PCG64 generator per process for values which only need to be unique,
+                        such as purchased plane ids.
+
+Setting RNG_SEED (config.rng_seed) keys every stream with the seed and seeds the process generator,
+so benchmarks and simulations are reproducible from run to run.
+"""
+import hashlib
+
+import numpy as np
+
+from config import config
+
+_generator = None
+
+
+def stream_key(*names):
+    """
+    Get the Philox key of a named stream
+
+    :param names:           Stable values naming the stream, converted with str()
+    :return:                128 bit key
+    """
+    seed = b'' if config.rng_seed is None else str(config.rng_seed).encode('utf-8')
+    digest = hashlib.blake2b('#'.join(str(name) for name in names).encode('utf-8'),
+                             digest_size=16, key=seed).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def stream(*names):
+    """
+    Get a new generator for a named stream, positioned at the start of the stream
+
+    :param names:           Stable values naming the stream, eg: 'jobs', player_id, city_id, jobs_expire
+    :return:                numpy Generator
+    """
+    return np.random.Generator(np.random.Philox(key=stream_key(*names)))
+
+
+def get_generator():
+    """
+    Get the process generator, created on first use
+
+    :return:                numpy Generator
+    """
+    global _generator
+    if _generator is None:
+        _generator = np.random.Generator(np.random.PCG64(config.rng_seed))
+    return _generator
+
+
+def set_seed(seed):
+    """
+    Reseed the process generator, eg: at the start of a benchmark or simulation
+
+    :param seed:            Integer seed, or None for fresh OS entropy
+    """
+    global _generator
+    _generator = np.random.Generator(np.random.PCG64(seed))
@@ -0,0 +1,120 @@
+"""
+Multi-leg route planning
+
+Every plane type has a flight graph over the city catalog: a directed edge joins two cities when
+the distance between them is within the flight range of the plane type, so every edge is a leg the
+plane can depart on. The graphs only depend on the catalog, so each one is built once per process
+from the distance matrix, and the shortest path trees computed from it are cached per origin: a
+repeated query for the same plane type and origin is a dictionary lookup.
+
+Routes can be optimized for:
+
+    time        fewest seconds in the air, the sum of the ETAs of the legs
+    hops        fewest legs, ie: fewest departures and landings
+"""
+import functools
+
+import networkx as nx
+import numpy as np
+
+import storage
+from config import config
+from definitions.catalog import planes
+from storage import layout
+from utils import utils
+from utils.distances import distance_matrix
+
+OPTIMIZE = ('time', 'hops')
+
+
+@functools.lru_cache(maxsize=None)
+def get_route_graph(plane_id):
+    """
+    Build (once) the flight graph of a plane type
+
+    :param plane_id:            Plane type ID from the catalog
+    :return:                    networkx DiGraph of City IDs, edges have distance and eta attributes
+    """
+    plane = planes[plane_id]
+    matrix = distance_matrix.matrix
+    origins, destinations = np.nonzero(matrix <= plane.flight_range)
+
+    graph = nx.DiGraph()
+    graph.add_nodes_from(distance_matrix.city_ids)
+    graph.add_edges_from(
+        (distance_matrix.city_ids[i], distance_matrix.city_ids[j],
+         {'distance': distance, 'eta': utils.get_seconds_between_cities(distance, plane.speed)})
+        for i, j, distance in zip(origins.tolist(), destinations.tolist(), matrix[origins, destinations].tolist())
+        if i != j)
+    return graph
+
+
+@functools.lru_cache(maxsize=config.route_cache_size)
+def get_shortest_paths(plane_id, origin_city_id, optimize):
+    """
+    Compute (once) the shortest path tree of a plane type from an origin city
+
+    :param plane_id:            Plane type ID from the catalog
+    :param origin_city_id:      Origin City ID
+    :param optimize:            time or hops
+    :return:                    Dict of paths (lists of City IDs) keyed by destination City ID
+    """
+    graph = get_route_graph(plane_id)
+    if optimize == 'hops':
+        return nx.single_source_shortest_path(graph, origin_city_id)
+    return nx.single_source_dijkstra_path(graph, origin_city_id, weight='eta')
+
+
+def get_route(plane_id, origin_city_id, destination_city_id, optimize='time'):
+    """
+    Get the best route of a plane type between two cities
+
+    :param plane_id:                Plane type ID from the catalog
+    :param origin_city_id:          Origin City ID
+    :param destination_city_id:     Destination City ID
+    :param optimize:                (optional) time or hops
+    :return:                        Dict of the route or None if the destination cannot be reached
+    """
+    path = get_shortest_paths(plane_id, origin_city_id, optimize).get(destination_city_id)
+    if path is None:
+        return None
+
+    graph = get_route_graph(plane_id)
+    legs = [{'origin_city_id': origin, 'destination_city_id': destination, **graph.edges[origin, destination]}
+            for origin, destination in zip(path, path[1:])]
+    return {
+        'cities': list(path),
+        'legs': legs,
+        'distance': sum(leg['distance'] for leg in legs),
+        'eta': sum(leg['eta'] for leg in legs)
+    }
+
+
+def plan_route(player_id, plane_id, origin_city_id, destination_city_id, optimize='time'):
+    """
+    Plan a multi-leg route of a plane type between two cities owned by the player. The legs may
+    stop at any city of the catalog.
+
+    :param player_id:               Player ID owning the cities
+    :param plane_id:                Plane type ID from the catalog
+    :param origin_city_id:          Origin City ID
+    :param destination_city_id:     Destination City ID
+    :param optimize:                (optional) time or hops
+    :return:                        True/False if successful or not, Message or Dict of the route
+    """
+    if plane_id not in planes:
+        return False, 'Plane does not exist'
+    if optimize not in OPTIMIZE:
+        return False, f'optimize must be one of: {", ".join(OPTIMIZE)}'
+
+    city_items = utils.query_entities(player_id, layout.CITY_PREFIX)
+    if not city_items and not storage.get_repository().get(layout.profile_key(player_id)):
+        return False, 'Player does not exist'
+    player_cities = {layout.entity_id(item) for item in city_items}
+    if origin_city_id not in player_cities or destination_city_id not in player_cities:
+        return False, 'Player does not own both cities'
+
+    route = get_route(plane_id, origin_city_id, destination_city_id, optimize)
+    if route is None:
+        return False, 'Destination city cannot be reached by the plane'
+    return True, route
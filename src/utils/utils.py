@@ -1,24 +1,28 @@
+import functools
+import heapq
 import logging
-import random
+import operator
 import string
-import time
 
-import boto3
+import numpy as np
 from boto3.dynamodb.conditions import Attr
-from botocore.exceptions import ClientError
 from flask import request
-from haversine import haversine, Unit
 
 from config import config
 from models.job import Job
+from models.plane import GROUNDED, IN_FLIGHT
 from models.player import Player
-from definitions.cities import cities
-from definitions.planes import planes
+from definitions.catalog import cities, planes
+import storage
+from storage import layout
+from storage.repository import ConditionalCheckFailed, Delete, Put, RepositoryError, Update
+from utils import clock, flights, logs, projection, rng, versions
+from utils.distances import distance_matrix
 
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
-table = dynamodb.Table(name=config.dynamodb_players_table)
 logger = logging.getLogger()
 
+JOB_TYPES = ['P', 'C']
+
 
 def get_username():
     """
@@ -30,45 +34,72 @@ def get_username():
     username = request.environ.get('awsgi.event', {}).get('requestContext', {}).get(
         'authorizer', {}).get('claims', {}).get('cognito:username')
     if username:
-        logger.info(f'Found Cognito username cognito:username: {username}')
+        logger.info('Found Cognito username cognito:username: %s', username)
         return username
 
     api_key = request.environ.get('awsgi.event', {}).get('requestContext', {}).get(
         'identity', {}).get('apiKey')
     if api_key:
-        logger.info(f'Found apiKey: {api_key}')
+        logger.info('Found apiKey: %s', api_key)
         return api_key
 
     logger.error('Unable to find identity from Cognito or apiKey')
     return None
 
 
-def generate_random_jobs(player_cities, current_city_id, count=30):
+def generate_random_jobs(player_cities, current_city_id, count=30, generator=None):
     """
-    Generate a set of random jobs for a city
+    Generate a set of random jobs for a city. Destinations, job types and ids for the whole batch
+    are drawn in one vectorized pass and each job is priced for the destination it is assigned
+    from the cached revenue table of the city.
 
-    :param player_cities:           Dict of current player cities
+    :param player_cities:           Dict (or list of ids) of current player cities
     :param current_city_id:         Id of current city the jobs are generated at
     :param count:                   Number of jobs to generate
+    :param generator:               (optional) numpy Generator, eg: a stream of utils.rng, defaults
+                                    to the process generator
     :return:                        Dict of jobs
     """
-    logging.info(f'Generating {count} random job for city_id: {current_city_id}')
-    player_city_ids = [city_id for city_id in player_cities.keys()
-                       if city_id != current_city_id]
+    logging.info('Generating %s random job for city_id: %s', count, current_city_id)
+    player_city_ids, revenues = get_revenue_table(current_city_id, frozenset(player_cities))
+    if not player_city_ids:
+        return {}
+
+    generator = generator or rng.get_generator()
+    destinations = generator.integers(len(player_city_ids), size=count)
+    job_types = generator.integers(len(JOB_TYPES), size=count)
+    job_ids = generate_random_strings(count, generator=generator)
 
     jobs = {}
 
-    for _ in range(count):
+    for job_id, destination, job_type in zip(job_ids, destinations.tolist(), job_types.tolist()):
 
         job = Job(origin_city_id=current_city_id,
-                  destination_city_id=random.choice(player_city_ids),
-                  revenue=calculate_job_revenue(current_city_id, random.choice(player_city_ids)),
-                  job_type=random.choice(['P', 'C']))
+                  destination_city_id=player_city_ids[destination],
+                  revenue=revenues[destination],
+                  job_type=JOB_TYPES[job_type],
+                  job_id=job_id)
         jobs[job.id] = job.serialize()
 
     return jobs
 
 
+@functools.lru_cache(maxsize=config.revenue_table_cache_size)
+def get_revenue_table(origin_city_id, player_city_ids):
+    """
+    Get the job revenue from a city to each of the other player cities. Tables are memoized per
+    (origin, player city set) so job generation does no distance lookups or pricing.
+
+    :param origin_city_id:              Starting City ID
+    :param player_city_ids:             Frozenset of the player's City IDs
+    :return:                            Tuple of destination City IDs, tuple of matching revenues
+    """
+    destination_city_ids = tuple(sorted(city_id for city_id in player_city_ids if city_id != origin_city_id))
+    if not destination_city_ids:
+        return (), ()
+    return destination_city_ids, tuple(calculate_job_revenues(origin_city_id, destination_city_ids))
+
+
 def calculate_job_revenue(origin_city_id, destination_city_id):
     """
     Calculate job revenue between two cities based on distance
@@ -81,30 +112,102 @@ def calculate_job_revenue(origin_city_id, destination_city_id):
     return int(50 + distance * 0.17)
 
 
+def calculate_job_revenues(origin_city_id, destination_city_ids):
+    """
+    Calculate job revenue from one city to a list of cities. Same pricing as calculate_job_revenue.
+
+    :param origin_city_id:              Starting City ID
+    :param destination_city_ids:        List of destination City IDs
+    :return:                            List of job revenues, ordered as destination_city_ids
+    """
+    distances = distance_matrix.distances_from(origin_city_id, destination_city_ids)
+    return (50 + distances * 0.17).astype(np.int64).tolist()
+
+
 def generate_random_string(length=20):
     """
     Generate a random string which is safe to use as keys in dynamo
 
     :param length:      Length of string to generate
     """
-    return ''.join(random.choices(string.ascii_lowercase, k=length))
+    return generate_random_strings(1, length)[0]
+
+
+def generate_random_strings(count, length=20, generator=None):
+    """
+    Generate a batch of random strings which are safe to use as keys in dynamo, from one
+    bulk random buffer
+
+    :param count:       Number of strings to generate
+    :param length:      Length of each string
+    :param generator:   (optional) numpy Generator, defaults to the process generator
+    :return:            List of strings
+    """
+    letters = (generator or rng.get_generator()).integers(len(string.ascii_lowercase), size=count * length, dtype=np.uint8)
+    buffer = (letters + ord('a')).tobytes().decode('ascii')
+    return [buffer[i:i + length] for i in range(0, count * length, length)]
+
+
+def materialize_job_board(player_id, city_id, job_board):
+    """
+    Derive the jobs of a job board item. The jobs are not stored: they are generated again from the
+    stream of the board window and the destinations the board was created with, and the consumed
+    job ids are left out.
+
+    :param player_id:           Player ID owning the city
+    :param city_id:             City ID of the job board
+    :param job_board:           Job board item (jobs_expire, destinations, consumed), or None
+    :return:                    Job board item with its jobs, or None
+    """
+    if not job_board:
+        return None
+    jobs_expire = int(job_board.get('jobs_expire', 0))
+    consumed = job_board.get('consumed') or {}
+    jobs = generate_random_jobs(job_board.get('destinations') or [], city_id,
+                                generator=rng.stream('jobs', player_id, city_id, jobs_expire))
+    return {**job_board,
+            'jobs': {job_id: job for job_id, job in jobs.items() if job_id not in consumed},
+            'jobs_expire': jobs_expire}
 
 
 def get_distance_between_cities(city_id_1, city_id_2):
     """
-    Use Haversine to get the distance between two cities
+    Get the distance between two cities from the precomputed distance matrix
 
     :param city_id_1:
     :param city_id_2:
-    :return:
+    :return:            Distance in whole miles or None if either city does not exist
     """
-    city_1 = cities.get(city_id_1)
-    city_2 = cities.get(city_id_2)
-    if not city_1 or not city_2:
-        return None
+    return distance_matrix.distance(city_id_1, city_id_2)
 
-    return int(haversine((city_1.latitude, city_1.longitude),
-                         (city_2.latitude, city_2.longitude), unit=Unit.MILES))
+
+def get_reachable_cities(player_id, city_id, flight_range=None, owned=False, limit=None):
+    """
+    Get the cities within range of a city, nearest first, from the neighbour index of the distance
+    matrix
+
+    :param player_id:           Player ID, used when only owned cities are returned
+    :param city_id:             Origin City ID
+    :param flight_range:        (optional) Distance in miles, defaults to any distance
+    :param owned:               (optional) Only return cities owned by the player
+    :param limit:               (optional) Most cities to return
+    :return:                    True/False if successful or not, Message or List of city_id and distance dicts
+    """
+    if city_id not in distance_matrix.index:
+        return False, 'City does not exist'
+
+    candidates = None
+    if owned:
+        city_items = query_entities(player_id, layout.CITY_PREFIX)
+        if not city_items and not storage.get_repository().get(layout.profile_key(player_id)):
+            return False, 'Player does not exist'
+        candidates = {layout.entity_id(item) for item in city_items}
+
+    if flight_range is None:
+        neighbours = distance_matrix.nearest(city_id, limit, candidates)
+    else:
+        neighbours = distance_matrix.within(city_id, flight_range, candidates)[:limit]
+    return True, [{'city_id': neighbour_id, 'distance': distance} for neighbour_id, distance in neighbours]
 
 
 def get_seconds_between_cities(distance_in_miles, plane_speed_mph):
@@ -118,6 +221,29 @@ def get_seconds_between_cities(distance_in_miles, plane_speed_mph):
     return int((distance_in_miles / plane_speed_mph) * 60 * 60)
 
 
+def query_entities(player_id, prefix):
+    """
+    Query all items of a player with a sort key starting with the prefix
+
+    :param player_id:       Player ID to query
+    :param prefix:          Sort key prefix, eg: layout.CITY_PREFIX
+    :return:                List of items
+    """
+    return storage.get_repository().query(player_id, prefix)
+
+
+def get_balance(player_id):
+    """
+    Read the current balance of a player
+
+    :param player_id:       Player ID to query
+    :return:                Balance or None if player does not exist
+    """
+    profile = storage.get_repository().get(layout.profile_key(player_id), attributes=['balance'],
+                                           consistent=True)
+    return profile.get('balance') if profile else None
+
+
 def create_player(player_id, balance):
     """
     Create a new player in the database
@@ -126,36 +252,256 @@ def create_player(player_id, balance):
     :param balance:         Initial starting balance
     :return:                True/False if successful or not, Message
     """
+    if layout.reserved_player_id(player_id):
+        return False, f'Player ID "{player_id}" is reserved'
+
     player = Player(player_id=player_id,
                     balance=balance)
     try:
-        table.put_item(Item=player.serialize(),
-                       ConditionExpression='attribute_not_exists(player_id)')
-    except ClientError as e:
-        if 'ConditionalCheckFailedException' in str(e):
-            return False, f'Player "{player_id}" already exists'
+        storage.get_repository().put({**layout.split_player(player.serialize())[0], layout.VERSION: 1},
+                                     condition=Attr(layout.PARTITION_KEY).not_exists())
+    except ConditionalCheckFailed:
+        return False, f'Player "{player_id}" already exists'
 
-    logging.info(f'Player "{player_id}" created with balance: {balance}')
+    logging.info('Player "%s" created with balance: %s', player_id, balance)
     return True, f'Player "{player_id}" created with balance: {balance}'
 
 
 def get_player_attributes(player_id, attributes_to_get):
     """
-    Query the player in the database and return the listed attributes
+    Query the player in the database and return the listed attributes. Cities and planes are read
+    with one key-prefix Query per entity type, the profile is only read for other attributes.
 
     :param player_id:               Player ID to query
     :param attributes_to_get:       List of attributes to return
     :return:                        True/False if successful or not, Message or result data
     """
-    logging.info(f'Getting attributes: "{attributes_to_get}" for player: "{player_id}"')
-    result = table.get_item(Key={'player_id': player_id},
-                            AttributesToGet=attributes_to_get).get('Item')
-    if result:
-        results = {name: result.get(name) for name in attributes_to_get}
-        logging.info(f'Retrieved attributes: {results}')
-        return True, results
-    else:
+    logging.info('Getting attributes: "%s" for player: "%s"', attributes_to_get, player_id)
+    results = {}
+    if 'cities' in attributes_to_get:
+        job_boards = [materialize_job_board(player_id, layout.entity_id(item), item)
+                      for item in query_entities(player_id, layout.JOB_BOARD_PREFIX)]
+        results['cities'] = layout.merge_cities(query_entities(player_id, layout.CITY_PREFIX), job_boards)
+    if 'planes' in attributes_to_get:
+        results['planes'] = layout.merge_planes(query_entities(player_id, layout.PLANE_PREFIX))
+
+    profile_attributes = [name for name in attributes_to_get if name not in results]
+    if profile_attributes or not any(results.values()):
+        # The profile is also read when no entities were found, to check the player exists
+        profile = storage.get_repository().get(layout.profile_key(player_id))
+        if not profile:
+            return False, 'Player does not exist'
+        results.update({name: profile.get(name) for name in profile_attributes})
+
+    logging.info('Retrieved attributes: %s', logs.truncate(results))
+    return True, {name: results.get(name) for name in attributes_to_get}
+
+
+def read_entities(player_id, prefix, requested, attributes=None, limit=None, cursor=None):
+    """
+    Read the requested entities of a player: one page of all of them, or only the listed ones when the
+    fields do not include every entity ('*')
+
+    :param player_id:               Player ID to query
+    :param prefix:                  Sort key prefix, eg: layout.PLANE_PREFIX
+    :param requested:               Parsed fields, see projection.parse_fields
+    :param attributes:              (optional) List of attribute paths to read, defaults to all
+    :param limit:                   (optional) Most entities to read
+    :param cursor:                  (optional) Last entity id of the previous page
+    :return:                        List of items, cursor of the next page or None
+    """
+    repository = storage.get_repository()
+    if '*' not in requested:
+        entity_ids = sorted(requested)
+        items = [repository.get({layout.PARTITION_KEY: player_id, layout.SORT_KEY: f'{prefix}{entity_id}'},
+                                attributes=None if attributes is None else [layout.SORT_KEY, *attributes])
+                 for entity_id in entity_ids]
+        return [item for item in items if item], None
+
+    items = repository.query(player_id, prefix, attributes=attributes, limit=limit + 1 if limit else None,
+                             start_after=f'{prefix}{cursor}' if cursor else None)
+    if limit and len(items) > limit:
+        return items[:limit], layout.entity_id(items[limit - 1])
+    return items, None
+
+
+def get_cities(player_id, requested=None, limit=None, cursor=None):
+    """
+    Get the cities of a player, with only the requested fields. The job boards are only read, and
+    their jobs only derived, when their fields (jobs, jobs_expire) are requested.
+
+    :param player_id:               Player ID to query
+    :param requested:               (optional) Parsed fields (see projection.parse_fields), defaults to everything
+    :param limit:                   (optional) Most cities to return
+    :param cursor:                  (optional) Cursor returned with the previous page
+    :return:                        True/False if successful or not, Message or Dict of cities and cursor
+    """
+    requested = requested or {'*': None}
+    paths = projection.read_paths(requested)
+    city_paths = None if paths is None else [path for path in paths
+                                             if path.split('.', 1)[0] not in layout.JOB_BOARD_ATTRIBUTES]
+    job_board_names = set(layout.JOB_BOARD_ATTRIBUTES) if paths is None else \
+        {path.split('.', 1)[0] for path in paths} & set(layout.JOB_BOARD_ATTRIBUTES)
+
+    city_items, next_cursor = read_entities(player_id, layout.CITY_PREFIX, requested, city_paths, limit, cursor)
+    job_boards = []
+    if job_board_names and city_items:
+        # Job boards are written with their city, so a page of job boards holds the boards of the page of cities
+        job_board_paths = ['jobs_expire', 'destinations', 'consumed'] if 'jobs' in job_board_names else ['jobs_expire']
+        job_board_items, _ = read_entities(player_id, layout.JOB_BOARD_PREFIX, requested, job_board_paths, limit, cursor)
+        job_boards = [materialize_job_board(player_id, layout.entity_id(item), item) for item in job_board_items]
+
+    cities = layout.merge_cities(city_items, job_boards)
+    if not job_board_names:
+        cities = {city_id: {name: value for name, value in city.items() if name not in layout.JOB_BOARD_ATTRIBUTES}
+                  for city_id, city in cities.items()}
+    return paged(player_id, 'cities', projection.select(cities, requested), next_cursor, cursor)
+
+
+def get_planes(player_id, requested=None, limit=None, cursor=None):
+    """
+    Get the planes of a player, with only the requested fields
+
+    :param player_id:               Player ID to query
+    :param requested:               (optional) Parsed fields (see projection.parse_fields), defaults to everything
+    :param limit:                   (optional) Most planes to return
+    :param cursor:                  (optional) Cursor returned with the previous page
+    :return:                        True/False if successful or not, Message or Dict of planes and cursor
+    """
+    requested = requested or {'*': None}
+    items, next_cursor = read_entities(player_id, layout.PLANE_PREFIX, requested, projection.read_paths(requested),
+                                       limit, cursor)
+    return paged(player_id, 'planes', projection.select(layout.merge_planes(items), requested), next_cursor, cursor)
+
+
+def player_missing(player_id):
+    """
+    Check whether a player does not exist, reading only the key of its profile
+
+    :param player_id:               Player ID
+    :return:                        True if the player does not exist
+    """
+    return not storage.get_repository().get(layout.profile_key(player_id), attributes=[layout.PARTITION_KEY])
+
+
+def get_city(player_id, city_id):
+    """
+    Get one city of a player with the jobs of its job board, reading the city and job board items
+    in one BatchGetItem
+
+    :param player_id:               Player ID owning the city
+    :param city_id:                 City ID
+    :return:                        True/False if successful or not, Message or City Dict
+    """
+    city_item, job_board_item = storage.get_repository().batch_get(
+        [layout.city_key(player_id, city_id), layout.job_board_key(player_id, city_id)])
+    if not city_item:
+        return False, 'Player does not exist' if player_missing(player_id) else 'Player does not own city'
+    job_board = materialize_job_board(player_id, city_id, job_board_item)
+    return True, layout.merge_cities([city_item], [job_board] if job_board else [])[city_id]
+
+
+def get_city_ids(player_id):
+    """
+    Get the ids of the cities of a player, reading only the keys of the city items
+
+    :param player_id:               Player ID to query
+    :return:                        List of city ids
+    """
+    return [layout.entity_id(item) for item in storage.get_repository().query(player_id, layout.CITY_PREFIX,
+                                                                              attributes=[])]
+
+
+def get_plane(player_id, plane_id, attributes=None):
+    """
+    Get one plane of a player
+
+    :param player_id:               Player ID owning the plane
+    :param plane_id:                Plane ID
+    :param attributes:              (optional) List of attribute paths to read, defaults to all
+    :return:                        True/False if successful or not, Message or Plane Dict, with its version
+                                    for conditional writes (see versions.unchanged)
+    """
+    item = storage.get_repository().get(layout.plane_key(player_id, plane_id),
+                                        attributes=None if attributes is None else [layout.SORT_KEY, *attributes])
+    if not item:
+        return False, 'Player does not exist' if player_missing(player_id) else 'Invalid plane_id'
+    return True, layout.strip_key(item)
+
+
+def get_plane_and_city(player_id, plane_id):
+    """
+    Get one plane of a player and the job board of the city the plane is at. The job board is read
+    without the jobs stored by the original layout, its jobs are derived (see materialize_job_board).
+
+    :param player_id:               Player ID owning the plane
+    :param plane_id:                Plane ID
+    :return:                        True/False if successful or not, Message or Tuple of the plane and the job
+                                    board with its jobs (None if the player does not own the city)
+    """
+    success, plane = get_plane(player_id, plane_id)
+    if not success:
+        return False, plane
+    city_id = plane.get('current_city_id')
+    job_board = storage.get_repository().get(layout.job_board_key(player_id, city_id),
+                                             attributes=['jobs_expire', 'destinations', 'consumed'])
+    return True, (plane, materialize_job_board(player_id, city_id, job_board))
+
+
+def paged(player_id, collection, entities, next_cursor, cursor):
+    """
+    Build the response of one page of a collection
+
+    :param player_id:               Player ID
+    :param collection:              Name of the collection, eg: 'cities'
+    :param entities:                Dict of the entities of the page
+    :param next_cursor:             Cursor of the next page or None
+    :param cursor:                  Cursor of this page or None
+    :return:                        True/False if successful or not, Message or Dict of the collection and cursor
+    """
+    # An empty first page may be a missing player
+    if not entities and not cursor and player_missing(player_id):
+        return False, 'Player does not exist'
+    result = {collection: entities}
+    if next_cursor:
+        result['cursor'] = next_cursor
+    return True, result
+
+
+def get_changes(player_id, since):
+    """
+    Get the state of a player changed since a version (see utils.versions). A client which is up to
+    date only costs one read of the profile.
+
+    :param player_id:               Player ID to query
+    :param since:                   Version the client has seen, 0 for the whole player
+    :return:                        True/False if successful or not, Message or Dict of version and, if
+                                    anything changed, balance, cities, planes and jobs (the job board
+                                    of each city, keyed by city id) changed since the version
+    """
+    repository = storage.get_repository()
+    profile = repository.get(layout.profile_key(player_id), attributes=['balance', layout.VERSION], consistent=True)
+    if not profile:
         return False, 'Player does not exist'
+    version = int(profile.get(layout.VERSION, 0))
+    if since and version <= since:
+        return True, {'version': version}
+
+    def changed(prefix):
+        return [item for item in query_entities(player_id, prefix)
+                if not since or int(item.get(layout.VERSION, 0)) > since]
+
+    job_boards = [materialize_job_board(player_id, layout.entity_id(item), item)
+                  for item in changed(layout.JOB_BOARD_PREFIX)]
+    changes = {'version': version,
+               'balance': profile.get('balance'),
+               'cities': {layout.entity_id(item): layout.strip_key(item, layout.VERSION)
+                          for item in changed(layout.CITY_PREFIX)},
+               'planes': layout.merge_planes(changed(layout.PLANE_PREFIX)),
+               'jobs': {layout.entity_id(job_board): {'jobs': job_board['jobs'], 'jobs_expire': job_board['jobs_expire']}
+                        for job_board in job_boards}}
+    logging.info('Changes of player %s since version %s: %s', player_id, since, logs.truncate(changes))
+    return True, changes
 
 
 def add_city_to_player(player_id, city_id):
@@ -170,26 +516,24 @@ def add_city_to_player(player_id, city_id):
     if not city_object:
         return False, 'City does not exist'
 
+    city_item, job_board_item = layout.city_items(player_id, city_object.serialize())
+
     try:
-        logging.info(f'Trying to add city_id {city_id} to player: {player_id}')
-        result = table.update_item(
-            Key={'player_id': player_id},
-            UpdateExpression=f"ADD balance :city_cost "
-                             f"SET cities.{city_object.city_id} = :new_city",
-            ExpressionAttributeValues={
-                ':city_cost': -int(city_object.cost),
-                ':new_city': city_object.serialize()
-            },
-            ConditionExpression=(Attr('balance').gte(city_object.cost) &
-                                 Attr(f'cities.{city_object.city_id}').not_exists()),
-            ReturnValues="UPDATED_NEW")
-
-    except ClientError as e:
+        logging.info('Trying to add city_id %s to player: %s', city_id, player_id)
+        versions.write_player(player_id, [
+            Update(layout.profile_key(player_id),
+                   increments={'balance': -int(city_object.cost)},
+                   condition=Attr('balance').gte(int(city_object.cost))),
+            Put(city_item, condition=Attr(layout.SORT_KEY).not_exists()),
+            Put(job_board_item)
+        ])
+
+    except RepositoryError as e:
         logger.info(e)
         return False, 'Purchase failed'
 
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully added city. {attributes}')
+    attributes = {'balance': get_balance(player_id)}
+    logging.info('Successfully added city. %s', logs.truncate(attributes))
     return True, attributes
 
 
@@ -209,206 +553,496 @@ def add_plane_to_player(player_id, plane_id, current_city_id):
     if not current_city_id:
         return False, 'Invalid city id'
 
-    plane_object.current_city_id = current_city_id
-
     # Generate a unique ID for the plane since a player can have multiple of the same plane
     purchased_plane_id = generate_random_string()
 
     try:
-        logging.info(f'Trying to add plane_id {plane_id} to player: {player_id}')
-        result = table.update_item(
-            Key={'player_id': player_id},
-            UpdateExpression=f"ADD balance :plane_cost "
-                             f"SET planes.{purchased_plane_id} = :new_plane",
-            ExpressionAttributeValues={
-                ':plane_cost': -int(plane_object.cost),
-                ':new_plane': plane_object.serialize()
-            },
-            ConditionExpression=Attr('balance').gte(plane_object.cost),
-            ReturnValues="UPDATED_NEW")
-
-    except ClientError as e:
+        logging.info('Trying to add plane_id %s to player: %s', plane_id, player_id)
+        versions.write_player(player_id, [
+            Update(layout.profile_key(player_id),
+                   increments={'balance': -int(plane_object.cost)},
+                   condition=Attr('balance').gte(int(plane_object.cost))),
+            # The catalog plane is shared, the purchased plane is a copy placed at its starting city
+            Put(layout.plane_item(player_id, purchased_plane_id,
+                                  {**plane_object.serialize(), 'current_city_id': current_city_id}),
+                condition=Attr(layout.SORT_KEY).not_exists())
+        ])
+
+    except RepositoryError as e:
         logger.info(e)
         return False, 'Purchase failed'
 
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully added plane. {attributes}')
+    attributes = {'balance': get_balance(player_id)}
+    logging.info('Successfully added plane. %s', logs.truncate(attributes))
     return True, attributes
 
 
-def add_jobs_to_plane(player_id, plane_id, list_of_jobs):
+def load_plane(player_id, plane_id, job_ids):
     """
-    Add jobs to a plane
+    Load jobs from the job board of the plane's current city onto the plane. The jobs are added to
+    the plane and removed from the job board in one transaction, which is conditional on the jobs
+    still being on the board and the plane still being on the ground at that city with enough free
+    capacity, so concurrent loads can never load a job twice or overload a plane.
 
     :param player_id:               Player ID to update
-    :param plane_id:                Plane to add jobs to
-    :param list_of_jobs:            Dict of jobs to add to plane
+    :param plane_id:                Plane to load
+    :param job_ids:                 List of job ids to move from the job board to the plane
     :return:                        True/False if successful or not, Message or result data
     """
+    success, result = get_plane_and_city(player_id, plane_id)
+    if not success:
+        return False, result
+    plane, job_board = result
+
+    city_id = plane.get('current_city_id')
+    success, jobs = plan_load(plane, job_board, job_ids)
+    if not success:
+        return False, jobs
+    job_ids = list(jobs)
+
+    plane_condition = functools.reduce(operator.and_, [
+        Attr(layout.SORT_KEY).exists(),
+        flights.grounded_condition(),
+        Attr('current_city_id').eq(city_id),
+        Attr('loaded_jobs').size().lte(plane.get('capacity') - len(job_ids)),
+        *[Attr(f'loaded_jobs.{job_id}').not_exists() for job_id in job_ids]
+    ])
+    job_board_condition = consume_jobs_condition(job_board, job_ids)
+
     try:
-        logging.info(f'Trying to load jobs on plane "{plane_id}" for '
-                     f'player {player_id}. Jobs: {list_of_jobs}')
-
-        result = table.update_item(
-            Key={'player_id': player_id},
-            UpdateExpression=f"SET planes.{plane_id}.loaded_jobs = :new_jobs",
-            ExpressionAttributeValues={
-                ':new_jobs': list_of_jobs
-            },
-            ReturnValues="UPDATED_NEW")
-
-    except ClientError as e:
+        logging.info('Trying to load jobs on plane "%s" from city "%s" for player %s. Jobs: %s',
+                     plane_id, city_id, player_id, logs.truncate(job_ids))
+        versions.write_player(player_id, [
+            Update(layout.plane_key(player_id, plane_id),
+                   updates={f'loaded_jobs.{job_id}': job for job_id, job in jobs.items()},
+                   condition=plane_condition),
+            Update(layout.job_board_key(player_id, city_id),
+                   updates={f'consumed.{job_id}': True for job_id in job_ids},
+                   condition=job_board_condition)
+        ])
+
+    except RepositoryError as e:
         logger.info(e)
         return False, 'Failed to load jobs onto plane'
 
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully loaded jobs. {attributes}')
+    attributes = {'planes': {plane_id: {'loaded_jobs': {**plane.get('loaded_jobs'), **jobs}}}}
+    logging.info('Successfully loaded jobs. %s', logs.truncate(attributes))
     return True, attributes
 
 
+def consume_jobs_condition(job_board, job_ids):
+    """
+    Build the condition for consuming jobs from a job board: the board is still in the window the
+    jobs were derived from and none of the jobs was consumed since
+
+    :param job_board:               Materialized job board
+    :param job_ids:                 List of job ids to consume
+    :return:                        boto3 condition
+    """
+    return functools.reduce(operator.and_, [
+        Attr('jobs_expire').eq(job_board['jobs_expire']),
+        Attr('jobs_expire').gte(int(clock.now())),
+        *[Attr(f'consumed.{job_id}').not_exists() for job_id in job_ids]
+    ])
+
+
+def plan_load(plane, job_board, job_ids):
+    """
+    Validate loading jobs from a job board onto a plane
+
+    :param plane:                   Plane Dict
+    :param job_board:               Materialized job board of the plane's current city, or None
+    :param job_ids:                 List of job ids to load
+    :return:                        True/False if valid or not, Message or Dict of jobs
+    """
+    grounded, message = flights.check_grounded(plane)
+    if not grounded:
+        return False, message
+
+    if not job_ids:
+        return False, 'loaded_jobs is a required field'
+
+    job_ids = list(dict.fromkeys(job_ids))
+    if len(job_ids) > plane.get('capacity') - len(plane.get('loaded_jobs')):
+        return False, 'Not enough capacity'
+
+    return select_jobs(plane, job_board, job_ids)
+
+
+def select_jobs(plane, job_board, job_ids):
+    """
+    Get the jobs to load onto a plane from a job board
+
+    :param plane:                   Plane Dict
+    :param job_board:               Materialized job board of the plane's current city, or None
+    :param job_ids:                 List of job ids to load
+    :return:                        True/False if successful or not, Message or Dict of jobs
+    """
+    if not job_board:
+        return False, 'Player does not own city'
+
+    if clock.now() > job_board.get('jobs_expire'):
+        return False, 'Jobs have expired'
+
+    try:
+        # Get job definitions from job ids
+        jobs = {job_id: job_board['jobs'][job_id] for job_id in job_ids}
+    except KeyError:
+        return False, 'One or more job ids is invalid'
+
+    # Check if the jobs match the plane type (P or C)
+    if any(job.get('job_type') != plane.get('capacity_type') for job in jobs.values()):
+        return False, 'Plane is incompatible with one or more job types'
+
+    return True, jobs
+
+
+def suggest_load(player_id, plane_id, destination_city_id=None, by_destination=False):
+    """
+    Suggest the revenue maximizing jobs to load onto a plane from the job board of its current city
+
+    :param player_id:               Player ID owning the plane
+    :param plane_id:                Plane to load
+    :param destination_city_id:     (optional) Only suggest jobs to this city
+    :param by_destination:          (optional) Only suggest jobs to the best destination within range
+    :return:                        True/False if successful or not, Message or Dict of the suggested load
+    """
+    success, result = get_plane_and_city(player_id, plane_id)
+    if not success:
+        return False, result
+    plane, job_board = result
+
+    grounded, message = flights.check_grounded(plane)
+    if not grounded:
+        return False, message
+
+    if not job_board:
+        return False, 'Player does not own city'
+    if clock.now() > job_board.get('jobs_expire'):
+        return False, 'Jobs have expired'
+
+    return True, plan_suggested_load(plane, job_board['jobs'], destination_city_id, by_destination)
+
+
+def plan_suggested_load(plane, jobs, destination_city_id=None, by_destination=False):
+    """
+    Pick the revenue maximizing set of compatible jobs which fits the free capacity of a plane. Every
+    job takes one unit of capacity, so the knapsack has unit weights and taking the highest revenue
+    jobs is optimal: O(n log k) over the job board.
+
+    When grouped by destination, the jobs of each destination within range are picked the same way
+    and the destination collecting the most revenue on landing (including the jobs already loaded
+    for it) is suggested.
+
+    :param plane:                   Plane Dict
+    :param jobs:                    Dict of jobs on the job board
+    :param destination_city_id:     (optional) Only pick jobs to this city
+    :param by_destination:          (optional) Only pick jobs to the best destination within range
+    :return:                        Dict of the suggested loaded_jobs, their revenue and destination
+    """
+    free_capacity = max(int(plane.get('capacity')) - len(plane.get('loaded_jobs')), 0)
+    compatible = [(job_id, job) for job_id, job in jobs.items()
+                  if job.get('job_type') == plane.get('capacity_type')
+                  and destination_city_id in (None, job.get('destination_city_id'))]
+
+    def best_jobs(candidates):
+        return heapq.nlargest(free_capacity, candidates, key=lambda candidate: candidate[1]['revenue'])
+
+    if not by_destination:
+        return suggested_load(best_jobs(compatible), destination_city_id)
+
+    destinations = {}
+    for job_id, job in compatible:
+        destinations.setdefault(job['destination_city_id'], []).append((job_id, job))
+    landing_revenue = {}
+    for job in plane.get('loaded_jobs').values():
+        landing_revenue[job['destination_city_id']] = landing_revenue.get(job['destination_city_id'], 0) + job['revenue']
+
+    best = suggested_load([])
+    best_revenue = 0
+    for city_id in sorted(set(destinations) | set(landing_revenue)):
+        distance = get_distance_between_cities(plane.get('current_city_id'), city_id)
+        if distance is None or distance > plane.get('flight_range'):
+            continue
+        load = suggested_load(best_jobs(destinations.get(city_id, [])), city_id)
+        if best['destination_city_id'] is None or load['revenue'] + landing_revenue.get(city_id, 0) > best_revenue:
+            best, best_revenue = load, load['revenue'] + landing_revenue.get(city_id, 0)
+    return best
+
+
+def suggested_load(chosen, destination_city_id=None):
+    """
+    Build the result of a suggested load
+
+    :param chosen:                  List of (job id, job) tuples
+    :param destination_city_id:     (optional) Destination the jobs were picked for
+    :return:                        Dict of loaded_jobs, revenue and destination_city_id
+    """
+    return {'loaded_jobs': dict(chosen),
+            'revenue': sum(job['revenue'] for _, job in chosen),
+            'destination_city_id': destination_city_id}
+
+
+# Plane attributes a departure is planned from, see plan_departure
+DEPARTURE_ATTRIBUTES = ['current_city_id', 'flight_range', 'speed', *flights.STATUS_ATTRIBUTES, layout.VERSION]
+
+
+def plan_departure(plane, destination_city_id, eta=None):
+    """
+    Validate a departure and calculate the departure and arrival times
+
+    :param plane:                       Plane Dict
+    :param destination_city_id:         ID of destination city
+    :param eta:                         (optional) override the flight time in seconds
+    :return:                            True/False if valid or not, Message or Dict of plane updates
+    """
+    grounded, message = flights.check_grounded(plane)
+    if not grounded:
+        return False, message
+
+    distance = get_distance_between_cities(plane.get('current_city_id'), destination_city_id)
+    if distance is None:
+        return False, 'Destination city does not exist'
+    if distance > plane.get('flight_range'):
+        return False, 'Destination city is beyond the range of the plane'
+
+    flight_seconds = eta if eta else get_seconds_between_cities(distance, plane.get('speed'))
+    departed_at = int(clock.now())
+    return True, {
+        'destination_city_id': destination_city_id,
+        'state': IN_FLIGHT,
+        'departed_at': departed_at,
+        'arrives_at': departed_at + flight_seconds
+    }
+
+
+def schedule_arrival(player_id, plane_id, arrives_at):
+    """
+    Add a plane to the arrivals index (see storage.layout) so the arrivals worker lands it
+
+    :param player_id:                   Player ID owning the plane
+    :param plane_id:                    ID of the plane
+    :param arrives_at:                  Arrival time in epoch seconds
+    :return:                            Put operation
+    """
+    return Put(layout.arrival_item(player_id, plane_id, arrives_at, config.arrival_bucket_seconds))
+
+
+def cancel_arrival(player_id, plane_id, arrives_at):
+    """
+    Remove a plane from the arrivals index once it has landed
+
+    :param player_id:                   Player ID owning the plane
+    :param plane_id:                    ID of the plane
+    :param arrives_at:                  Arrival time in epoch seconds
+    :return:                            Delete operation
+    """
+    return Delete(layout.arrival_key(player_id, plane_id, arrives_at, config.arrival_bucket_seconds))
+
+
 def depart_plane(player_id, plane_id, plane, destination_city_id, eta=None):
     """
-    Depart plane from its current location to the destination city
+    Depart plane from its current location to the destination city. The write is conditional on the
+    plane still having the version it was read with, and is planned again from a new read of the
+    plane when a concurrent write changed it first (see versions.retry).
 
     :param player_id:                   Player ID to update
-    :param plane:                       Plane object to depart
+    :param plane:                       Plane object to depart, with its version when read by get_plane
     :param plane_id:                    ID of the plane
     :param destination_city_id:         ID of destination city
-    :param eta:                         (optional) override ETA
+    :param eta:                         (optional) override the flight time in seconds
     :return:                            True/False if successful or not, Message or result data
     """
+    logging.info('Trying to depart plane "%s" for player %s. Destination city: %s',
+                 logs.truncate(plane), player_id, destination_city_id)
+
+    def depart(attempt):
+        current = plane
+        if attempt:
+            success, current = get_plane(player_id, plane_id, attributes=DEPARTURE_ATTRIBUTES)
+            if not success:
+                return False, current
+
+        valid, departure = plan_departure(current, destination_city_id, eta)
+        if not valid:
+            return False, departure
+
+        versions.write_player(player_id, [
+            Update(layout.plane_key(player_id, plane_id),
+                   updates=departure,
+                   removes=[name for name in flights.FLIGHT_ATTRIBUTES if name in current and name not in departure],
+                   condition=versions.guarded(Attr(layout.SORT_KEY).exists() & flights.grounded_condition(), current)),
+            schedule_arrival(player_id, plane_id, departure['arrives_at'])
+        ], retries=0)
+        return True, departure
+
     try:
-        logging.info(f'Trying to depart plane "{plane}" for '
-                     f'player {player_id}. Destination city: {destination_city_id}')
-
-        distance = get_distance_between_cities(plane.get('current_city_id'), destination_city_id)
-        if distance > plane.get('flight_range'):
-            return False, 'Destination city is beyond the range of the plane'
-
-        calculated_eta = get_seconds_between_cities(distance, plane.get('speed'))
-
-        result = table.update_item(
-            Key={'player_id': player_id},
-            UpdateExpression=f"SET planes.{plane_id}.destination_city_id = :destination_city_id, "
-                             f"planes.{plane_id}.eta = :eta",
-            ExpressionAttributeValues={
-                ':destination_city_id': destination_city_id,
-                ':eta': eta if eta else calculated_eta
-            },
-            ReturnValues="UPDATED_NEW")
-
-    except ClientError as e:
+        valid, departure = versions.retry(depart)
+        if not valid:
+            return False, departure
+
+    except RepositoryError as e:
         logger.info(e)
         return False, 'Failed to load jobs onto plane'
 
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully departed plane. {attributes}')
+    attributes = {'planes': {plane_id: departure}}
+    logging.info('Successfully departed plane. %s', logs.truncate(attributes))
     return True, attributes
 
 
-def handle_plane_landed(player_id, plane_id, plane):
+def get_flight_status(player_id, plane_id):
     """
-    Handle the plane once it has landed at a destination city
+    Get the flight state of a plane, reading only its STATUS_ATTRIBUTES (see utils.flights)
+
+    :param player_id:                   Player ID owning the plane
+    :param plane_id:                    ID of the plane
+    :return:                            True/False if successful or not, Message or Dict of the flight state
+    """
+    plane = storage.get_repository().get(layout.plane_key(player_id, plane_id),
+                                         attributes=[layout.SORT_KEY, *flights.STATUS_ATTRIBUTES])
+    if not plane:
+        return False, 'Invalid plane_id'
+    return True, flights.describe(plane)
+
+
+# Plane attributes a landing is planned from, see plan_landing
+LANDING_ATTRIBUTES = ['loaded_jobs', 'destination_city_id', *flights.STATUS_ATTRIBUTES, layout.VERSION]
+
+
+def plan_landing(plane, allow_empty=False):
+    """
+    Validate a landing and calculate the revenue of the jobs completed at the destination city
 
-    :param player_id:                   Player ID to update
-    :param plane_id:                    Plane ID to process
     :param plane:                       Plane Dict
-    :return:                            True/False if successful or not, Message or result data
+    :param allow_empty:                 (optional) Land the plane even if it completes no jobs
+    :return:                            True/False if valid or not, Message or Tuple of
+                                        (completed job ids, total revenue, Dict of plane updates)
     """
-    if not plane.get('eta'):
+    state = flights.status(plane)
+    if state == GROUNDED:
         return False, 'Plane has not moved'
-    if plane.get('eta') > time.time():
+    if state == IN_FLIGHT:
         return False, 'Plane has not yet landed'
 
     logging.info('Plane landed. Calculating revenue and clearing completed jobs')
 
-    jobs_to_remove = [job_id for job_id, job in plane.get('loaded_jobs').items()
-                      if job.get('destination_city_id') == plane.get('destination_city_id')]
+    completed_jobs = {job_id: job for job_id, job in plane.get('loaded_jobs').items()
+                      if job.get('destination_city_id') == plane.get('destination_city_id')}
 
-    logging.info(f'Removing completed jobs from plane: {jobs_to_remove}')
+    logging.info('Removing completed jobs from plane: %s', logs.truncate(list(completed_jobs)))
 
-    if not jobs_to_remove:
+    if not completed_jobs and not allow_empty:
         return False, 'No jobs to remove at city'
 
-    remove_jobs_expression = [f'planes.{plane_id}.loaded_jobs.{job}' for job in jobs_to_remove]
-
-    total_revenue = sum([job.get('revenue') for _, job in plane.get('loaded_jobs').items()
-                         if job.get('destination_city_id') == plane.get('destination_city_id')])
-
-    logging.info(f'Revenue from {len(jobs_to_remove)} completed jobs: ${total_revenue}')
-
-    result = table.update_item(
-        Key={'player_id': player_id},
-        UpdateExpression=f"ADD balance :total_revenue "
-                         f"SET planes.{plane_id}.eta = :eta, "
-                         f"planes.{plane_id}.destination_city_id = :destination_city_id, "
-                         f"planes.{plane_id}.current_city_id = :current_city_id "
-                         f"REMOVE " + ', '.join(remove_jobs_expression),
-        ExpressionAttributeValues={
-            ':total_revenue': total_revenue,
-            ':eta': 0,
-            ':destination_city_id': 'none',
-            ':current_city_id': plane.get('destination_city_id')
-        },
-        ReturnValues="UPDATED_NEW")
-
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully handled plane landing. {attributes}')
-    return True, attributes
+    total_revenue = sum([job.get('revenue') for job in completed_jobs.values()])
 
+    logging.info('Revenue from %s completed jobs: $%s', len(completed_jobs), total_revenue)
 
-def update_city_with_new_jobs(player_id, city_id, player_cities):
-    """
-    Generate a new set of jobs and update a city with the jobs
+    landed_plane = {
+        'state': GROUNDED,
+        'destination_city_id': 'none',
+        'current_city_id': plane.get('destination_city_id')
+    }
+    return True, (list(completed_jobs), total_revenue, landed_plane)
 
-    :param player_id:                   Player ID to update
-    :param city_id:                     City ID to update
-    :param player_cities:               Dict of the players cities
-    :return:                            Dict of new jobs, job expiration
-    """
-    new_jobs = generate_random_jobs(player_cities, city_id)
-    jobs_expire = int(time.time()) + 240
-    logging.info(f'Generated jobs: {new_jobs}')
-
-    table.update_item(
-        Key={'player_id': player_id},
-        UpdateExpression=f"SET cities.{city_id}.jobs = :new_jobs, "
-                         f"cities.{city_id}.jobs_expire = :jobs_expire",
-        ExpressionAttributeValues={
-            ':new_jobs': new_jobs,
-            ':jobs_expire': jobs_expire
-        },
-        ReturnValues="UPDATED_NEW")
 
-    return new_jobs, int(jobs_expire)
+def landing_operations(player_id, plane_id, plane, landing):
+    """
+    Build the writes of a landing: the revenue, the landed plane and the removal of its arrival from
+    the arrivals index. The revenue is only credited if the plane was not landed (or changed) since
+    it was read.
+
+    :param player_id:                   Player ID owning the plane
+    :param plane_id:                    Plane ID
+    :param plane:                       Plane Dict the landing was planned from
+    :param landing:                     Landing planned by plan_landing
+    :return:                            List of operations, the profile update first
+    """
+    jobs_to_remove, total_revenue, landed_plane = landing
+    operations = [
+        Update(layout.profile_key(player_id),
+               increments={'balance': total_revenue},
+               condition=Attr(layout.SORT_KEY).exists()),
+        Update(layout.plane_key(player_id, plane_id),
+               updates=landed_plane,
+               removes=[*[name for name in flights.FLIGHT_ATTRIBUTES if name in plane],
+                        *[f'loaded_jobs.{job_id}' for job_id in jobs_to_remove]],
+               condition=versions.guarded(Attr(layout.SORT_KEY).exists(), plane))
+    ]
+    if 'arrives_at' in plane:
+        operations[1].condition &= Attr('arrives_at').eq(plane['arrives_at'])
+        operations.append(cancel_arrival(player_id, plane_id, plane['arrives_at']))
+    return operations
 
 
-def remove_jobs_from_city(player_id, city_id, list_of_jobs):
+def handle_plane_landed(player_id, plane_id, plane):
     """
-    From selected jobs from a city
+    Handle the plane once it has landed at a destination city. The write is conditional on the plane
+    still having the version it was read with, so concurrent unloads credit the revenue once.
 
-    :param player_id:               Player ID to update
-    :param city_id:                 City ID to update
-    :param list_of_jobs:            List of job ids to remove
-    :return:                        True/False if successful or not, Message or result data
+    :param player_id:                   Player ID to update
+    :param plane_id:                    Plane ID to process
+    :param plane:                       Plane Dict, with its version when read by get_plane
+    :return:                            True/False if successful or not, Message or result data
     """
-    if not list_of_jobs:
-        return False, 'No jobs to remove'
-    try:
-        logging.info(f'Trying to remove jobs for city "{city_id}" for '
-                     f'player {player_id}. Jobs to remove: {list_of_jobs}')
+    def land(attempt):
+        current = plane
+        if attempt:
+            success, current = get_plane(player_id, plane_id)
+            if not success:
+                return False, current
+
+        valid, landing = plan_landing(current)
+        if not valid:
+            return False, landing
 
-        update_expressions = [f'cities.{city_id}.jobs.{job}' for job in list_of_jobs]
+        versions.write_player(player_id, landing_operations(player_id, plane_id, current, landing), retries=0)
+        return True, landing[2]
 
-        result = table.update_item(
-            Key={'player_id': player_id},
-            UpdateExpression="REMOVE " + ', '.join(update_expressions),
-            ReturnValues="UPDATED_NEW")
+    try:
+        landed, landed_plane = versions.retry(land)
+        if not landed:
+            return False, landed_plane
 
-    except ClientError as e:
+    except RepositoryError as e:
         logger.info(e)
-        return False, 'Failed to remove jobs from city'
+        return False, 'Failed to unload plane'
 
-    attributes = result.get('Attributes', {})
-    logging.info(f'Successfully removed jobs from city. {attributes}')
+    attributes = {'balance': get_balance(player_id), 'planes': {plane_id: landed_plane}}
+    logging.info('Successfully handled plane landing. %s', logs.truncate(attributes))
     return True, attributes
+
+
+def update_city_with_new_jobs(player_id, city_id, player_cities):
+    """
+    Start a new job board window for a city. Only the window and the destinations are stored, the
+    jobs are derived from them when the board is read (see materialize_job_board). The window is only
+    started if the current one has expired: when a concurrent request started it first, the jobs of
+    that window are returned instead.
+
+    :param player_id:                   Player ID to update
+    :param city_id:                     City ID to update
+    :param player_cities:               Dict (or list of ids) of the players cities
+    :return:                            Dict of new jobs, job expiration
+    """
+    now = int(clock.now())
+    job_board = {'jobs_expire': now + 240,
+                 'destinations': sorted(other_city_id for other_city_id in player_cities if other_city_id != city_id),
+                 'consumed': {}}
+
+    try:
+        # Job boards written before the jobs were derived also stored the jobs
+        versions.write_player(player_id, [Update(layout.job_board_key(player_id, city_id), updates=job_board,
+                                                 removes=['jobs'],
+                                                 condition=Attr('jobs_expire').not_exists()
+                                                 | Attr('jobs_expire').lte(now))])
+    except ConditionalCheckFailed:
+        job_board = materialize_job_board(player_id, city_id, storage.get_repository().get(
+            layout.job_board_key(player_id, city_id), attributes=['jobs_expire', 'destinations', 'consumed'],
+            consistent=True))
+        logging.info('Job board of city %s was renewed concurrently, sending its jobs', city_id)
+        return job_board['jobs'], job_board['jobs_expire']
+
+    new_jobs = materialize_job_board(player_id, city_id, job_board)['jobs']
+    logging.info('Generated jobs: %s', logs.truncate(new_jobs))
+    return new_jobs, job_board['jobs_expire']
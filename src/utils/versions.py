@@ -0,0 +1,181 @@
+"""
+Player versions
+
+Every player has a version on its profile item which is bumped by every write to the player, and
+every item of the player carries the version of the write which last changed it. Clients which
+remember the version they have seen can ask for only the items changed since (see GET /v1/sync).
+
+Writes go through write_player, which adds the bump to the transaction of the write: the profile
+is updated with the next version on the condition that it still has the version read before the
+write (compare-and-swap), and the written items are stamped with the next version. Versions are
+therefore unique and ordered per player. A write which loses the race against a concurrent write
+is retried with the new version. A transaction cancelled by a concurrent transaction on the same
+items (TransactionConflict) wrote nothing and is retried the same way.
+
+Actions which plan a write from items they read (a departure from its plane, a landing from the
+loaded jobs) also condition the write on each of those items still having the version it was read
+with (unchanged). When a concurrent write changed one of them first, retry runs the action again
+after a jittered backoff, so it reads the items again and plans from their new state.
+"""
+import logging
+import random
+import time
+
+from boto3.dynamodb.conditions import Attr
+
+import storage
+from config import config
+from storage import layout
+from storage.repository import ConditionalCheckFailed, Put, TransactionConflict, Update
+
+logger = logging.getLogger()
+
+
+def get_version(player_id):
+    """
+    Read the current version of a player
+
+    :param player_id:       Player ID
+    :return:                Version, 0 for players never written since versions were stored
+    """
+    profile = storage.get_repository().get(layout.profile_key(player_id), attributes=[layout.VERSION],
+                                           consistent=True)
+    return int((profile or {}).get(layout.VERSION, 0))
+
+
+def version_condition(version):
+    """
+    Condition on the profile of a player still having a version
+
+    :param version:         Version read before the write
+    :return:                boto3 condition
+    """
+    if version:
+        return Attr(layout.VERSION).eq(version)
+    # Profiles created before versions were stored have none
+    return Attr(layout.SORT_KEY).exists() & (Attr(layout.VERSION).not_exists() | Attr(layout.VERSION).eq(0))
+
+
+def unchanged(item):
+    """
+    Condition on an item still having the version it was read with
+
+    :param item:            Item as read, including its version attribute
+    :return:                boto3 condition, None for items read without their version
+    """
+    if layout.VERSION not in item:
+        return None
+    return Attr(layout.VERSION).eq(item[layout.VERSION])
+
+
+def guarded(condition, item):
+    """
+    Add the unchanged condition of an item to the condition of its write
+
+    :param condition:       boto3 condition of the write
+    :param item:            Item the write was planned from
+    :return:                boto3 condition
+    """
+    version_check = unchanged(item)
+    return condition if version_check is None else condition & version_check
+
+
+def versioned(player_id, operations, version):
+    """
+    Add the version bump to the operations of a write
+
+    :param player_id:       Player ID
+    :param operations:      List of operations, they are not changed
+    :param version:         Version read before the write
+    :return:                List of operations stamping the next version, including the profile update
+    """
+    next_version = version + 1
+    profile_update = Update(layout.profile_key(player_id), updates={layout.VERSION: next_version},
+                            condition=version_condition(version))
+    stamped = []
+    for operation in operations:
+        key = operation.item if isinstance(operation, Put) else operation.key
+        if key[layout.PARTITION_KEY] != player_id:
+            # Items of other partitions, eg: the arrivals index
+            stamped.append(operation)
+        elif isinstance(operation, Put):
+            stamped.append(Put({**operation.item, layout.VERSION: next_version}, operation.condition))
+        elif isinstance(operation, Update) and key[layout.SORT_KEY] == layout.PROFILE:
+            profile_update = Update(operation.key, {**operation.updates, layout.VERSION: next_version},
+                                    operation.removes, operation.increments,
+                                    operation.condition & profile_update.condition if operation.condition
+                                    else profile_update.condition)
+        elif isinstance(operation, Update):
+            stamped.append(Update(operation.key, {**operation.updates, layout.VERSION: next_version},
+                                  operation.removes, operation.increments, operation.condition))
+        else:
+            stamped.append(operation)
+    return [profile_update, *stamped]
+
+
+def write_player(player_id, operations, retries=None):
+    """
+    Write operations on the items of a player in one transaction which also bumps the version of
+    the player
+
+    :param player_id:       Player ID
+    :param operations:      List of Put / Update / Delete / ConditionCheck operations
+    :param retries:         (optional) Times the write is retried when the version moved or the transaction
+                            conflicted, defaults to config.version_retries. Actions retried as a whole (see
+                            retry) pass 0.
+    :return:                Version of the write
+    """
+    repository = storage.get_repository()
+    retries = config.version_retries if retries is None else retries
+    version = get_version(player_id)
+    for attempt in range(retries + 1):
+        try:
+            repository.transact(versioned(player_id, operations, version))
+            return version + 1
+        except ConditionalCheckFailed:
+            # Only a write which lost the race for the version is retried, other conditions failed
+            latest = get_version(player_id)
+            if latest == version or attempt == retries:
+                raise
+            logger.info('Version of player %s moved from %s to %s, retrying', player_id, version, latest)
+            backoff(attempt)
+            version = latest
+        except TransactionConflict:
+            if attempt == retries:
+                raise
+            logger.info('Write of player %s conflicted with a concurrent transaction, retrying', player_id)
+            backoff(attempt)
+            version = get_version(player_id)
+
+
+def retry(action):
+    """
+    Run an action which reads items, plans a write from them and writes it, again after a
+    conflicting concurrent write, up to config.version_retries times
+
+    :param action:          Function of the attempt number (0 for the first), raising ConditionalCheckFailed or
+                            TransactionConflict on a conflict. Attempts after the first must read the items they
+                            plan from again.
+    :return:                Result of the action
+    :raises ConditionalCheckFailed: If the last attempt conflicted too
+    :raises TransactionConflict: If the last attempt was cancelled by a concurrent transaction
+    """
+    for attempt in range(config.version_retries + 1):
+        try:
+            return action(attempt)
+        except (ConditionalCheckFailed, TransactionConflict):
+            if attempt == config.version_retries:
+                raise
+            logger.info('Write conflicted with a concurrent write, retrying (attempt %s)', attempt + 1)
+            backoff(attempt)
+
+
+def backoff(attempt):
+    """
+    Wait before a retry, a random time up to a delay doubling with every attempt ("full jitter"), so
+    conflicting requests do not retry in lockstep
+
+    :param attempt:         Attempt which failed, 0 for the first
+    """
+    # The standard library generator is used so the seeded game streams of utils.rng are not consumed
+    time.sleep(random.uniform(0, min(config.retry_max_delay, config.retry_base_delay * 2 ** attempt)))
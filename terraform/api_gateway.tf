@@ -1,5 +1,8 @@
 resource "aws_api_gateway_rest_api" "this" {
   name = local.name
+
+  # Pass base64 encoded (compressed) lambda responses through as binary
+  binary_media_types = ["*/*"]
 }
 
 resource "aws_api_gateway_deployment" "this" {
@@ -1,4 +1,19 @@
 resource "aws_cloudwatch_log_group" "this" {
   name              = "/aws/lambda/${local.name}"
   retention_in_days = "3"
-}
\ No newline at end of file
+}
+resource "aws_cloudwatch_log_group" "arrivals" {
+  name              = "/aws/lambda/${local.name}_arrivals"
+  retention_in_days = "3"
+}
+
+resource "aws_cloudwatch_event_rule" "arrivals" {
+  name                = "${local.name}_arrivals"
+  description         = "Land the planes which are due"
+  schedule_expression = "rate(1 minute)"
+}
+
+resource "aws_cloudwatch_event_target" "arrivals" {
+  rule = aws_cloudwatch_event_rule.arrivals.name
+  arn  = aws_lambda_function.arrivals.arn
+}
@@ -8,3 +8,43 @@ resource "aws_dynamodb_table" "players" {
     type = "S"
   }
 }
+
+# Multi-item player layout (see src/storage/layout.py). The players table is kept until it has been
+# migrated with: python -m storage.migrate <players table> <player entities table>, which runs below
+# before the functions are switched over to this table.
+resource "aws_dynamodb_table" "player_entities" {
+  name         = "${local.name}_player_entities"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "player_id"
+  range_key    = "entity"
+
+  attribute {
+    name = "player_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "entity"
+    type = "S"
+  }
+}
+
+# Migrate the players before the functions use the new table (see depends_on in lambda.tf), so no
+# player gets a fresh profile in it that the migration would then skip. Re-running is safe: migrated
+# players are skipped and interrupted ones resumed. Runs from the build/ directory the package is
+# zipped from, which has the source and its dependencies.
+resource "null_resource" "migrate_players" {
+  triggers = {
+    source      = aws_dynamodb_table.players.name
+    destination = aws_dynamodb_table.player_entities.name
+  }
+
+  provisioner "local-exec" {
+    working_dir = "${path.module}/../build"
+    command     = "python -m storage.migrate ${aws_dynamodb_table.players.name} ${aws_dynamodb_table.player_entities.name}"
+    environment = {
+      PYTHONPATH      = "."
+      DYNAMODB_REGION = local.region
+    }
+  }
+}
@@ -37,3 +37,11 @@ resource "aws_iam_role_policy" "invocation" {
 }
 EOF
 }
+
+resource "aws_lambda_permission" "arrivals" {
+  statement_id  = "AllowScheduledInvocation"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.arrivals.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.arrivals.arn
+}
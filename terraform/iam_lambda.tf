@@ -42,11 +42,16 @@ resource "aws_iam_role_policy" "lambda" {
                 "dynamodb:DeleteItem",
                 "dynamodb:UpdateItem",
                 "dynamodb:Scan",
-                "dynamodb:Query"
+                "dynamodb:Query",
+                "dynamodb:ConditionCheckItem",
+                "dynamodb:BatchGetItem",
+                "dynamodb:BatchWriteItem"
             ],
             "Resource": [
                 "${aws_dynamodb_table.players.arn}",
-                "${aws_dynamodb_table.players.arn}*"
+                "${aws_dynamodb_table.players.arn}*",
+                "${aws_dynamodb_table.player_entities.arn}",
+                "${aws_dynamodb_table.player_entities.arn}*"
             ]
         }
     ]
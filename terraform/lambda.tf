@@ -11,8 +11,32 @@ resource "aws_lambda_function" "this" {
 
   environment {
     variables = {
-      DYNAMODB_PLAYERS_TABLE = aws_dynamodb_table.players.name
+      DYNAMODB_PLAYERS_TABLE = aws_dynamodb_table.player_entities.name
     }
   }
+
+  # Switch over to the new table only once the players were migrated into it
+  depends_on = [null_resource.migrate_players]
 }
 
+
+resource "aws_lambda_function" "arrivals" {
+  filename      = "package.zip"
+  function_name = "${local.name}_arrivals"
+  role          = aws_iam_role.lambda.arn
+  handler       = "arrivals_worker.lambda_handler"
+  runtime       = "python3.7"
+  timeout       = "60"
+  memory_size   = 128
+
+  source_code_hash = filebase64sha256("package.zip")
+
+  environment {
+    variables = {
+      DYNAMODB_PLAYERS_TABLE = aws_dynamodb_table.player_entities.name
+    }
+  }
+
+  # Switch over to the new table only once the players were migrated into it
+  depends_on = [null_resource.migrate_players]
+}